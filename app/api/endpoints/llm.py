@@ -1,14 +1,26 @@
+import asyncio
 import json
 import logging
 import re
-from typing import Optional, Union
+from dataclasses import asdict, dataclass
+from typing import AsyncGenerator, AsyncIterator, Callable, List, Optional, Tuple, Union
 
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, Header, HTTPException
+from fastapi.responses import StreamingResponse
 
+from app.core.config import settings
+from app.core.deadline import DeadlineExceeded
+from app.core.tracing import span, traced
 from app.schemas.llm import LLMQueryRequest, LLMQueryResponse
 from app.schemas.music import TrackStreamResponse
+from app.services.llm.cache import detection_cache, response_cache
 from app.services.llm.deepseek import deepseek_service
+from app.services.llm.intent import intent_classifier
+from app.services.llm.profiles import DETECTION, FULL
+from app.services.llm.sentences import SentenceChunker
 from app.services.music.yandex import yandex_music_service
+from app.services.users.conversation import conversation_store
+from app.utils.text import normalize_text
 
 logger = logging.getLogger(__name__)
 
@@ -22,41 +34,172 @@ MUSIC_DETECTION_PROMPT = (
     ' Query должен содержать только исполнителя/трек без служебных слов.'
 )
 
+COMBINED_INTENT_PROMPT = (
+    'Ты голосовой ассистент умного зеркала. Если пользователь просит включить, проиграть'
+    ' или воспроизвести музыку, песню, исполнителя или плейлист, ответь строго JSON без лишнего'
+    ' текста в формате {"type": "music", "query": "название"}, где query содержит только'
+    ' исполнителя/трек без служебных слов. Иначе ответь ОЧЕНЬ КРАТКО - максимум 2-3 коротких'
+    ' предложения, без списков, ответ будет озвучен голосом - и верни строго JSON'
+    ' {"type": "answer", "text": "ответ"}.'
+)
 
-def _parse_music_detection(raw_response: str) -> Optional[str]:
-    """Parse LLM JSON response returned by the detection prompt."""
+CHAT_SYSTEM_PROMPT = (
+    'Ты голосовой ассистент умного зеркала. '
+    'Отвечай ОЧЕНЬ КРАТКО - максимум 2-3 коротких предложения. '
+    'Ответ будет озвучен голосом, поэтому избегай длинных текстов и списков.'
+)
+
+
+@dataclass
+class SpeculationStats:
+    """Counters for speculative (parallel detection + answer) mode"""
+
+    requests: int = 0
+    music_commands: int = 0
+    wasted_calls: int = 0  # Chat answers discarded because the query was a music command
+    cancelled_calls: int = 0  # ...of them cancelled while still in flight
+    wasted_tokens: int = 0  # Tokens of discarded answers that had already completed
+
+
+speculation_stats = SpeculationStats()
+
+
+@dataclass
+class CombinedIntentStats:
+    """Counters for combined (single call) intent + answer mode"""
+
+    requests: int = 0
+    music_commands: int = 0
+    answers: int = 0
+    fallbacks: int = 0  # Unusable replies that needed a separate chat call
+
+
+combined_stats = CombinedIntentStats()
+
+
+def _extract_json(raw_response: str) -> Optional[dict]:
+    """Extract JSON object from LLM response, tolerating surrounding text or code fences."""
     try:
         data = json.loads(raw_response)
     except json.JSONDecodeError:
         match = re.search(r'\{.*\}', raw_response, re.DOTALL)
         if not match:
-            logger.warning('Unable to parse music detection response: %s', raw_response)
+            logger.warning('Unable to parse JSON from LLM response: %s', raw_response)
             return None
         try:
             data = json.loads(match.group(0))
         except json.JSONDecodeError:
-            logger.warning('Unable to parse extracted detection JSON: %s', match.group(0))
+            logger.warning('Unable to parse extracted JSON: %s', match.group(0))
             return None
-    is_music = bool(data.get('is_music_command'))
+    if not isinstance(data, dict):
+        logger.warning('LLM JSON response is not an object: %s', raw_response)
+        return None
+    return data
+
+
+def _parse_music_detection(raw_response: str) -> Optional[str]:
+    """Parse LLM JSON response returned by the detection prompt."""
+    data = _extract_json(raw_response)
+    if data is None:
+        return None
+    is_music = bool(data.get('is_music_command')) or data.get('type') == 'music'
     query = (data.get('query') or '').strip()
     if is_music and query:
         return query
     return None
 
 
-async def _detect_music_command(text: str) -> Optional[str]:
-    """Delegate intent detection to LLM."""
-    detection_response = await deepseek_service.query(
-        text=text,
-        system_prompt=MUSIC_DETECTION_PROMPT,
-    )
-    return _parse_music_detection(detection_response)
+def _parse_combined_response(raw_response: str) -> Tuple[Optional[str], Optional[str]]:
+    """
+    Parse response of the combined intent + answer prompt
+
+    Accepts {"type": "music", "query": ...}, {"type": "answer", "text": ...} and the
+    detection-prompt format. A reply without any JSON is treated as a plain answer.
+
+    Returns:
+        (music_query, answer_text); both None when the reply is unusable
+    """
+    if '{' not in raw_response:
+        # Model ignored the format and just answered
+        text = raw_response.strip()
+        return None, text or None
+
+    music_query = _parse_music_detection(raw_response)
+    if music_query:
+        return music_query, None
+
+    data = _extract_json(raw_response)
+    if data is None:
+        return None, None
+    text = data.get('text') or data.get('answer') or ''
+    text = text.strip() if isinstance(text, str) else ''
+    return None, text or None
+
+
+async def _detect_music_command(text: str, use_cache: bool = True) -> Optional[str]:
+    """
+    Music query of a command, None for anything else
+
+    The local intent classifier answers when it is confident; otherwise the LLM
+    decides and its answer trains the classifier. Results are cached.
+    """
+    use_cache = use_cache and settings.llm_cache_enabled
+    cache_key = normalize_text(text)
+    if use_cache:
+        cached = detection_cache.get(cache_key)
+        if cached is not None:
+            return cached or None
+
+    decision = None
+    if intent_classifier is not None:
+        with span('detect.local'):
+            decision = intent_classifier.decide(text)
+    if decision is not None:
+        music_query = decision.query if decision.is_music else None
+    else:
+        with span('detect'):
+            detection_response = await deepseek_service.query(
+                text=text,
+                system_prompt=MUSIC_DETECTION_PROMPT,
+                use_cache=False,
+                profile=DETECTION,
+            )
+        music_query = _parse_music_detection(detection_response)
+        if intent_classifier is not None and settings.llm_intent_learn:
+            intent_classifier.learn(text, music_query)
+    if use_cache:
+        # '' marks a known non-music utterance
+        detection_cache.set(cache_key, music_query or '')
+    return music_query
+
+
+def _use_cache(cache_control: Optional[str]) -> bool:
+    """Clients bypass LLM caches with 'Cache-Control: no-cache' (or no-store)"""
+    if not cache_control:
+        return True
+    directives = {d.strip().lower() for d in cache_control.split(',')}
+    return not directives & {'no-cache', 'no-store'}
+
+
+def _conversation_history(device_id: Optional[str], text: str) -> Optional[List[dict]]:
+    """Earlier turns of the device's conversation that fit the prompt token budget"""
+    if not settings.conversation_enabled or not device_id:
+        return None
+    return conversation_store.build_history(device_id, CHAT_SYSTEM_PROMPT, text) or None
+
+
+def _remember(device_id: Optional[str], text: str, answer: str) -> None:
+    if settings.conversation_enabled and device_id:
+        conversation_store.record(device_id, text, answer)
 
 
 async def _handle_music_command(query: str) -> TrackStreamResponse:
     """Search track and return direct stream URL for the first result."""
     try:
-        tracks = await yandex_music_service.search_tracks(query=query, limit=1)
+        with span('music.search'):
+            tracks = await yandex_music_service.search_tracks(query=query, limit=1)
+    except DeadlineExceeded as e:
+        raise HTTPException(status_code=504, detail=str(e))
     except ValueError as e:
         logger.error(f'Music service configuration error: {str(e)}')
         raise HTTPException(status_code=500, detail='Music service not configured properly')
@@ -65,13 +208,16 @@ async def _handle_music_command(query: str) -> TrackStreamResponse:
         raise HTTPException(status_code=500, detail=f'Failed to search music: {str(e)}')
 
     if not tracks:
-        logger.info(f'No tracks found for query: {query}')
+        logger.info('No tracks found for query: %s', query)
         raise HTTPException(status_code=404, detail=f"No tracks found for query '{query}'")
 
     track_id = tracks[0].id
     try:
-        stream_url = await yandex_music_service.get_track_download_url(track_id=track_id)
+        with span('music.link'):
+            stream_url = await yandex_music_service.get_track_download_url(track_id=track_id)
         return TrackStreamResponse(stream_url=stream_url)
+    except DeadlineExceeded as e:
+        raise HTTPException(status_code=504, detail=str(e))
     except ValueError as e:
         logger.error(f'Track unavailable: {str(e)}')
         raise HTTPException(status_code=404, detail=str(e))
@@ -80,38 +226,246 @@ async def _handle_music_command(query: str) -> TrackStreamResponse:
         raise HTTPException(status_code=500, detail=f'Failed to get stream URL: {str(e)}')
 
 
+async def _detect_and_answer_combined(
+    text: str, use_cache: bool = True, history: Optional[List[dict]] = None
+) -> Tuple[Optional[str], Optional[str]]:
+    """
+    Detect music intent and answer with a single LLM call
+
+    Returns:
+        (music_query, None) for music commands, (None, answer_text) otherwise.
+        (None, None) means the reply was malformed and a regular chat call is needed.
+    """
+    combined_stats.requests += 1
+    with span('combined'):
+        # Full profile: the answer comes wrapped in JSON, which must not be cut off
+        raw_response = await deepseek_service.query(
+            text=text,
+            system_prompt=COMBINED_INTENT_PROMPT,
+            use_cache=use_cache,
+            history=history,
+            profile=FULL,
+        )
+    music_query, answer = _parse_combined_response(raw_response)
+    if music_query:
+        combined_stats.music_commands += 1
+    elif answer:
+        combined_stats.answers += 1
+    else:
+        combined_stats.fallbacks += 1
+        logger.warning(f'Combined intent reply unusable, falling back: {raw_response[:100]}')
+    return music_query, answer
+
+
+async def _detect_and_answer_speculatively(
+    text: str, use_cache: bool = True, history: Optional[List[dict]] = None
+) -> Tuple[Optional[str], Optional[str]]:
+    """
+    Run music detection and the chat answer concurrently
+
+    Returns:
+        (music_query, None) for music commands, (None, answer_text) otherwise
+    """
+    speculation_stats.requests += 1
+    chat_task = asyncio.create_task(
+        traced(
+            'answer',
+            lambda: deepseek_service.complete(
+                text=text, system_prompt=CHAT_SYSTEM_PROMPT, use_cache=use_cache, history=history
+            ),
+        )
+    )
+    try:
+        music_query = await _detect_music_command(text, use_cache=use_cache)
+        if not music_query:
+            completion = await chat_task
+            return None, completion.text
+    finally:
+        # Never leave the answer running behind a failed detection or a disconnected client
+        in_flight = not chat_task.done()
+        if in_flight:
+            chat_task.cancel()
+        elif not chat_task.cancelled():
+            # Mark a failed answer as seen when detection failed too (or was cancelled),
+            # otherwise asyncio logs "Task exception was never retrieved"
+            chat_task.exception()
+
+    speculation_stats.music_commands += 1
+    if in_flight:
+        speculation_stats.wasted_calls += 1
+        speculation_stats.cancelled_calls += 1
+    elif chat_task.cancelled() or chat_task.exception() is not None:
+        speculation_stats.wasted_calls += 1
+    elif not chat_task.result().cached:
+        # A cached answer cost no provider call, so nothing was wasted
+        speculation_stats.wasted_calls += 1
+        speculation_stats.wasted_tokens += chat_task.result().total_tokens
+    return music_query, None
+
+
 @router.post('/query', response_model=Union[LLMQueryResponse, TrackStreamResponse])
-async def query_llm(request: LLMQueryRequest) -> Union[LLMQueryResponse, TrackStreamResponse]:
+async def query_llm(
+    request: LLMQueryRequest,
+    cache_control: Optional[str] = Header(None),
+    x_device_id: Optional[str] = Header(None),
+) -> Union[LLMQueryResponse, TrackStreamResponse]:
     """
     Send query to LLM and get response
 
     - **text**: User query text (string input)
+    - **Cache-Control: no-cache** header: bypass response and detection caches
+    - **X-Device-ID** header: keep conversation context for follow-up questions
 
     Returns text response from LLM
     """
+    use_cache = _use_cache(cache_control)
+    history = _conversation_history(x_device_id, request.text)
     try:
-        # First check if user asks to play music using LLM intent detection
-        music_query = await _detect_music_command(request.text)
+        if settings.llm_combined_intent:
+            music_query, response_text = await _detect_and_answer_combined(
+                request.text, use_cache=use_cache, history=history
+            )
+        elif settings.llm_speculative_answer:
+            music_query, response_text = await _detect_and_answer_speculatively(
+                request.text, use_cache=use_cache, history=history
+            )
+        else:
+            # First check if user asks to play music using LLM intent detection
+            music_query = await _detect_music_command(request.text, use_cache=use_cache)
+            response_text = None
+
         if music_query:
-            logger.info(f'Detected music command for query: {music_query}')
-            return await _handle_music_command(music_query)
-
-        logger.info(f'Processing LLM query: {request.text[:50]}...')
-
-        # Query DeepSeek API for regular text requests
-        response_text = await deepseek_service.query(
-            text=request.text,
-            system_prompt=(
-                'Ты голосовой ассистент умного зеркала. '
-                'Отвечай ОЧЕНЬ КРАТКО - максимум 2-3 коротких предложения. '
-                'Ответ будет озвучен голосом, поэтому избегай длинных текстов и списков.'
-            ),
-        )
+            logger.info('Detected music command for query: %s', music_query)
+            track = await _handle_music_command(music_query)
+            _remember(x_device_id, request.text, f'Включаю музыку: {music_query}')
+            return track
 
-        logger.info(f'LLM response received: {response_text[:50]}...')
+        if response_text is None:
+            logger.info('Processing LLM query: %s...', request.text[:50])
+
+            # Query DeepSeek API for regular text requests
+            with span('answer'):
+                response_text = await deepseek_service.query(
+                    text=request.text,
+                    system_prompt=CHAT_SYSTEM_PROMPT,
+                    use_cache=use_cache,
+                    history=history,
+                )
+
+        logger.info('LLM response received: %s...', response_text[:50])
+        _remember(x_device_id, request.text, response_text)
 
         return LLMQueryResponse(response=response_text)
 
+    except HTTPException:
+        raise
+    except DeadlineExceeded as e:
+        logger.warning('LLM query: %s', e)
+        raise HTTPException(status_code=504, detail=str(e))
+    except ValueError as e:
+        logger.error(f'Configuration error: {str(e)}')
+        raise HTTPException(status_code=500, detail='LLM service not configured properly')
+    except Exception as e:
+        logger.error(f'Error processing LLM query: {str(e)}')
+        raise HTTPException(status_code=500, detail=f'Failed to process LLM query: {str(e)}')
+
+
+SSE_HEADERS = {'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+
+
+def _sse_event(event: str, data: dict) -> str:
+    """Format server-sent event"""
+    return f'event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n'
+
+
+async def _sentence_events(
+    first_delta: str,
+    deltas: AsyncGenerator[str, None],
+    on_complete: Optional[Callable[[str], None]] = None,
+) -> AsyncGenerator[Tuple[str, dict], None]:
+    """
+    Turn LLM text deltas into 'chunk' events of whole sentences, then 'done'
+
+    on_complete receives the full answer once the stream has finished successfully.
+    """
+    chunker = SentenceChunker()
+    parts = []
+    delta = first_delta
+    try:
+        while True:
+            parts.append(delta)
+            for sentence in chunker.feed(delta):
+                yield 'chunk', {'text': sentence}
+            try:
+                delta = await deltas.__anext__()
+            except StopAsyncIteration:
+                break
+        tail = chunker.flush()
+        if tail:
+            yield 'chunk', {'text': tail}
+        response_text = ''.join(parts)
+        if on_complete is not None:
+            on_complete(response_text)
+        yield 'done', {'response': response_text}
+    except Exception as e:
+        # The stream has already started, so report failure in-band
+        logger.error(f'Error streaming LLM response: {str(e)}')
+        yield 'error', {'detail': f'Failed to process LLM query: {str(e)}'}
+    finally:
+        await deltas.aclose()
+
+
+async def _sse_stream(events: AsyncGenerator[Tuple[str, dict], None]) -> AsyncIterator[str]:
+    try:
+        async for event, data in events:
+            yield _sse_event(event, data)
+    finally:
+        # Client disconnected: stop the upstream LLM stream right away
+        await events.aclose()
+
+
+async def _music_events(track: TrackStreamResponse) -> AsyncGenerator[Tuple[str, dict], None]:
+    yield 'music', track.model_dump()
+    yield 'done', {}
+
+
+async def open_answer_stream(
+    text: str, use_cache: bool = True, device_id: Optional[str] = None
+) -> AsyncGenerator[Tuple[str, dict], None]:
+    """
+    Detect intent and start answering; returns (event, data) pairs to stream
+
+    Failures before the first delta are raised as HTTPException, later ones are
+    reported as an 'error' event. Shared by the SSE endpoint and the WebSocket channel.
+    """
+    try:
+        music_query = await _detect_music_command(text, use_cache=use_cache)
+        if music_query:
+            logger.info('Detected music command for query: %s', music_query)
+            track = await _handle_music_command(music_query)
+            _remember(device_id, text, f'Включаю музыку: {music_query}')
+            return _music_events(track)
+
+        logger.info('Streaming LLM query: %s...', text[:50])
+
+        # Wait for the first delta so provider failures still map to HTTP errors
+        deltas = deepseek_service.stream(
+            text=text,
+            system_prompt=CHAT_SYSTEM_PROMPT,
+            use_cache=use_cache,
+            history=_conversation_history(device_id, text),
+        )
+        try:
+            with span('answer.first_delta'):
+                first_delta = await deltas.__anext__()
+        except StopAsyncIteration:
+            first_delta = ''
+
+    except HTTPException:
+        raise
+    except DeadlineExceeded as e:
+        logger.warning('LLM query: %s', e)
+        raise HTTPException(status_code=504, detail=str(e))
     except ValueError as e:
         logger.error(f'Configuration error: {str(e)}')
         raise HTTPException(status_code=500, detail='LLM service not configured properly')
@@ -119,6 +473,60 @@ async def query_llm(request: LLMQueryRequest) -> Union[LLMQueryResponse, TrackSt
         logger.error(f'Error processing LLM query: {str(e)}')
         raise HTTPException(status_code=500, detail=f'Failed to process LLM query: {str(e)}')
 
+    return _sentence_events(
+        first_delta, deltas, on_complete=lambda answer: _remember(device_id, text, answer)
+    )
+
+
+@router.post('/query/stream')
+async def query_llm_stream(
+    request: LLMQueryRequest,
+    cache_control: Optional[str] = Header(None),
+    x_device_id: Optional[str] = Header(None),
+) -> StreamingResponse:
+    """
+    Send query to LLM and stream the response as server-sent events
+
+    - **text**: User query text (string input)
+
+    Events:
+    - **chunk**: `{"text": "..."}` - next sentence of the answer, ready for TTS
+    - **music**: `{"stream_url": "..."}` - the query was a music command
+    - **done**: `{"response": "..."}` - full answer text, end of stream
+    - **error**: `{"detail": "..."}` - the stream broke after it had started
+
+    Errors before the first chunk are returned as regular HTTP errors.
+    """
+    events = await open_answer_stream(
+        request.text, use_cache=_use_cache(cache_control), device_id=x_device_id
+    )
+    return StreamingResponse(
+        _sse_stream(events), media_type='text/event-stream', headers=SSE_HEADERS
+    )
+
+
+@router.get('/stats')
+async def llm_stats():
+    """LLM service statistics (connection pool, provider health, intent modes, caches)"""
+    return {
+        'pool': deepseek_service.pool_stats(),
+        'routing': deepseek_service.router.stats(),
+        'coalescing': deepseek_service.inflight.stats(),
+        'profiles': deepseek_service.profile_stats(),
+        'intent_classifier': {
+            'enabled': intent_classifier is not None,
+            **(intent_classifier.stats() if intent_classifier is not None else {}),
+        },
+        'speculation': {'enabled': settings.llm_speculative_answer, **asdict(speculation_stats)},
+        'combined_intent': {'enabled': settings.llm_combined_intent, **asdict(combined_stats)},
+        'conversations': {'enabled': settings.conversation_enabled, **conversation_store.stats()},
+        'cache': {
+            'enabled': settings.llm_cache_enabled,
+            'responses': response_cache.stats(),
+            'detection': detection_cache.stats(),
+        },
+    }
+
 
 @router.get('/health')
 async def health_check():
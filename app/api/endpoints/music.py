@@ -1,7 +1,19 @@
-from fastapi import APIRouter, HTTPException, Query
+from fastapi import APIRouter, Header, HTTPException, Query
+from fastapi.responses import FileResponse, StreamingResponse
+from typing import Optional
 import logging
 
-from app.schemas.music import MusicSearchResponse, TrackStreamResponse
+from app.core.config import settings
+from app.core.deadline import DeadlineExceeded
+from app.schemas.music import (
+    MusicSearchResponse,
+    TrackBatchStreamRequest,
+    TrackBatchStreamResponse,
+    TrackStreamResponse,
+    TrackStreamResult,
+)
+from app.services.music.audio import AUDIO_MEDIA_TYPE, UpstreamAudioError, audio_proxy
+from app.services.music.prefetch import stream_prefetcher
 from app.services.music.yandex import yandex_music_service
 
 logger = logging.getLogger(__name__)
@@ -12,23 +24,33 @@ router = APIRouter(prefix="/music", tags=["Music"])
 @router.get("/search", response_model=MusicSearchResponse)
 async def search_music(
     q: str = Query(..., min_length=1, max_length=100, description="Search query"),
+    prefetch: bool = Query(
+        settings.music_prefetch_enabled,
+        description="Resolve stream URLs of the top results in the background",
+    ),
 ) -> MusicSearchResponse:
     """
     Search for music tracks
 
     - **q**: Search query string (artist, title, album, etc.)
+    - **prefetch**: Resolve stream URLs of the top results in the background
 
     Returns list of found tracks
     """
     try:
-        logger.info(f"Searching music for query: {q}")
+        logger.info("Searching music for query: %s", q)
 
         tracks = await yandex_music_service.search_tracks(query=q, limit=10)
 
-        logger.info(f"Found {len(tracks)} tracks")
+        logger.info("Found %s tracks", len(tracks))
+
+        if prefetch and tracks:
+            stream_prefetcher.schedule(track.id for track in tracks)
 
         return MusicSearchResponse(tracks=tracks, total=len(tracks))
 
+    except DeadlineExceeded as e:
+        raise HTTPException(status_code=504, detail=str(e))
     except ValueError as e:
         logger.error(f"Configuration error: {str(e)}")
         raise HTTPException(status_code=500, detail="Music service not configured properly")
@@ -47,14 +69,17 @@ async def get_track_stream(track_id: str) -> TrackStreamResponse:
     Returns direct download URL that client can use to stream/download the track
     """
     try:
-        logger.info(f"Getting stream URL for track: {track_id}")
+        logger.info("Getting stream URL for track: %s", track_id)
 
+        await stream_prefetcher.claim(track_id)
         stream_url = await yandex_music_service.get_track_download_url(track_id=track_id)
 
-        logger.info(f"Stream URL obtained for track: {track_id}")
+        logger.info("Stream URL obtained for track: %s", track_id)
 
         return TrackStreamResponse(stream_url=stream_url)
 
+    except DeadlineExceeded as e:
+        raise HTTPException(status_code=504, detail=str(e))
     except ValueError as e:
         logger.error(f"Error: {str(e)}")
         raise HTTPException(status_code=404, detail=str(e))
@@ -63,7 +88,115 @@ async def get_track_stream(track_id: str) -> TrackStreamResponse:
         raise HTTPException(status_code=500, detail=f"Failed to get stream URL: {str(e)}")
 
 
+# Upstream headers passed through to the client for proxied audio
+AUDIO_PROXY_HEADERS = ("content-length", "content-range", "accept-ranges")
+
+
+@router.get("/track/{track_id}/audio")
+async def get_track_audio(track_id: str, range: Optional[str] = Header(None)):
+    """
+    Stream track audio through the backend (supports HTTP Range requests)
+
+    - **track_id**: Track ID from search results
+
+    Tracks are kept in an on-disk LRU cache (MUSIC_AUDIO_CACHE_MAX_BYTES); repeat plays
+    are served from the local file without calls to Yandex.
+    """
+    path = audio_proxy.cached_path(track_id)
+    if path is not None:
+        logger.info("Audio for track %s served from disk cache", track_id)
+        # Handles Range itself; zero-copy via the ASGI pathsend extension if the server has it
+        return FileResponse(path, media_type=AUDIO_MEDIA_TYPE)
+
+    try:
+        logger.info("Proxying audio for track: %s", track_id)
+        response = await audio_proxy.open_upstream(track_id, range)
+
+    except UpstreamAudioError as e:
+        logger.error(f"Error getting audio: {str(e)}")
+        raise HTTPException(status_code=502, detail=str(e))
+    except DeadlineExceeded as e:
+        raise HTTPException(status_code=504, detail=str(e))
+    except ValueError as e:
+        logger.error(f"Error: {str(e)}")
+        raise HTTPException(status_code=404, detail=str(e))
+    except Exception as e:
+        logger.error(f"Error getting audio: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Failed to get audio: {str(e)}")
+
+    if response.status_code != 200:
+        # Partial content only: fetch the whole file for the next play
+        audio_proxy.schedule_fill(track_id)
+
+    headers = {
+        name: response.headers[name] for name in AUDIO_PROXY_HEADERS if name in response.headers
+    }
+    headers.setdefault("accept-ranges", "bytes")
+    return StreamingResponse(
+        audio_proxy.iter_body(track_id, response),
+        status_code=response.status_code,
+        media_type=response.headers.get("content-type", AUDIO_MEDIA_TYPE),
+        headers=headers,
+    )
+
+
+@router.post("/tracks/stream", response_model=TrackBatchStreamResponse)
+async def get_tracks_stream(request: TrackBatchStreamRequest) -> TrackBatchStreamResponse:
+    """
+    Get direct stream/download URLs for several tracks (queue / playlist loading)
+
+    - **track_ids**: Track IDs from search results (up to MUSIC_BATCH_MAX_TRACKS)
+
+    Returns per-track stream URL or error, in request order
+    """
+    if len(request.track_ids) > settings.music_batch_max_tracks:
+        raise HTTPException(
+            status_code=422,
+            detail=f"Too many track IDs (max {settings.music_batch_max_tracks})",
+        )
+
+    try:
+        logger.info("Getting stream URLs for %s tracks", len(request.track_ids))
+
+        urls = await yandex_music_service.get_track_download_urls(
+            request.track_ids, max_concurrency=settings.music_batch_concurrency
+        )
+
+    except DeadlineExceeded as e:
+        raise HTTPException(status_code=504, detail=str(e))
+    except ValueError as e:
+        logger.error(f"Configuration error: {str(e)}")
+        raise HTTPException(status_code=500, detail="Music service not configured properly")
+    except Exception as e:
+        logger.error(f"Error getting stream URLs: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Failed to get stream URLs: {str(e)}")
+
+    results = [
+        TrackStreamResult(track_id=track_id, stream_url=None, error=str(url))
+        if isinstance(url, Exception)
+        else TrackStreamResult(track_id=track_id, stream_url=url, error=None)
+        for track_id, url in urls.items()
+    ]
+    failed = sum(1 for result in results if result.error is not None)
+
+    logger.info("Stream URLs obtained for %s of %s tracks", len(results) - failed, len(results))
+
+    return TrackBatchStreamResponse(
+        results=results, resolved=len(results) - failed, failed=failed
+    )
+
+
+@router.get("/stats")
+async def music_stats():
+    """Music service statistics (cache hit/miss, prefetch and audio proxy counters)"""
+    return {
+        "cache": yandex_music_service.cache_stats(),
+        "prefetch": stream_prefetcher.stats(),
+        "audio": audio_proxy.stats(),
+    }
+
+
 @router.get("/health")
 async def health_check():
     """Health check endpoint for music service"""
-    return {"status": "ok", "service": "music"}
+    return {"status": "ok", "service": "music", "ready": yandex_music_service.ready}
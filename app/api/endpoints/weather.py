@@ -0,0 +1,70 @@
+from fastapi import APIRouter, HTTPException, Query
+from fastapi.responses import Response
+from typing import Optional
+import logging
+
+from app.schemas.weather import WeatherResponse
+from app.services.weather.service import weather_service
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter(prefix="/weather", tags=["Weather"])
+
+
+@router.get("", response_model=WeatherResponse)
+async def get_weather(
+    location: Optional[str] = Query(None, description="Location name (default: first configured)"),
+) -> Response:
+    """
+    Get current weather and daily forecast
+
+    - **location**: Configured location name (WEATHER_LOCATIONS)
+
+    Served from an in-memory snapshot refreshed in the background every
+    WEATHER_REFRESH_INTERVAL_SECONDS. `Age` header: seconds since the data was
+    fetched; `X-Weather-Stale: true` while a refresh of outdated data is running.
+    """
+    try:
+        resolved = weather_service.resolve_location(location)
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+
+    try:
+        snapshot = await weather_service.get(resolved)
+    except Exception as e:
+        logger.error(f"Error getting weather: {str(e)}")
+        raise HTTPException(status_code=503, detail=f"Weather is not available yet: {str(e)}")
+
+    age = snapshot.age
+    return Response(
+        content=snapshot.body,
+        media_type="application/json",
+        headers={
+            "Age": str(int(age)),
+            "X-Weather-Stale": "true" if age >= weather_service.refresh_interval else "false",
+        },
+    )
+
+
+@router.get("/locations")
+async def weather_locations():
+    """Configured weather locations"""
+    return {
+        "default": weather_service.default_location,
+        "locations": [
+            {"name": loc.name, "latitude": loc.latitude, "longitude": loc.longitude}
+            for loc in weather_service.locations.values()
+        ],
+    }
+
+
+@router.get("/stats")
+async def weather_stats():
+    """Weather service statistics (snapshot ages, refreshes, stale reads)"""
+    return weather_service.stats()
+
+
+@router.get("/health")
+async def health_check():
+    """Health check endpoint for weather service"""
+    return {"status": "ok", "service": "weather"}
@@ -0,0 +1,276 @@
+from fastapi import APIRouter, HTTPException, WebSocket, WebSocketDisconnect
+from pydantic import ValidationError
+from typing import Awaitable, Callable, Dict, Optional, Set, Union
+import asyncio
+import json
+import logging
+import time
+
+from app.api.endpoints import llm, music
+from app.api.middleware.rate_limit import SlidingWindowLimiter, client_ip
+from app.core.config import settings
+from app.core.deadline import DeadlineExceeded, start_deadline
+from app.core.metrics import rate_limit_rejections
+from app.database.state import BACKEND_ERRORS, state_backend
+from app.schemas.llm import LLMQueryRequest
+from app.schemas.music import (
+    TrackBatchStreamRequest,
+    TrackBatchStreamResponse,
+    TrackStreamResponse,
+)
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter(prefix="/ws", tags=["WebSocket"])
+
+# Same counters as RateLimitMiddleware ("llm:<ip>"), so REST and WebSocket share the budget
+llm_limiter = SlidingWindowLimiter(window=60.0, backend=state_backend)
+
+
+class MirrorConnection:
+    """
+    One mirror client connected over /ws/mirror
+
+    Requests are multiplexed by client-chosen ID and handled concurrently, at most
+    max_in_flight at a time. Outgoing messages pass through a bounded queue drained
+    by a single writer: when the client reads slowly, handlers block on send(), so
+    a streamed LLM answer is pulled from the provider no faster than it is delivered.
+    """
+
+    def __init__(self, websocket: WebSocket, max_in_flight: int, send_queue_size: int):
+        self.websocket = websocket
+        self.max_in_flight = max_in_flight
+        # The same key as RateLimitMiddleware (X-Forwarded-For behind a proxy)
+        self.client_ip = client_ip(websocket.scope)
+
+        self._outbox: asyncio.Queue = asyncio.Queue(maxsize=send_queue_size)
+        self._requests: Dict[str, asyncio.Task] = {}
+
+    async def send(self, message: dict) -> None:
+        """Queue message for the client; waits while the send queue is full"""
+        if self._outbox.full():
+            ws_stats["send_waits"] += 1
+        await self._outbox.put(message)
+
+    async def _writer(self) -> None:
+        while True:
+            message = await self._outbox.get()
+            await self.websocket.send_text(json.dumps(message, ensure_ascii=False))
+            ws_stats["messages_sent"] += 1
+
+    async def serve(self) -> None:
+        """Read and dispatch client messages until the client disconnects"""
+        writer = asyncio.create_task(self._writer())
+        try:
+            while True:
+                raw = await self.websocket.receive_text()
+                ws_stats["messages_received"] += 1
+                await self._dispatch(raw)
+        except WebSocketDisconnect:
+            pass
+        finally:
+            tasks = [writer, *self._requests.values()]
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def _error(self, request_id: Optional[str], status_code: int, detail: str) -> None:
+        await self.send(
+            {"id": request_id, "type": "error", "status": status_code, "detail": detail}
+        )
+
+    async def _dispatch(self, raw: str) -> None:
+        try:
+            message = json.loads(raw)
+        except ValueError:
+            await self._error(None, 400, "Message is not valid JSON")
+            return
+        if not isinstance(message, dict) or "type" not in message:
+            await self._error(None, 400, "Message must be an object with 'type' and 'id'")
+            return
+
+        request_id = message.get("id")
+        message_type = message["type"]
+
+        if message_type == "ping":
+            await self.send({"id": request_id, "type": "pong"})
+            return
+        if message_type == "cancel":
+            task = self._requests.get(request_id) if isinstance(request_id, str) else None
+            if task is not None:
+                task.cancel()
+                ws_stats["cancelled"] += 1
+            return
+
+        handler = HANDLERS.get(message_type)
+        if handler is None:
+            await self._error(request_id, 400, f"Unknown message type '{message_type}'")
+            return
+        if not isinstance(request_id, str) or not request_id:
+            await self._error(None, 400, "Request 'id' must be a non-empty string")
+            return
+        if request_id in self._requests:
+            await self._error(request_id, 409, f"Request '{request_id}' is already in flight")
+            return
+        if len(self._requests) >= self.max_in_flight:
+            ws_stats["rejected_busy"] += 1
+            await self._error(
+                request_id, 429, f"Too many requests in flight (max {self.max_in_flight})"
+            )
+            return
+
+        ws_stats["requests"][message_type] = ws_stats["requests"].get(message_type, 0) + 1
+        self._requests[request_id] = asyncio.create_task(
+            self._run(request_id, handler, message)
+        )
+
+    async def _run(self, request_id: str, handler: "Handler", message: dict) -> None:
+        # Each request runs in its own task (context), so it gets its own deadline
+        start_deadline()
+        try:
+            await handler(self, request_id, message)
+        except HTTPException as e:
+            await self._error(request_id, e.status_code, str(e.detail))
+        except DeadlineExceeded as e:
+            await self._error(request_id, 504, str(e))
+        except ValidationError as e:
+            await self._error(request_id, 422, str(e))
+        except Exception as e:
+            logger.error(f"Error handling WebSocket request {request_id}: {str(e)}")
+            await self._error(request_id, 500, f"Failed to process request: {str(e)}")
+        finally:
+            self._requests.pop(request_id, None)
+
+
+Handler = Callable[[MirrorConnection, str, dict], Awaitable[None]]
+
+
+def _check_llm_rate_limit(connection: MirrorConnection) -> None:
+    """Apply the per-IP LLM limit to a WebSocket request (the HTTP middleware can't)"""
+    if not settings.rate_limit_enabled:
+        return
+    key = f"llm:{connection.client_ip}"
+    limit = settings.rate_limit_llm_requests_per_minute
+    now = time.time()  # Wall clock, as RateLimitMiddleware (windows shared by workers)
+    try:
+        with llm_limiter.backend.transaction():
+            retry_after = llm_limiter.check(key, limit, now)
+            if not retry_after:
+                llm_limiter.hit(key, now)
+    except BACKEND_ERRORS as e:
+        # Fail open, as RateLimitMiddleware does
+        ws_stats["rate_limit_errors"] += 1
+        logger.warning(f"Rate limit state unavailable, request not limited: {str(e)}")
+        return
+    if retry_after:
+        ws_stats["rate_limited"] += 1
+        rate_limit_rejections.inc("llm")
+        raise HTTPException(
+            status_code=429, detail=f"LLM rate limit exceeded: {limit} requests per minute"
+        )
+
+
+def _cache_control(message: dict) -> Optional[str]:
+    return "no-cache" if message.get("no_cache") else None
+
+
+async def _llm_query(connection: MirrorConnection, request_id: str, message: dict) -> None:
+    request = LLMQueryRequest(text=message.get("text", ""))
+    _check_llm_rate_limit(connection)
+    result = await llm.query_llm(
+        request, cache_control=_cache_control(message), x_device_id=message.get("device_id")
+    )
+    await connection.send({"id": request_id, "type": "result", **result.model_dump()})
+
+
+async def _llm_stream(connection: MirrorConnection, request_id: str, message: dict) -> None:
+    request = LLMQueryRequest(text=message.get("text", ""))
+    _check_llm_rate_limit(connection)
+    events = await llm.open_answer_stream(
+        request.text, use_cache=not message.get("no_cache"), device_id=message.get("device_id")
+    )
+    try:
+        async for event, data in events:
+            await connection.send({"id": request_id, "type": event, **data})
+    finally:
+        await events.aclose()
+
+
+async def _music_search(connection: MirrorConnection, request_id: str, message: dict) -> None:
+    query = str(message.get("q", "")).strip()
+    if not 1 <= len(query) <= 100:
+        raise HTTPException(status_code=422, detail="'q' must be 1-100 characters long")
+    prefetch = message.get("prefetch", settings.music_prefetch_enabled)
+    if not isinstance(prefetch, bool):
+        raise HTTPException(status_code=422, detail="'prefetch' must be true or false")
+    result = await music.search_music(q=query, prefetch=prefetch)
+    await connection.send({"id": request_id, "type": "result", **result.model_dump()})
+
+
+async def _music_stream(connection: MirrorConnection, request_id: str, message: dict) -> None:
+    result: Union[TrackStreamResponse, TrackBatchStreamResponse]
+    if "track_ids" in message:
+        request = TrackBatchStreamRequest(track_ids=message["track_ids"])
+        result = await music.get_tracks_stream(request)
+    else:
+        result = await music.get_track_stream(str(message.get("track_id", "")))
+    await connection.send({"id": request_id, "type": "result", **result.model_dump()})
+
+
+HANDLERS: Dict[str, Handler] = {
+    "llm.query": _llm_query,
+    "llm.stream": _llm_stream,
+    "music.search": _music_search,
+    "music.stream": _music_stream,
+}
+
+connections: Set[MirrorConnection] = set()
+
+ws_stats: dict = {
+    "connections_total": 0,
+    "messages_received": 0,
+    "messages_sent": 0,
+    "requests": {},
+    "cancelled": 0,
+    "rejected_busy": 0,
+    "rate_limited": 0,
+    "rate_limit_errors": 0,  # Requests let through because the state backend failed
+    "send_waits": 0,  # send() calls that waited for a slow client (backpressure)
+}
+
+
+@router.websocket("/mirror")
+async def mirror_channel(websocket: WebSocket):
+    """
+    Persistent channel for the mirror client
+
+    Client messages: `{"id": "r1", "type": "<type>", ...params}`
+    - **llm.query** `{text, no_cache?, device_id?}` -> `result` (as POST /api/llm/query)
+    - **llm.stream** `{text, no_cache?, device_id?}` -> `chunk`..., `music`, `done` or `error`
+    - **music.search** `{q, prefetch?}` -> `result` (same body as GET /api/music/search)
+    - **music.stream** `{track_id}` or `{track_ids}` -> `result`
+    - **cancel** `{id}` - stop an in-flight request; **ping** -> `pong`
+
+    Every server message carries the request `id` (`null` for malformed messages);
+    failures are `{"type": "error", "status": ..., "detail": ...}`.
+    """
+    await websocket.accept()
+    connection = MirrorConnection(
+        websocket,
+        max_in_flight=settings.ws_max_in_flight,
+        send_queue_size=settings.ws_send_queue_size,
+    )
+    connections.add(connection)
+    ws_stats["connections_total"] += 1
+    logger.info("Mirror connected over WebSocket: %s", connection.client_ip)
+    try:
+        await connection.serve()
+    finally:
+        connections.discard(connection)
+        logger.info("Mirror disconnected: %s", connection.client_ip)
+
+
+@router.get("/stats")
+async def ws_channel_stats():
+    """WebSocket channel statistics"""
+    return {"active_connections": len(connections), **ws_stats}
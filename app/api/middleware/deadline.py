@@ -0,0 +1,23 @@
+from app.core.deadline import parse_timeout_header, start_deadline
+
+
+class DeadlineMiddleware:
+    """
+    Start the request's deadline budget (pure ASGI, so the endpoint sees the context)
+
+    Clients may ask for a shorter (or longer, up to REQUEST_DEADLINE_MAX_SECONDS) budget
+    with an X-Request-Timeout header in seconds.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http":
+            header = None
+            for name, value in scope["headers"]:
+                if name == b"x-request-timeout":
+                    header = value.decode("latin-1")
+                    break
+            start_deadline(parse_timeout_header(header))
+        await self.app(scope, receive, send)
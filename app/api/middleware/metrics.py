@@ -0,0 +1,54 @@
+import time
+from typing import Optional
+
+from app.core.metrics import http_request_duration
+
+# Label for requests that matched no route (404s, rejected before routing)
+UNMATCHED_ROUTE = "unmatched"
+
+
+def route_template(scope) -> str:
+    """Path template of the matched route, including the prefix of its router"""
+    template: Optional[str] = getattr(scope.get("route"), "path", None)
+    if template is None:
+        return UNMATCHED_ROUTE
+    # Routes included with a prefix may report their path without it (newer FastAPI);
+    # the request path has exactly as many segments, so take the prefix from there
+    path: str = scope["path"]
+    depth = template.count("/")
+    if path.count("/") > depth:
+        return path.rsplit("/", depth)[0] + template
+    return template
+
+
+class MetricsMiddleware:
+    """
+    Record request latency per route template (pure ASGI)
+
+    The route template (e.g. /api/music/track/{track_id}/stream) rather than the raw
+    path is used as a label, so the number of series stays bounded.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = "500"
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = str(message["status"])
+            await send(message)
+
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            http_request_duration.observe(
+                time.perf_counter() - started, scope["method"], route_template(scope), status
+            )
@@ -1,97 +1,166 @@
-from fastapi import Request, HTTPException
 from fastapi.responses import JSONResponse
-from starlette.middleware.base import BaseHTTPMiddleware
-from collections import defaultdict
-from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Optional, Tuple
 import logging
+import math
+import time
+
+from app.core.metrics import rate_limit_rejections
+from app.database.state import BACKEND_ERRORS, MemoryStateBackend, StateBackend
 
 logger = logging.getLogger(__name__)
 
+# Paths that are never rate limited (exact match)
+EXEMPT_PATHS = frozenset({"/health", "/metrics", "/", "/docs", "/openapi.json"})
 
-class RateLimitMiddleware(BaseHTTPMiddleware):
-    """Rate limiting middleware to prevent API abuse"""
 
-    def __init__(self, app, requests_per_minute: int = 60, llm_requests_per_minute: int = 10):
-        super().__init__(app)
-        self.requests_per_minute = requests_per_minute
-        self.llm_requests_per_minute = llm_requests_per_minute
+def client_ip(scope) -> str:
+    """Client address of an HTTP or WebSocket scope, as set by the proxy if there is one"""
+    headers: List[Tuple[bytes, bytes]] = scope["headers"]
+    for header, value in headers:
+        if header == b"x-forwarded-for":
+            return value.decode("latin-1").split(",")[0].strip()
+    client = scope.get("client")
+    return client[0] if client else "unknown"
+
+
+class SlidingWindowLimiter:
+    """
+    Sliding-window counter rate limiter with O(1) work per check
+
+    Every key keeps only two counters: hits in the current fixed window and in the
+    previous one. The request rate over the last `window` seconds is estimated as
+    previous * (1 - elapsed / window) + current. Counters live in a state backend:
+    an LRU table bounded by max_keys in memory, or SQLite shared between workers.
+
+    `now` is wall-clock time.time(): window indexes stored in a shared backend must
+    mean the same window in every worker process.
+    """
+
+    def __init__(self, window: float = 60.0, backend: Optional[StateBackend] = None):
+        self.window = window
+        self.backend = backend if backend is not None else MemoryStateBackend()
 
-        # Storage: {ip: [(timestamp, endpoint), ...]}
-        self.request_history = defaultdict(list)
-        self.cleanup_interval = timedelta(minutes=5)
-        self.last_cleanup = datetime.now()
-
-    def _cleanup_old_requests(self):
-        """Remove old request records to prevent memory leak"""
-        now = datetime.now()
-        if now - self.last_cleanup > self.cleanup_interval:
-            cutoff_time = now - timedelta(minutes=2)
-            for ip in list(self.request_history.keys()):
-                self.request_history[ip] = [
-                    (ts, endpoint) for ts, endpoint in self.request_history[ip] if ts > cutoff_time
-                ]
-                if not self.request_history[ip]:
-                    del self.request_history[ip]
-            self.last_cleanup = now
-
-    def _is_rate_limited(self, ip: str, path: str) -> tuple[bool, str]:
+    def __len__(self) -> int:
+        return self.backend.rate_keys()
+
+    def check(self, key: str, limit: int, now: float) -> float:
         """
-        Check if request should be rate limited
+        Check whether one more hit fits into the limit (does not record it)
 
         Returns:
-            (is_limited, error_message)
+            float: 0 if allowed, otherwise seconds until the next hit would be allowed
         """
-        now = datetime.now()
-        cutoff_time = now - timedelta(minutes=1)
+        window_index = int(now // self.window)
+        current, previous = self.backend.rate_counters(key, window_index)
+        elapsed = now - window_index * self.window
+        weight = 1 - elapsed / self.window
+
+        if previous * weight + current < limit:
+            return 0.0
+
+        if current < limit:
+            # Wait until the previous window's share decays enough
+            needed_elapsed = self.window * (1 - (limit - current) / previous)
+            return max(needed_elapsed - elapsed, 0.001)
+
+        # Current window is full: wait for the next one, then for its share to decay
+        next_window_wait = self.window - elapsed
+        return next_window_wait + self.window * max(0.0, 1 - limit / current)
+
+    def hit(self, key: str, now: float) -> None:
+        """Record one hit for key"""
+        self.backend.rate_hit(key, int(now // self.window))
+
+
+class RateLimitMiddleware:
+    """
+    Rate limiting middleware to prevent API abuse (pure ASGI)
+
+    Every non-exempt request counts against the overall per-IP limit; requests whose
+    path starts with a class prefix (e.g. /api/llm/) also count against that class.
+    """
+
+    def __init__(
+        self,
+        app,
+        requests_per_minute: int = 60,
+        llm_requests_per_minute: int = 10,
+        max_keys: int = 10000,
+        backend: Optional[StateBackend] = None,
+    ):
+        self.app = app
+        self.requests_per_minute = requests_per_minute
+        self.llm_requests_per_minute = llm_requests_per_minute
 
-        # Get requests from last minute
-        recent_requests = [
-            (ts, endpoint) for ts, endpoint in self.request_history[ip] if ts > cutoff_time
+        # (class name, route prefix, limit per minute); checked in order
+        self.route_classes: List[Tuple[str, str, int]] = [
+            ("llm", "/api/llm/", llm_requests_per_minute),
         ]
+        if backend is None:
+            backend = MemoryStateBackend(max_keys=max_keys)
+        self.limiter = SlidingWindowLimiter(window=60.0, backend=backend)
+        self.rejections: Dict[str, int] = {}
+        # Requests let through unchecked because the state backend failed (e.g. locked)
+        self.backend_errors = 0
+
+    def _limits_for(self, path: str) -> Iterable[Tuple[str, int]]:
+        """Rate limit classes applying to a path: (class name, limit per minute)"""
+        for name, prefix, limit in self.route_classes:
+            if path.startswith(prefix):
+                yield name, limit
+        yield "global", self.requests_per_minute
+
+    def _is_rate_limited(self, ip: str, path: str, now: float) -> Tuple[float, str]:
+        """
+        Check limits and record the request if it is allowed
 
-        # Check LLM endpoint (more expensive, stricter limit)
-        if "/api/llm/" in path:
-            llm_requests = [r for r in recent_requests if "/api/llm/" in r[1]]
-            if len(llm_requests) >= self.llm_requests_per_minute:
-                logger.warning(
-                    f"Rate limit exceeded for LLM by IP {ip}: {len(llm_requests)} requests"
-                )
-                return (
-                    True,
-                    f"LLM rate limit exceeded: {self.llm_requests_per_minute} requests per minute",
-                )
-
-        # Check overall rate limit
-        if len(recent_requests) >= self.requests_per_minute:
-            logger.warning(f"Rate limit exceeded by IP {ip}: {len(recent_requests)} requests")
-            return True, f"Rate limit exceeded: {self.requests_per_minute} requests per minute"
-
-        return False, ""
-
-    async def dispatch(self, request: Request, call_next):
-        # Skip rate limiting for health checks
-        if request.url.path in ["/health", "/", "/docs", "/openapi.json"]:
-            return await call_next(request)
-
-        # Get client IP
-        client_ip = request.client.host
-        if forwarded_for := request.headers.get("X-Forwarded-For"):
-            client_ip = forwarded_for.split(",")[0].strip()
-
-        # Cleanup old records periodically
-        self._cleanup_old_requests()
-
-        # Check rate limit
-        is_limited, error_msg = self._is_rate_limited(client_ip, request.url.path)
-        if is_limited:
-            return JSONResponse(
+        Returns:
+            (retry_after_seconds, error_message); retry_after is 0 when allowed
+        """
+        limits = [(f"{name}:{ip}", name, limit) for name, limit in self._limits_for(path)]
+        with self.limiter.backend.transaction():
+            for key, name, limit in limits:
+                retry_after = self.limiter.check(key, limit, now)
+                if retry_after:
+                    self.rejections[name] = self.rejections.get(name, 0) + 1
+                    rate_limit_rejections.inc(name)
+                    if name == "global":
+                        message = f"Rate limit exceeded: {limit} requests per minute"
+                    else:
+                        message = (
+                            f"{name.upper()} rate limit exceeded: {limit} requests per minute"
+                        )
+                    logger.warning(f"Rate limit '{name}' exceeded by IP {ip}")
+                    return retry_after, message
+
+            # Rejected requests are not recorded, so they don't extend the lockout
+            for key, _, _ in limits:
+                self.limiter.hit(key, now)
+        return 0.0, ""
+
+    async def __call__(self, scope, receive, send):
+        # Skip rate limiting for non-HTTP traffic and health checks
+        if scope["type"] != "http" or scope["path"] in EXEMPT_PATHS:
+            await self.app(scope, receive, send)
+            return
+
+        try:
+            retry_after, error_msg = self._is_rate_limited(
+                client_ip(scope), scope["path"], time.time()
+            )
+        except BACKEND_ERRORS as e:
+            # Fail open: a busy state file must not turn into 500s for every request
+            self.backend_errors += 1
+            logger.warning(f"Rate limit state unavailable, request not limited: {str(e)}")
+            retry_after, error_msg = 0.0, ""
+        if retry_after:
+            retry_after = math.ceil(retry_after)
+            response = JSONResponse(
                 status_code=429,
-                content={"detail": error_msg, "retry_after": "60 seconds"},
+                content={"detail": error_msg, "retry_after": f"{retry_after} seconds"},
+                headers={"Retry-After": str(retry_after)},
             )
+            await response(scope, receive, send)
+            return
 
-        # Record this request
-        self.request_history[client_ip].append((datetime.now(), request.url.path))
-
-        # Process request
-        response = await call_next(request)
-        return response
+        await self.app(scope, receive, send)
@@ -0,0 +1,36 @@
+from app.core.tracing import slow_traces, start_trace
+
+
+class TracingMiddleware:
+    """
+    Trace every HTTP request and report its stages in a Server-Timing header (pure ASGI)
+
+    The header carries the spans finished before the response starts. Streamed
+    responses (body in several chunks) are marked and not kept as slow traces.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        trace = start_trace(scope["method"], scope["path"])
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                trace.status = message["status"]
+                headers = list(message.get("headers", []))
+                headers.append((b"server-timing", trace.server_timing().encode("latin-1")))
+                message = {**message, "headers": headers}
+            elif message["type"] == "http.response.body" and message.get("more_body"):
+                trace.streamed = True
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            trace.finish()
+            slow_traces.record(trace)
@@ -1,3 +1,4 @@
+from pydantic import field_validator
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
 
@@ -30,8 +31,106 @@ class Settings(BaseSettings):
     # Retry settings
     llm_max_retries: int = 2
 
+    # Provider routing: hedge to the fallback when the primary is slower than its p90
+    # latency, skip a provider while its circuit breaker is open
+    llm_hedging_enabled: bool = True
+    llm_hedge_default_delay: float = 3.0  # seconds, until enough latency samples exist
+    llm_hedge_min_delay: float = 0.5
+    llm_hedge_max_delay: float = 10.0
+    llm_breaker_failure_threshold: int = 3  # consecutive failures
+    llm_breaker_error_rate: float = 0.5  # EWMA error rate
+    llm_breaker_open_seconds: float = 30.0
+
+    # Completion profiles: intent detection gets a tiny max_tokens at temperature 0,
+    # small talk the short profile, the rest deepseek_max_tokens. A short answer cut off
+    # at max_tokens is asked again with the full profile.
+    # Empty model: the provider's configured model. Disabled: every call is "full"
+    llm_profiles_enabled: bool = True
+    llm_profile_detection_max_tokens: int = 40
+    llm_profile_detection_model: str = ""
+    llm_profile_short_max_tokens: int = 60
+    llm_profile_short_model: str = ""
+    llm_profile_short_max_words: int = 0  # Also questions up to this many words (0: off)
+
+    # On-box music intent classifier (needs numpy, pip install -e ".[intent]"): the
+    # detection LLM call is skipped when it is confident. Check held-out accuracy on
+    # your utterances first: python -m benchmarks.intent_eval
+    llm_intent_classifier_enabled: bool = False
+    llm_intent_model_path: str = "intent_model.npz"  # Trained from bundled examples if missing
+    llm_intent_confidence: float = 0.9  # Decide locally above this or below 1 - this
+    llm_intent_learn: bool = True  # Update the model from LLM detection results
+    llm_intent_examples_path: str = ""  # Append LLM-labelled utterances here on shutdown
+
+    # Start music detection and the chat answer concurrently (the answer is
+    # cancelled/discarded when the utterance turns out to be a music command)
+    llm_speculative_answer: bool = False
+
+    # Single LLM call returning intent and answer together as JSON
+    # (takes precedence over llm_speculative_answer)
+    llm_combined_intent: bool = False
+
+    # LLM response cache (in-process LRU with TTL and a memory budget)
+    llm_cache_enabled: bool = True
+    llm_cache_ttl_seconds: int = 600
+    llm_cache_max_bytes: int = 4 * 1024 * 1024
+    llm_detection_cache_ttl_seconds: int = 24 * 60 * 60
+    llm_detection_cache_max_bytes: int = 1024 * 1024
+
+    # LLM HTTP connection pool (one long-lived client per provider)
+    llm_http2: bool = False  # Requires the "h2" package (pip install -e ".[http2]")
+    llm_pool_max_connections: int = 20
+    llm_pool_max_keepalive_connections: int = 10
+    llm_pool_keepalive_expiry: float = 30.0  # seconds
+
     # Yandex Music Settings
     yandex_music_token: str = ""
+    # The client is initialized on startup; token/session errors re-initialize it in the
+    # background, at most once per this many seconds
+    music_client_reinit_interval_seconds: float = 60.0
+    music_call_timeout_seconds: float = 10.0  # Per Yandex Music API call
+
+    # Music search cache (negative entries for queries without results expire sooner)
+    music_search_cache_ttl_seconds: int = 6 * 60 * 60
+    music_search_negative_ttl_seconds: int = 5 * 60
+    music_search_cache_max_items: int = 2000
+
+    # Track download info / direct link cache
+    music_download_info_ttl_seconds: int = 24 * 60 * 60
+    music_download_info_cache_max_items: int = 2000
+    music_direct_link_ttl_seconds: int = 30 * 60  # Validity of signed direct links
+    music_direct_link_refresh_margin_seconds: int = 2 * 60  # Refresh this long before expiry
+
+    # Background resolution of stream URLs for the top search results
+    music_prefetch_enabled: bool = False  # Default for /api/music/search?prefetch=
+    music_prefetch_top_k: int = 3
+    music_prefetch_concurrency: int = 2
+
+    # POST /api/music/tracks/stream: max IDs per request, parallel link resolutions
+    music_batch_max_tracks: int = 50
+    music_batch_concurrency: int = 4
+
+    # On-disk LRU cache of track audio for /api/music/track/{id}/audio
+    music_audio_cache_dir: str = "audio_cache"
+    music_audio_cache_max_bytes: int = 2 * 1024 * 1024 * 1024
+
+    # Per-device conversation memory (X-Device-ID header)
+    conversation_enabled: bool = True
+    conversation_max_turns: int = 20  # Ring buffer size (user + assistant messages)
+    conversation_token_budget: int = 1500  # Max approximate prompt tokens incl. history
+    conversation_idle_ttl_seconds: float = 1800.0
+    conversation_max_sessions: int = 1000
+
+    # Weather: refreshed in the background, served from memory
+    weather_provider: str = "open-meteo"  # "open-meteo" or "stub" (offline/tests)
+    weather_locations: str = "Москва:55.7558:37.6173"  # "name:lat:lon;..."; first is default
+    weather_refresh_interval_seconds: float = 1800.0
+    weather_forecast_days: int = 3
+    weather_open_meteo_url: str = "https://api.open-meteo.com/v1/forecast"
+    weather_timeout: float = 10.0
+
+    # WebSocket channel /ws/mirror (per connection)
+    ws_max_in_flight: int = 8  # Concurrent multiplexed requests
+    ws_send_queue_size: int = 64  # Outgoing messages buffered for a slow client
 
     # Security
     secret_key: str = "your-secret-key-change-in-production"
@@ -40,6 +139,51 @@ class Settings(BaseSettings):
     rate_limit_enabled: bool = True
     rate_limit_requests_per_minute: int = 60  # Overall limit
     rate_limit_llm_requests_per_minute: int = 10  # LLM specific (expensive!)
+    rate_limit_max_keys: int = 10000  # Tracked clients (LRU-evicted beyond this)
+
+    # Prometheus metrics at /metrics (per-route latency middleware)
+    metrics_enabled: bool = True
+
+    # Deadline budget per request: upstream calls and retries only get what is left, and
+    # the request fails with 504 once the budget cannot be met (X-Request-Timeout overrides)
+    request_deadline_seconds: float = 15.0  # 0 disables the default deadline
+    request_deadline_max_seconds: float = 60.0  # Cap for X-Request-Timeout
+    request_deadline_min_attempt_seconds: float = 0.5  # Don't start an LLM attempt with less
+
+    # Per-request stage timing: Server-Timing header, slowest traces at /debug/traces
+    tracing_enabled: bool = True
+    tracing_slow_traces: int = 20  # How many of the slowest traces to keep
+    # GET/DELETE /debug/traces (also served with DEBUG). Unauthenticated: keep off unless
+    # the port is only reachable by operators
+    tracing_debug_endpoints: bool = False
+
+    # Logging: written by a background thread through a bounded queue (app.core.logs)
+    log_level: str = "INFO"
+    log_format: str = "json"  # "json" (one object per line) or "text"
+    log_queue_size: int = 10000  # Records beyond this are dropped (and counted) under load
+    log_sample_rates: str = ""  # "logger=N;...": keep every Nth INFO record of these loggers
+
+    # State backend for rate limits and service caches:
+    # "memory" (per process) or "sqlite" (shared by all uvicorn workers on the host)
+    state_backend: str = "memory"
+    state_sqlite_path: str = "smartmirror_state.db"
+
+    @field_validator("weather_locations")
+    @classmethod
+    def _check_weather_locations(cls, value: str) -> str:
+        # Report a malformed WEATHER_LOCATIONS as a settings error, not a crash deep in an import
+        from app.services.weather.providers import parse_locations
+
+        parse_locations(value)
+        return value
+
+    @field_validator("log_sample_rates")
+    @classmethod
+    def _check_log_sample_rates(cls, value: str) -> str:
+        from app.core.logs import parse_sample_rates
+
+        parse_sample_rates(value)
+        return value
 
 
 settings = Settings()
@@ -0,0 +1,114 @@
+"""
+Per-request deadline budget
+
+DeadlineMiddleware sets the deadline of every HTTP request (X-Request-Timeout header
+in seconds, or REQUEST_DEADLINE_SECONDS) in a context variable; WebSocket requests
+get the default. Upstream calls await through within_deadline(), so each LLM attempt,
+retry and Yandex Music call only gets what is left of the budget, and an attempt that
+cannot finish in time is not started at all: the request fails with 504 instead of
+keeping the client waiting. Tasks started by the request inherit its deadline, except
+work shared with other requests or outliving it: start_detached() runs that without a
+deadline, and each request bounds only its own wait for the result.
+"""
+
+import asyncio
+import contextvars
+import time
+from contextvars import ContextVar
+from typing import Any, Awaitable, Coroutine, Optional, TypeVar
+
+from app.core.config import settings
+
+T = TypeVar("T")
+
+
+class DeadlineExceeded(Exception):
+    """The request's time budget ran out (reported to the client as 504)"""
+
+
+_deadline: ContextVar[Optional[float]] = ContextVar("deadline", default=None)
+
+
+def parse_timeout_header(value: Optional[str]) -> Optional[float]:
+    """Budget from X-Request-Timeout: seconds, capped at REQUEST_DEADLINE_MAX_SECONDS"""
+    if value is None:
+        return None
+    try:
+        budget = float(value)
+    except ValueError:
+        return None
+    if not budget > 0:
+        return None
+    return min(budget, settings.request_deadline_max_seconds)
+
+
+def start_deadline(budget: Optional[float] = None) -> Optional[float]:
+    """Set the current request's deadline budget seconds from now (default: settings)"""
+    if budget is None:
+        budget = settings.request_deadline_seconds
+    deadline = time.monotonic() + budget if budget > 0 else None
+    _deadline.set(deadline)
+    return deadline
+
+
+def remaining() -> Optional[float]:
+    """Seconds left for the current request, None when it has no deadline"""
+    deadline = _deadline.get()
+    if deadline is None:
+        return None
+    return deadline - time.monotonic()
+
+
+def ensure_budget(needed: float = 0.0, stage: str = "request") -> None:
+    """
+    Raise DeadlineExceeded unless at least needed seconds are left
+
+    Raises:
+        DeadlineExceeded: Not enough budget left to start the stage
+    """
+    left = remaining()
+    if left is not None and left < max(needed, 0.0):
+        raise DeadlineExceeded(f"Deadline exceeded before {stage} ({max(left, 0.0):.1f}s left)")
+
+
+async def within_deadline(
+    awaitable: Awaitable[T], stage: str = "request", timeout: Optional[float] = None
+) -> T:
+    """
+    Await, giving up when the request's deadline (or timeout, if shorter) passes
+
+    Raises:
+        DeadlineExceeded: The deadline passed first
+        asyncio.TimeoutError: The own timeout passed first
+    """
+    left = remaining()
+    if left is None and timeout is None:
+        return await awaitable
+    if left is not None and left <= 0:
+        if asyncio.iscoroutine(awaitable):
+            awaitable.close()
+        elif asyncio.isfuture(awaitable):
+            awaitable.cancel()
+        raise DeadlineExceeded(f"Deadline exceeded before {stage}")
+
+    deadline_first = timeout is None or (left is not None and left < timeout)
+    try:
+        return await asyncio.wait_for(awaitable, left if deadline_first else timeout)
+    except asyncio.TimeoutError:
+        if deadline_first:
+            raise DeadlineExceeded(f"Deadline exceeded during {stage}") from None
+        raise
+
+
+def start_detached(coro: Coroutine[Any, Any, T]) -> "asyncio.Task[T]":
+    """
+    Start coro as a task without the current request's deadline
+
+    For calls shared by concurrent requests (SingleFlight) and background work, which
+    must not be cut short by whichever request happened to start them. Other context
+    (the trace) is kept.
+    """
+    context = contextvars.copy_context()
+    context.run(_deadline.set, None)
+    # The task copies the context that is current when it is created
+    return context.run(asyncio.ensure_future, coro)
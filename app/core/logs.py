@@ -0,0 +1,213 @@
+"""
+Non-blocking logging: records go through a bounded queue to a writer thread
+
+The event loop only puts the record on a queue. Building the message from its
+%-style arguments, JSON serialization and the write to stdout (the systemd journal)
+all happen in the QueueListener thread. When the writer falls behind and the queue
+is full, new records are dropped and counted instead of blocking the loop.
+INFO and lower records of chatty loggers can be sampled: every Nth one is kept.
+
+Log with %-style arguments (logger.info('Found %s tracks', count)), not f-strings,
+so records that are sampled out or below the level are never formatted. Arguments
+are formatted later on the writer thread, so pass values, not objects that change.
+"""
+
+import atexit
+import json
+import logging
+import queue
+import sys
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+from typing import Dict, Optional
+
+from app.core.metrics import metrics
+
+TEXT_FORMAT = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+
+# Uvicorn installs its own synchronous handlers; their records are routed through the queue
+UVICORN_LOGGERS = ("uvicorn", "uvicorn.error", "uvicorn.access")
+
+log_records_dropped = metrics.counter(
+    "smartmirror_log_records_dropped_total",
+    "Log records dropped because the log queue was full",
+)
+log_records_sampled_out = metrics.counter(
+    "smartmirror_log_records_sampled_out_total",
+    "INFO and lower log records skipped by sampling",
+    ("logger",),
+)
+
+
+def parse_sample_rates(value: str) -> Dict[str, int]:
+    """
+    Parse sampling from settings: "logger=N" entries separated by ";"
+
+    Example: "uvicorn.access=10;httpx=5" keeps every 10th access log line and every
+    5th httpx request line (WARNING and above are always kept).
+
+    Raises:
+        ValueError: Malformed entry
+    """
+    rates = {}
+    for entry in value.split(";"):
+        if not entry.strip():
+            continue
+        name, _, rate = entry.partition("=")
+        try:
+            rates[name.strip()] = int(rate)
+        except ValueError:
+            raise ValueError(
+                f"Invalid log sample rate '{entry.strip()}': expected 'logger=N'"
+            ) from None
+        if not name.strip() or rates[name.strip()] < 1:
+            raise ValueError(f"Invalid log sample rate '{entry.strip()}': expected 'logger=N'")
+    return rates
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line: time, level, logger, message (and exception)"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "time": datetime.fromtimestamp(record.created, timezone.utc).isoformat(
+                timespec="milliseconds"
+            ),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        if record.stack_info:
+            entry["stack"] = self.formatStack(record.stack_info)
+        return json.dumps(entry, ensure_ascii=False)
+
+
+class SamplingFilter(logging.Filter):
+    """Keep every Nth INFO-or-lower record of configured loggers (and their children)"""
+
+    def __init__(self, rates: Dict[str, int]):
+        super().__init__()
+        self.rates = rates
+        self._rate_cache: Dict[str, int] = {}
+        self._seen: Dict[str, int] = {}
+
+    def _rate(self, name: str) -> int:
+        rate = self._rate_cache.get(name)
+        if rate is None:
+            rate = 1
+            candidate = name
+            while candidate:
+                if candidate in self.rates:
+                    rate = self.rates[candidate]
+                    break
+                candidate = candidate.rpartition(".")[0]
+            self._rate_cache[name] = rate
+        return rate
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno > logging.INFO:
+            return True
+        rate = self._rate(record.name)
+        if rate == 1:
+            return True
+        seen = self._seen.get(record.name, 0)
+        self._seen[record.name] = seen + 1
+        if seen % rate == 0:
+            return True
+        log_records_sampled_out.inc(record.name)
+        return False
+
+
+class NonBlockingQueueHandler(QueueHandler):
+    """QueueHandler that never blocks: formats nothing and drops records when full"""
+
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        # QueueHandler types self.queue as any put()-able object; keep the bounded queue
+        self.log_queue = log_queue
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Same process, so no need to pre-format for pickling: the writer thread does it
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+            log_records_dropped.inc()
+
+
+class LogPipeline:
+    """The queue handler installed on the root logger and its writer thread"""
+
+    def __init__(self, handler: NonBlockingQueueHandler, listener: QueueListener):
+        self.handler = handler
+        self.listener = listener
+        self._running = False
+
+    def start(self) -> None:
+        if not self._running:
+            self.listener.start()
+            self._running = True
+
+    def stop(self) -> None:
+        """Write out queued records and stop the writer thread"""
+        if self._running:
+            self._running = False
+            self.listener.stop()
+
+    def stats(self) -> dict:
+        return {
+            "running": self._running,
+            "queued": self.handler.log_queue.qsize(),
+            "queue_size": self.handler.log_queue.maxsize,
+            "dropped": self.handler.dropped,
+        }
+
+
+_pipeline: Optional[LogPipeline] = None
+
+
+def configure_logging(
+    level: str = "INFO",
+    fmt: str = "json",
+    queue_size: int = 10000,
+    sample_rates: str = "",
+) -> LogPipeline:
+    """
+    Route all logging through a bounded queue to a stdout writer thread
+
+    Replaces logging.basicConfig; calling it again replaces the previous pipeline.
+    """
+    global _pipeline
+    root = logging.getLogger()
+    if _pipeline is not None:
+        _pipeline.stop()
+        root.removeHandler(_pipeline.handler)
+
+    output = logging.StreamHandler(sys.stdout)
+    if fmt == "json":
+        output.setFormatter(JsonFormatter())
+    elif fmt == "text":
+        output.setFormatter(logging.Formatter(TEXT_FORMAT))
+    else:
+        raise ValueError(f"Unknown log format: {fmt}")
+
+    handler = NonBlockingQueueHandler(queue.Queue(maxsize=queue_size))
+    handler.addFilter(SamplingFilter(parse_sample_rates(sample_rates)))
+    root.addHandler(handler)
+    root.setLevel(level.upper())
+
+    for name in UVICORN_LOGGERS:
+        uvicorn_logger = logging.getLogger(name)
+        uvicorn_logger.handlers.clear()
+        uvicorn_logger.propagate = True
+
+    _pipeline = LogPipeline(handler, QueueListener(handler.log_queue, output))
+    _pipeline.start()
+    atexit.register(_pipeline.stop)
+    return _pipeline
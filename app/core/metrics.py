@@ -0,0 +1,181 @@
+"""
+In-process metrics: counters and fixed-bucket latency histograms
+
+Exported at /metrics in the Prometheus text format. Metrics are only updated from
+the event loop thread, so the hot path is a dict lookup and an increment with no
+locking; cumulative bucket counts are computed when /metrics is scraped.
+See benchmarks/metrics_bench.py for the per-request overhead.
+"""
+
+import math
+from bisect import bisect_left
+from typing import Dict, List, Sequence, Tuple, TypeVar, Union
+
+# Upper bounds in seconds; the +Inf bucket is implicit
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 20.0, 30.0)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _number(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    """Monotonic counter, optionally split by label values"""
+
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, *labels: str, amount: float = 1) -> None:
+        self._values[labels] = self._values.get(labels, 0) + amount
+
+    def value(self, *labels: str) -> float:
+        return self._values.get(labels, 0)
+
+    def samples(self) -> List[str]:
+        return [
+            f"{self.name}{_labels(self.labelnames, labels)} {_number(value)}"
+            for labels, value in self._values.items()
+        ]
+
+
+class Histogram:
+    """
+    Latency histogram with fixed buckets, optionally split by label values
+
+    observe() bumps one bucket (found by bisection) and the running sum.
+    """
+
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = LATENCY_BUCKETS,
+    ):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        # label values -> [per-bucket counts (last one is +Inf), sum]
+        self._values: Dict[Tuple[str, ...], list] = {}
+
+    def observe(self, value: float, *labels: str) -> None:
+        state = self._values.get(labels)
+        if state is None:
+            state = self._values[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+        state[0][bisect_left(self.buckets, value)] += 1
+        state[1] += value
+
+    def count(self, *labels: str) -> int:
+        state = self._values.get(labels)
+        return sum(state[0]) if state is not None else 0
+
+    def samples(self) -> List[str]:
+        lines = []
+        for labels, (counts, total) in self._values.items():
+            cumulative = 0
+            for bound, count in zip((*self.buckets, math.inf), counts):
+                cumulative += count
+                le = f'le="{_number(bound)}"'
+                lines.append(
+                    f"{self.name}_bucket{_labels(self.labelnames, labels, le)} {cumulative}"
+                )
+            lines.append(f"{self.name}_sum{_labels(self.labelnames, labels)} {total!r}")
+            lines.append(f"{self.name}_count{_labels(self.labelnames, labels)} {cumulative}")
+        return lines
+
+
+Metric = Union[Counter, Histogram]
+M = TypeVar("M", Counter, Histogram)
+
+
+class MetricsRegistry:
+    """Named metrics rendered together for /metrics"""
+
+    def __init__(self):
+        self._metrics: Dict[str, Metric] = {}
+
+    def _register(self, metric: M) -> M:
+        if metric.name in self._metrics:
+            raise ValueError(f"Metric {metric.name} is already registered")
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._register(Counter(name, documentation, labelnames))
+
+    def histogram(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = LATENCY_BUCKETS,
+    ) -> Histogram:
+        return self._register(Histogram(name, documentation, labelnames, buckets))
+
+    def render(self) -> str:
+        """All metrics in the Prometheus text exposition format"""
+        lines = []
+        for metric in self._metrics.values():
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.samples())
+        return "\n".join(lines) + "\n"
+
+
+# Singleton instance
+metrics = MetricsRegistry()
+
+http_request_duration = metrics.histogram(
+    "smartmirror_http_request_duration_seconds",
+    "HTTP request latency until the response is fully sent, by route template",
+    ("method", "route", "status"),
+)
+llm_upstream_duration = metrics.histogram(
+    "smartmirror_llm_upstream_duration_seconds",
+    "LLM provider call latency (time to first delta for streams)",
+    ("provider", "mode", "outcome"),
+)
+llm_profile_duration = metrics.histogram(
+    "smartmirror_llm_profile_duration_seconds",
+    "LLM call latency including retries and fallback, by completion profile"
+    " (time to first delta for streams)",
+    ("profile", "mode", "outcome"),
+)
+llm_upstream_errors = metrics.counter(
+    "smartmirror_llm_upstream_errors_total",
+    "Failed LLM provider calls by error type",
+    ("provider", "error"),
+)
+yandex_call_duration = metrics.histogram(
+    "smartmirror_yandex_call_duration_seconds",
+    "Yandex Music API call latency",
+    ("call", "outcome"),
+)
+rate_limit_rejections = metrics.counter(
+    "smartmirror_rate_limit_rejections_total",
+    "Requests rejected by a rate limit class",
+    ("limit",),
+)
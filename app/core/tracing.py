@@ -0,0 +1,186 @@
+"""
+Per-request stage timing
+
+TracingMiddleware starts a Trace for every HTTP request and keeps it in a context
+variable; code on the request path marks stages with `with span("detect"):`.
+Tasks started by the request inherit the context, so spans of concurrent stages
+(speculative answer, hedged providers) land in the same trace. Outside a request
+span() only does one context variable lookup.
+
+The breakdown is sent as a Server-Timing response header, and the slowest traces
+are kept for GET /debug/traces (TRACING_DEBUG_ENDPOINTS or DEBUG).
+"""
+
+import heapq
+import itertools
+import time
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from typing import Awaitable, Callable, List, Optional, Tuple, TypeVar
+
+from app.core.config import settings
+
+T = TypeVar("T")
+
+# Spans beyond this are counted but not kept (e.g. a retry storm)
+MAX_SPANS = 64
+
+
+class Trace:
+    """Stages of one request: (name, start, end) on the time.monotonic() clock"""
+
+    __slots__ = (
+        "method",
+        "path",
+        "status",
+        "streamed",
+        "started",
+        "ended",
+        "started_at",
+        "spans",
+        "dropped",
+    )
+
+    def __init__(self, method: str, path: str):
+        self.method = method
+        self.path = path
+        self.status: Optional[int] = None
+        self.streamed = False  # Body sent in several chunks (audio, SSE)
+        self.started = time.monotonic()
+        self.ended: Optional[float] = None
+        self.started_at = time.time()
+        self.spans: List[Tuple[str, float, float]] = []
+        self.dropped = 0
+
+    def add(self, name: str, started: float, ended: float) -> None:
+        if len(self.spans) < MAX_SPANS:
+            self.spans.append((name, started, ended))
+        else:
+            self.dropped += 1
+
+    def finish(self) -> None:
+        self.ended = time.monotonic()
+
+    @property
+    def duration(self) -> float:
+        ended = self.ended if self.ended is not None else time.monotonic()
+        return ended - self.started
+
+    def server_timing(self) -> str:
+        """Server-Timing header value: finished spans plus the time so far as 'total'"""
+        parts = [
+            f"{name};dur={(ended - started) * 1000:.1f}" for name, started, ended in self.spans
+        ]
+        parts.append(f"total;dur={self.duration * 1000:.1f}")
+        return ", ".join(parts)
+
+    def to_dict(self) -> dict:
+        return {
+            "method": self.method,
+            "path": self.path,
+            "status": self.status,
+            "started_at": datetime.fromtimestamp(self.started_at, timezone.utc).isoformat(
+                timespec="milliseconds"
+            ),
+            "duration_ms": round(self.duration * 1000, 1),
+            "spans": [
+                {
+                    "name": name,
+                    "start_ms": round((started - self.started) * 1000, 1),
+                    "duration_ms": round((ended - started) * 1000, 1),
+                }
+                for name, started, ended in self.spans
+            ],
+            "dropped_spans": self.dropped,
+        }
+
+
+_current_trace: ContextVar[Optional[Trace]] = ContextVar("trace", default=None)
+
+
+def current_trace() -> Optional[Trace]:
+    return _current_trace.get()
+
+
+def start_trace(method: str, path: str) -> Trace:
+    """Start tracing the current request (the context belongs to its task)"""
+    trace = Trace(method, path)
+    _current_trace.set(trace)
+    return trace
+
+
+def record_span(name: str, started: float) -> None:
+    """Add a stage that began at started (time.monotonic()) and ends now"""
+    trace = _current_trace.get()
+    if trace is not None:
+        trace.add(name, started, time.monotonic())
+
+
+class span:
+    """Context manager timing one stage of the current request"""
+
+    __slots__ = ("name", "trace", "started")
+
+    def __init__(self, name: str):
+        self.name = name
+
+    def __enter__(self) -> "span":
+        self.trace = _current_trace.get()
+        if self.trace is not None:
+            self.started = time.monotonic()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        if self.trace is not None:
+            self.trace.add(self.name, self.started, time.monotonic())
+
+
+async def traced(name: str, call: Callable[[], Awaitable[T]]) -> T:
+    """
+    Await call() inside a span (e.g. for a stage run as a separate task)
+
+    Takes a factory rather than a coroutine so nothing is created before the task
+    starts: a task cancelled before its first step leaves no un-awaited coroutine.
+    """
+    with span(name):
+        return await call()
+
+
+class SlowTraces:
+    """
+    The capacity slowest finished traces (a min-heap, so recording is O(log n))
+
+    Streamed responses are counted but not kept: an audio download or an SSE answer
+    lasts as long as the client reads, and would push out the slow LLM requests.
+    """
+
+    def __init__(self, capacity: int = 20):
+        self.capacity = capacity
+        self._heap: List[Tuple[float, int, Trace]] = []
+        self._order = itertools.count()
+        self.recorded = 0
+        self.streamed = 0
+
+    def record(self, trace: Trace) -> None:
+        self.recorded += 1
+        if trace.streamed:
+            self.streamed += 1
+            return
+        if self.capacity <= 0:
+            return
+        item = (trace.duration, next(self._order), trace)
+        if len(self._heap) < self.capacity:
+            heapq.heappush(self._heap, item)
+        elif item[0] > self._heap[0][0]:
+            heapq.heapreplace(self._heap, item)
+
+    def snapshot(self) -> List[dict]:
+        """Kept traces, slowest first"""
+        return [trace.to_dict() for _, _, trace in sorted(self._heap, reverse=True)]
+
+    def clear(self) -> None:
+        self._heap.clear()
+
+
+# Singleton instance
+slow_traces = SlowTraces(settings.tracing_slow_traces)
@@ -0,0 +1,246 @@
+"""
+Pluggable state backends for rate limiting and service caches
+
+- memory: per-process state (default, single uvicorn worker)
+- sqlite: a local SQLite file in WAL mode shared by all worker processes on the host,
+  so `uvicorn --workers N` keeps the same limits and warm caches without an external
+  server. Calls are synchronous but touch a local file only (well under a millisecond).
+"""
+
+import logging
+import sqlite3
+from abc import ABC, abstractmethod
+import threading
+import time
+from collections import OrderedDict
+from contextlib import AbstractContextManager, contextmanager, nullcontext
+from typing import Iterator, List, Optional, Tuple
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+_NO_TRANSACTION = nullcontext()
+
+# Errors a backend raises under cross-process contention ("database is locked");
+# callers fail open on these instead of failing the request
+BACKEND_ERRORS = (sqlite3.Error,)
+
+
+class StateBackend(ABC):
+    """
+    Interface for state shared between requests (and possibly processes)
+
+    Rate limit window indexes are derived from wall-clock time, for the same reason
+    as cache expiry: monotonic clocks are not comparable between processes.
+    """
+
+    # Whether state is visible to other processes; in-process caches only consult
+    # shared backends, since for the memory backend they already are the state
+    shared = False
+
+    def transaction(self) -> AbstractContextManager:
+        """Group operations so check-then-update is atomic across processes"""
+        return _NO_TRANSACTION
+
+    # Rate limiting: sliding-window counters
+    @abstractmethod
+    def rate_counters(self, key: str, window_index: int) -> Tuple[int, int]:
+        """Hits of key in (current, previous) window"""
+
+    @abstractmethod
+    def rate_hit(self, key: str, window_index: int) -> None:
+        """Record one hit of key in the current window"""
+
+    @abstractmethod
+    def rate_keys(self) -> int:
+        """Number of tracked rate limit keys"""
+
+    # Service caches: serialized values with expiry
+    def cache_get(self, namespace: str, key: str) -> Optional[Tuple[str, Optional[float]]]:
+        """(value, expires_at as wall-clock time.time() or None), None if missing/expired"""
+        return None
+
+    def cache_set(self, namespace: str, key: str, value: str, ttl: Optional[float]) -> None:
+        pass
+
+    def close(self) -> None:
+        pass
+
+
+class MemoryStateBackend(StateBackend):
+    """Per-process state: rate limit counters in an LRU table bounded by max_keys"""
+
+    def __init__(self, max_keys: int = 10000):
+        self.max_keys = max_keys
+        # key -> [window_index, current_count, previous_count]
+        self._counters: 'OrderedDict[str, List[int]]' = OrderedDict()
+        self.evictions = 0
+
+    def _counter(self, key: str, window_index: int) -> List[int]:
+        counter = self._counters.get(key)
+        if counter is None:
+            counter = [window_index, 0, 0]
+            self._counters[key] = counter
+            if len(self._counters) > self.max_keys:
+                self._counters.popitem(last=False)
+                self.evictions += 1
+            return counter
+
+        self._counters.move_to_end(key)
+        if counter[0] != window_index:
+            # Roll windows forward; anything older than one window no longer counts
+            counter[2] = counter[1] if counter[0] == window_index - 1 else 0
+            counter[1] = 0
+            counter[0] = window_index
+        return counter
+
+    def rate_counters(self, key: str, window_index: int) -> Tuple[int, int]:
+        _, current, previous = self._counter(key, window_index)
+        return current, previous
+
+    def rate_hit(self, key: str, window_index: int) -> None:
+        self._counter(key, window_index)[1] += 1
+
+    def rate_keys(self) -> int:
+        return len(self._counters)
+
+
+class SQLiteStateBackend(StateBackend):
+    """State in a local SQLite database (WAL mode) shared by all processes on the host"""
+
+    shared = True
+
+    # Drop stale rate limit rows / expired cache rows every N writes
+    PRUNE_EVERY = 1000
+    # Calls run on the event loop: wait briefly for a busy writer, then give up
+    # (callers fail open) rather than stall every request
+    BUSY_TIMEOUT = 0.2
+
+    def __init__(self, path: str):
+        self.path = path
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.RLock()
+        self._hits_since_prune = 0
+        self._sets_since_prune = 0
+        self.evictions = 0
+
+    @property
+    def conn(self) -> sqlite3.Connection:
+        if self._conn is None:
+            conn = sqlite3.connect(
+                self.path,
+                timeout=self.BUSY_TIMEOUT,
+                isolation_level=None,
+                check_same_thread=False,
+            )
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS rate_limit ('
+                ' key TEXT PRIMARY KEY, window INTEGER, current INTEGER, previous INTEGER)'
+            )
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS cache ('
+                ' namespace TEXT, key TEXT, value TEXT, expires_at REAL,'
+                ' PRIMARY KEY (namespace, key))'
+            )
+            self._conn = conn
+            logger.info('SQLite state backend opened: %s', self.path)
+        return self._conn
+
+    @contextmanager
+    def transaction(self) -> Iterator[None]:
+        with self._lock:
+            conn = self.conn
+            if conn.in_transaction:
+                # Nested: the outer transaction already holds the write lock
+                yield
+                return
+            conn.execute('BEGIN IMMEDIATE')
+            try:
+                yield
+            except BaseException:
+                conn.execute('ROLLBACK')
+                raise
+            conn.execute('COMMIT')
+
+    def rate_counters(self, key: str, window_index: int) -> Tuple[int, int]:
+        with self._lock:
+            row = self.conn.execute(
+                'SELECT window, current, previous FROM rate_limit WHERE key = ?', (key,)
+            ).fetchone()
+        if row is None:
+            return 0, 0
+        window, current, previous = row
+        if window == window_index:
+            return current, previous
+        if window == window_index - 1:
+            return 0, current
+        return 0, 0
+
+    def rate_hit(self, key: str, window_index: int) -> None:
+        with self.transaction():
+            current, previous = self.rate_counters(key, window_index)
+            self.conn.execute(
+                'INSERT OR REPLACE INTO rate_limit (key, window, current, previous)'
+                ' VALUES (?, ?, ?, ?)',
+                (key, window_index, current + 1, previous),
+            )
+            self._hits_since_prune += 1
+            if self._hits_since_prune >= self.PRUNE_EVERY:
+                self._hits_since_prune = 0
+                cursor = self.conn.execute(
+                    'DELETE FROM rate_limit WHERE window < ?', (window_index - 1,)
+                )
+                self.evictions += cursor.rowcount
+
+    def rate_keys(self) -> int:
+        with self._lock:
+            return int(self.conn.execute('SELECT COUNT(*) FROM rate_limit').fetchone()[0])
+
+    def cache_get(self, namespace: str, key: str) -> Optional[Tuple[str, Optional[float]]]:
+        with self._lock:
+            row = self.conn.execute(
+                'SELECT value, expires_at FROM cache WHERE namespace = ? AND key = ?',
+                (namespace, key),
+            ).fetchone()
+        if row is None:
+            return None
+        value, expires_at = row
+        # Wall-clock time: monotonic clocks are not comparable between processes
+        if expires_at is not None and expires_at <= time.time():
+            return None
+        return value, expires_at
+
+    def cache_set(self, namespace: str, key: str, value: str, ttl: Optional[float]) -> None:
+        expires_at = time.time() + ttl if ttl is not None else None
+        with self.transaction():
+            self.conn.execute(
+                'INSERT OR REPLACE INTO cache (namespace, key, value, expires_at)'
+                ' VALUES (?, ?, ?, ?)',
+                (namespace, key, value, expires_at),
+            )
+            self._sets_since_prune += 1
+            if self._sets_since_prune >= self.PRUNE_EVERY:
+                self._sets_since_prune = 0
+                self.conn.execute('DELETE FROM cache WHERE expires_at <= ?', (time.time(),))
+
+    def close(self) -> None:
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+
+def create_state_backend(backend: str) -> StateBackend:
+    """Create state backend by name ("memory" or "sqlite")"""
+    if backend == 'sqlite':
+        return SQLiteStateBackend(settings.state_sqlite_path)
+    if backend != 'memory':
+        raise ValueError(f'Unknown state backend: {backend}')
+    return MemoryStateBackend(max_keys=settings.rate_limit_max_keys)
+
+
+# Singleton instance
+state_backend = create_state_backend(settings.state_backend)
@@ -1,14 +1,30 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, Response
 from fastapi.middleware.cors import CORSMiddleware
 import logging
 
 from app.core.config import settings
-from app.api.endpoints import llm, music
+from app.core.logs import configure_logging
+from app.core.metrics import CONTENT_TYPE as METRICS_CONTENT_TYPE, metrics
+from app.core.tracing import slow_traces
+from app.api.endpoints import llm, music, weather, ws
+from app.api.middleware.deadline import DeadlineMiddleware
+from app.api.middleware.metrics import MetricsMiddleware
 from app.api.middleware.rate_limit import RateLimitMiddleware
+from app.api.middleware.tracing import TracingMiddleware
+from app.database.state import state_backend
+from app.services.llm.deepseek import deepseek_service
+from app.services.llm.intent import intent_classifier
+from app.services.music.audio import audio_proxy
+from app.services.music.prefetch import stream_prefetcher
+from app.services.music.yandex import yandex_music_service
+from app.services.weather.service import weather_service
 
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+# Configure logging (records are formatted and written by a background thread)
+log_pipeline = configure_logging(
+    level=settings.log_level,
+    fmt=settings.log_format,
+    queue_size=settings.log_queue_size,
+    sample_rates=settings.log_sample_rates,
 )
 
 logger = logging.getLogger(__name__)
@@ -31,15 +47,31 @@ if settings.rate_limit_enabled:
         RateLimitMiddleware,
         requests_per_minute=settings.rate_limit_requests_per_minute,
         llm_requests_per_minute=settings.rate_limit_llm_requests_per_minute,
+        max_keys=settings.rate_limit_max_keys,
+        backend=state_backend,
     )
     logger.info(
         f"Rate limiting enabled: {settings.rate_limit_requests_per_minute} req/min overall, "
-        f"{settings.rate_limit_llm_requests_per_minute} req/min for LLM"
+        f"{settings.rate_limit_llm_requests_per_minute} req/min for LLM, "
+        f"state backend: {settings.state_backend}"
     )
 
+# Per-route latency (added last, so it is outermost and sees rate-limited requests too)
+if settings.metrics_enabled:
+    app.add_middleware(MetricsMiddleware)
+
+# Deadline budget of each request (X-Request-Timeout or REQUEST_DEADLINE_SECONDS)
+app.add_middleware(DeadlineMiddleware)
+
+# Stage timing (Server-Timing header), around everything else
+if settings.tracing_enabled:
+    app.add_middleware(TracingMiddleware)
+
 # Include routers
 app.include_router(llm.router, prefix="/api")
 app.include_router(music.router, prefix="/api")
+app.include_router(weather.router, prefix="/api")
+app.include_router(ws.router)
 
 
 @app.get("/")
@@ -50,20 +82,62 @@ async def root():
 
 @app.get("/health")
 async def health():
-    """Health check endpoint"""
-    return {"status": "ok"}
+    """Health check endpoint (music_ready: Yandex Music client initialized)"""
+    return {"status": "ok", "music_ready": yandex_music_service.ready}
+
+
+@app.get("/metrics", include_in_schema=False)
+async def prometheus_metrics():
+    """Metrics in the Prometheus text format"""
+    return Response(content=metrics.render(), media_type=METRICS_CONTENT_TYPE)
+
+
+# Unauthenticated, so only registered on request (traces show what clients asked)
+if settings.debug or settings.tracing_debug_endpoints:
+
+    @app.get("/debug/traces", include_in_schema=False)
+    async def debug_traces():
+        """Slowest request traces with per-stage timing, slowest first"""
+        return {
+            "enabled": settings.tracing_enabled,
+            "recorded": slow_traces.recorded,
+            "streamed": slow_traces.streamed,
+            "traces": slow_traces.snapshot(),
+        }
+
+    @app.delete("/debug/traces", include_in_schema=False)
+    async def clear_debug_traces():
+        """Forget kept traces (e.g. after warm-up)"""
+        slow_traces.clear()
+        return {"status": "ok"}
 
 
 @app.on_event("startup")
 async def startup_event():
     """Startup event handler"""
+    log_pipeline.start()
     logger.info("=" * 50)
     logger.info("SmartMirror Backend starting...")
-    logger.info(f"Debug mode: {settings.debug}")
+    logger.info("Debug mode: %s", settings.debug)
     logger.info("=" * 50)
 
+    await deepseek_service.startup()
+    weather_service.start()
+    yandex_music_service.start()
+
 
 @app.on_event("shutdown")
 async def shutdown_event():
     """Shutdown event handler"""
     logger.info("SmartMirror Backend shutting down...")
+
+    await stream_prefetcher.close()
+    await audio_proxy.close()
+    await yandex_music_service.close()
+    await weather_service.close()
+    await deepseek_service.close()
+    if intent_classifier is not None:
+        # Keep what the classifier learned from LLM detection results
+        intent_classifier.persist(settings.llm_intent_model_path, settings.llm_intent_examples_path)
+    state_backend.close()
+    log_pipeline.stop()
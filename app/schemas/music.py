@@ -39,3 +39,30 @@ class TrackStreamResponse(BaseModel):
 
     class Config:
         json_schema_extra = {"example": {"stream_url": "https://storage.mds.yandex.net/..."}}
+
+
+class TrackBatchStreamRequest(BaseModel):
+    """Batch stream URL request"""
+
+    track_ids: List[str] = Field(..., min_length=1, description="Track IDs from search results")
+
+    class Config:
+        json_schema_extra = {"example": {"track_ids": ["123456", "654321"]}}
+
+
+class TrackStreamResult(BaseModel):
+    """Stream URL or error for one track of a batch"""
+
+    track_id: str = Field(..., description="Track ID")
+    stream_url: Optional[str] = Field(None, description="Direct download/stream URL")
+    error: Optional[str] = Field(None, description="Error message if the URL could not be resolved")
+
+
+class TrackBatchStreamResponse(BaseModel):
+    """Batch stream URL response"""
+
+    results: List[TrackStreamResult] = Field(
+        default_factory=list, description="Per-track results in request order"
+    )
+    resolved: int = Field(0, description="Number of resolved tracks")
+    failed: int = Field(0, description="Number of failed tracks")
@@ -0,0 +1,63 @@
+from pydantic import BaseModel, Field
+from typing import List, Optional
+
+
+class CurrentWeather(BaseModel):
+    """Current weather conditions"""
+
+    temperature: float = Field(..., description="Air temperature, °C")
+    apparent_temperature: Optional[float] = Field(None, description="Feels like, °C")
+    humidity: Optional[float] = Field(None, description="Relative humidity, %")
+    wind_speed: Optional[float] = Field(None, description="Wind speed, m/s")
+    weather_code: int = Field(..., description="WMO weather code")
+    description: str = Field(..., description="Weather description")
+
+
+class DailyForecast(BaseModel):
+    """Forecast for one day"""
+
+    date: str = Field(..., description="Date (YYYY-MM-DD, local time of the location)")
+    temperature_min: float = Field(..., description="Minimum temperature, °C")
+    temperature_max: float = Field(..., description="Maximum temperature, °C")
+    weather_code: int = Field(..., description="WMO weather code")
+    description: str = Field(..., description="Weather description")
+
+
+class WeatherResponse(BaseModel):
+    """Weather response schema"""
+
+    location: str = Field(..., description="Location name")
+    latitude: float = Field(..., description="Latitude")
+    longitude: float = Field(..., description="Longitude")
+    current: CurrentWeather = Field(..., description="Current conditions")
+    daily: List[DailyForecast] = Field(default_factory=list, description="Daily forecast")
+    provider: str = Field(..., description="Weather data provider")
+    updated_at: str = Field(..., description="When the data was fetched (ISO 8601, UTC)")
+
+    class Config:
+        json_schema_extra = {
+            "example": {
+                "location": "Москва",
+                "latitude": 55.7558,
+                "longitude": 37.6173,
+                "current": {
+                    "temperature": 12.3,
+                    "apparent_temperature": 10.1,
+                    "humidity": 71,
+                    "wind_speed": 3.4,
+                    "weather_code": 3,
+                    "description": "Пасмурно",
+                },
+                "daily": [
+                    {
+                        "date": "2026-10-17",
+                        "temperature_min": 8.1,
+                        "temperature_max": 14.0,
+                        "weather_code": 61,
+                        "description": "Дождь",
+                    }
+                ],
+                "provider": "open-meteo",
+                "updated_at": "2026-10-17T12:00:00+00:00",
+            }
+        }
@@ -0,0 +1,44 @@
+import hashlib
+import json
+from typing import List, Optional
+
+from app.core.config import settings
+from app.database.state import state_backend
+from app.utils.cache import LRUCache
+from app.utils.text import normalize_text
+
+
+def response_cache_key(
+    text: str,
+    system_prompt: Optional[str],
+    model: str,
+    temperature: float,
+    history: Optional[List[dict]] = None,
+    max_tokens: Optional[int] = None,
+) -> str:
+    """
+    Cache key for LLM response: normalized text + system prompt + model + temperature
+    + max_tokens, plus earlier conversation messages if the answer depends on them
+    """
+    raw = json.dumps(
+        [normalize_text(text), system_prompt or '', model, temperature, max_tokens, history or []],
+        ensure_ascii=False,
+    )
+    return hashlib.sha1(raw.encode('utf-8')).hexdigest()
+
+
+# Answers to repeated questions (greetings, weather, jokes): key -> (text, provider)
+response_cache = LRUCache(
+    max_bytes=settings.llm_cache_max_bytes,
+    ttl=settings.llm_cache_ttl_seconds,
+    backend=state_backend,
+    namespace='llm_responses',
+)
+
+# Music intent detection results: normalized text -> music query ('' for "not music")
+detection_cache = LRUCache(
+    max_bytes=settings.llm_detection_cache_max_bytes,
+    ttl=settings.llm_detection_cache_ttl_seconds,
+    backend=state_backend,
+    namespace='llm_detection',
+)
@@ -1,13 +1,45 @@
 import httpx
-from typing import Optional
+import importlib.util
+from dataclasses import dataclass
+from typing import AsyncGenerator, AsyncIterator, Dict, List, Optional, Tuple
+import json
 import logging
 import asyncio
+import time
 
 from app.core.config import settings
+from app.core.deadline import DeadlineExceeded, ensure_budget, remaining, within_deadline
+from app.core.metrics import llm_profile_duration, llm_upstream_duration, llm_upstream_errors
+from app.core.tracing import record_span
+from app.services.llm.cache import response_cache, response_cache_key
+from app.services.llm.profiles import FULL, SHORT, ModelProfile, profile_selector
+from app.services.llm.routing import ProviderRouter
+from app.utils.singleflight import SingleFlight
 
 logger = logging.getLogger(__name__)
 
 
+def _http2_available() -> bool:
+    """Check whether the optional h2 package needed for HTTP/2 is installed"""
+    return importlib.util.find_spec('h2') is not None
+
+
+@dataclass
+class LLMCompletion:
+    """Completion text together with the provider that produced it and token usage"""
+
+    text: str
+    provider: str
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    cached: bool = False
+    finish_reason: Optional[str] = None  # 'length': cut off at max_tokens
+
+    @property
+    def total_tokens(self) -> int:
+        return self.prompt_tokens + self.completion_tokens
+
+
 class DeepSeekService:
     """Service for interacting with DeepSeek API with fallback and retry"""
 
@@ -25,118 +57,635 @@ class DeepSeekService:
         self.timeout = settings.deepseek_timeout
         self.max_retries = settings.llm_max_retries
 
-        # Response limits
-        self.max_tokens = settings.deepseek_max_tokens
-        self.temperature = settings.deepseek_temperature
+        # Provider health (EWMA latency / error rate), circuit breakers and hedging
+        self.router = ProviderRouter()
 
-    async def _try_provider(
-        self, api_key: str, base_url: str, model: str, messages: list, provider_name: str
-    ) -> str:
-        """Try to get response from a specific provider"""
-        if not api_key:
-            raise ValueError(f'{provider_name} API key not configured')
+        # Identical questions arriving at the same time share one upstream call
+        self.inflight = SingleFlight()
+
+        # Response limits: max_tokens/temperature (and optionally model) per kind of call
+        self.profiles = profile_selector
+        self._profile_calls: Dict[str, Dict[str, float]] = {}
+
+        # Connection pool: one long-lived client per provider, so keep-alive
+        # connections (and their TLS sessions) are reused between queries
+        self.http2 = settings.llm_http2
+        self.limits = httpx.Limits(
+            max_connections=settings.llm_pool_max_connections,
+            max_keepalive_connections=settings.llm_pool_max_keepalive_connections,
+            keepalive_expiry=settings.llm_pool_keepalive_expiry,
+        )
+        self._clients: Dict[str, httpx.AsyncClient] = {}
+        self._transports: Dict[str, httpx.AsyncHTTPTransport] = {}
+        self._http2_enabled: Dict[str, bool] = {}
+        self._requests_total: Dict[str, int] = {}
+        self._requests_in_flight: Dict[str, int] = {}
+
+    def _create_client(self, provider_name: str) -> httpx.AsyncClient:
+        """Create pooled HTTP client for a provider"""
+        http2 = self.http2
+        if http2 and not _http2_available():
+            logger.warning('HTTP/2 requested but "h2" package is not installed, using HTTP/1.1')
+            http2 = False
+
+        transport = httpx.AsyncHTTPTransport(http2=http2, limits=self.limits)
+        client = httpx.AsyncClient(transport=transport, timeout=self.timeout)
+        self._transports[provider_name] = transport
+        self._http2_enabled[provider_name] = http2
+        self._clients[provider_name] = client
+        self._requests_total.setdefault(provider_name, 0)
+        self._requests_in_flight.setdefault(provider_name, 0)
+        return client
+
+    def _get_client(self, provider_name: str) -> httpx.AsyncClient:
+        """Get pooled client for a provider, creating it lazily if startup was skipped"""
+        client = self._clients.get(provider_name)
+        if client is None or client.is_closed:
+            client = self._create_client(provider_name)
+        return client
+
+    async def startup(self):
+        """Create pooled clients for configured providers (called on app startup)"""
+        if self.primary_api_key:
+            self._get_client('artemox')
+        if self.fallback_api_key:
+            self._get_client('deepseek')
+        logger.info(
+            f'LLM HTTP pool ready: providers={list(self._clients)}, http2={self.http2}, '
+            f'max_connections={self.limits.max_connections}, '
+            f'max_keepalive={self.limits.max_keepalive_connections}'
+        )
+
+    async def close(self):
+        """Close pooled clients (called on app shutdown)"""
+        for client in self._clients.values():
+            await client.aclose()
+        self._clients.clear()
+        self._transports.clear()
+
+    def pool_stats(self) -> dict:
+        """
+        Connection pool statistics per provider
+
+        Returns:
+            dict: {provider: {connections, idle, active, requests_total, ...}}
+        """
+        stats = {}
+        for provider_name, transport in self._transports.items():
+            # httpcore keeps the pool behind the transport; connection objects
+            # expose is_idle() / is_closed() which is all we need for sizing
+            pool = getattr(transport, '_pool', None)
+            connections = list(getattr(pool, 'connections', []))
+            idle = sum(1 for conn in connections if conn.is_idle())
+            stats[provider_name] = {
+                'connections': len(connections),
+                'idle': idle,
+                'active': len(connections) - idle,
+                'http2': self._http2_enabled.get(provider_name, False),
+                'requests_total': self._requests_total.get(provider_name, 0),
+                'requests_in_flight': self._requests_in_flight.get(provider_name, 0),
+                'max_connections': self.limits.max_connections,
+                'max_keepalive_connections': self.limits.max_keepalive_connections,
+            }
+        return stats
+
+    def _providers(self) -> List[Tuple[str, str, str, str]]:
+        """Providers in preference order: (name, api_key, base_url, model)"""
+        providers = [('artemox', self.primary_api_key, self.primary_base_url, self.primary_model)]
+        if self.fallback_api_key:
+            providers.append(
+                ('deepseek', self.fallback_api_key, self.fallback_base_url, self.fallback_model)
+            )
+        return providers
+
+    @staticmethod
+    def _build_messages(
+        text: str, system_prompt: Optional[str] = None, history: Optional[List[dict]] = None
+    ) -> list:
+        """Build chat messages: system prompt, earlier conversation turns, user text"""
+        messages = []
+        if system_prompt:
+            messages.append({'role': 'system', 'content': system_prompt})
+        if history:
+            messages.extend(history)
+        messages.append({'role': 'user', 'content': text})
+        return messages
 
+    def _build_payload(
+        self, model: str, messages: list, profile: ModelProfile, stream: bool = False
+    ) -> dict:
+        """Build /chat/completions request body (the profile may override the model)"""
         payload = {
-            'model': model,
+            'model': profile.model or model,
             'messages': messages,
-            'temperature': self.temperature,
-            'max_tokens': self.max_tokens,
+            'temperature': profile.temperature,
+            'max_tokens': profile.max_tokens,
         }
+        if stream:
+            payload['stream'] = True
+        return payload
+
+    async def _try_provider(
+        self,
+        api_key: str,
+        base_url: str,
+        model: str,
+        messages: list,
+        provider_name: str,
+        profile: ModelProfile,
+    ) -> LLMCompletion:
+        """Try to get response from a specific provider"""
+        if not api_key:
+            raise ValueError(f'{provider_name} API key not configured')
 
+        payload = self._build_payload(model, messages, profile)
         headers = {'Authorization': f'Bearer {api_key}', 'Content-Type': 'application/json'}
 
-        async with httpx.AsyncClient(timeout=self.timeout) as client:
+        client = self._get_client(provider_name)
+        self._requests_total[provider_name] += 1
+        self._requests_in_flight[provider_name] += 1
+        try:
             response = await client.post(
                 f'{base_url}/chat/completions', json=payload, headers=headers
             )
-            response.raise_for_status()
+        finally:
+            self._requests_in_flight[provider_name] -= 1
+        response.raise_for_status()
 
-            data = response.json()
+        data = response.json()
 
-            # Extract response text
-            if 'choices' in data and len(data['choices']) > 0:
-                return data['choices'][0]['message']['content']
-            else:
-                logger.error(f'Unexpected API response format from {provider_name}: {data}')
-                raise ValueError(f'Invalid response format from {provider_name} API')
+        # Extract response text
+        if 'choices' in data and len(data['choices']) > 0:
+            usage = data.get('usage') or {}
+            choice = data['choices'][0]
+            return LLMCompletion(
+                text=choice['message']['content'],
+                provider=provider_name,
+                prompt_tokens=usage.get('prompt_tokens', 0),
+                completion_tokens=usage.get('completion_tokens', 0),
+                finish_reason=choice.get('finish_reason'),
+            )
+        else:
+            logger.error(f'Unexpected API response format from {provider_name}: {data}')
+            raise ValueError(f'Invalid response format from {provider_name} API')
 
-    async def query(self, text: str, system_prompt: Optional[str] = None) -> str:
+    async def query(
+        self,
+        text: str,
+        system_prompt: Optional[str] = None,
+        use_cache: bool = True,
+        history: Optional[List[dict]] = None,
+        profile: Optional[str] = None,
+    ) -> str:
         """
         Send query to DeepSeek API with fallback and retry
 
+        Args:
+            text: User query text
+            system_prompt: Optional system prompt for context
+            use_cache: Look up and store the answer in the response cache
+            history: Earlier conversation messages to send before the text
+            profile: Completion profile name (default: chosen from the text)
+
+        Returns:
+            str: LLM response text
+        """
+        completion = await self.complete(
+            text=text,
+            system_prompt=system_prompt,
+            use_cache=use_cache,
+            history=history,
+            profile=profile,
+        )
+        return completion.text
+
+    def _cache_key(
+        self,
+        text: str,
+        system_prompt: Optional[str],
+        profile: ModelProfile,
+        history: Optional[List[dict]] = None,
+    ) -> str:
+        return response_cache_key(
+            text,
+            system_prompt,
+            profile.model or self.primary_model,
+            profile.temperature,
+            history=history,
+            max_tokens=profile.max_tokens,
+        )
+
+    def _record_profile(self, profile: ModelProfile, mode: str, started: float, ok: bool) -> None:
+        """Per-profile latency of a call (streams: until the first delta)"""
+        latency = time.monotonic() - started
+        llm_profile_duration.observe(latency, profile.name, mode, 'ok' if ok else 'error')
+        calls = self._profile_calls.setdefault(
+            profile.name, {'requests': 0, 'errors': 0, 'latency_seconds': 0.0, 'length_retries': 0}
+        )
+        calls['requests'] += 1
+        if ok:
+            calls['latency_seconds'] += latency
+        else:
+            calls['errors'] += 1
+
+    def profile_stats(self) -> dict:
+        """Completion profiles with their call counts and mean latency (uncached calls)"""
+        stats = {}
+        for name, profile in self.profiles.profiles.items():
+            calls = self._profile_calls.get(name, {})
+            succeeded = calls.get('requests', 0) - calls.get('errors', 0)
+            stats[name] = {
+                'max_tokens': profile.max_tokens,
+                'temperature': profile.temperature,
+                'model': profile.model,
+                'requests': calls.get('requests', 0),
+                'errors': calls.get('errors', 0),
+                'length_retries': calls.get('length_retries', 0),
+                'mean_latency_ms': round(calls['latency_seconds'] / succeeded * 1000, 1)
+                if succeeded
+                else None,
+            }
+        return {'enabled': self.profiles.enabled, 'profiles': stats}
+
+    async def complete(
+        self,
+        text: str,
+        system_prompt: Optional[str] = None,
+        use_cache: bool = True,
+        history: Optional[List[dict]] = None,
+        profile: Optional[str] = None,
+    ) -> LLMCompletion:
+        """
+        Send query to DeepSeek API with fallback and retry, keeping token usage
+
         Strategy:
+        0. Serve repeated questions from the response cache; join an identical
+           query that is already in flight
         1. Try primary provider (artemox) with retry
         2. If fails, fallback to secondary provider (deepseek) with retry
 
         Args:
             text: User query text
             system_prompt: Optional system prompt for context
+            use_cache: Look up and store the answer in the response cache
+            history: Earlier conversation messages to send before the text
+            profile: Completion profile name (default: chosen from the text)
 
         Returns:
-            str: LLM response text
+            LLMCompletion: LLM response text with provider and token usage
 
         Raises:
             Exception: If all providers fail
         """
-        # Prepare messages
-        messages = []
-        if system_prompt:
-            messages.append({'role': 'system', 'content': system_prompt})
-        messages.append({'role': 'user', 'content': text})
+        use_cache = use_cache and settings.llm_cache_enabled
+        selected = self.profiles.select(text, profile)
+        cache_key = self._cache_key(text, system_prompt, selected, history)
+        if use_cache:
+            cached = response_cache.get(cache_key)
+            if cached is not None:
+                logger.info('LLM response served from cache')
+                # Cached copies cost nothing, so report zero token usage
+                cached_text, cached_provider = cached
+                return LLMCompletion(text=cached_text, provider=cached_provider, cached=True)
+
+        messages = self._build_messages(text, system_prompt, history)
+        started = time.monotonic()
+        try:
+            completion: LLMCompletion = await self.inflight.do(
+                cache_key, lambda: self._complete_uncached(messages, selected)
+            )
+        except Exception:
+            self._record_profile(selected, 'complete', started, ok=False)
+            raise
+        self._record_profile(selected, 'complete', started, ok=True)
 
+        if selected.name == SHORT and completion.finish_reason == 'length':
+            # The short profile cut the answer off: ask again with the full one, and
+            # cache the full answer under this key too so the next ask goes straight to it
+            self._profile_calls[SHORT]['length_retries'] += 1
+            completion = await self.complete(text, system_prompt, use_cache, history, FULL)
+
+        if use_cache:
+            response_cache.set(cache_key, (completion.text, completion.provider))
+        return completion
+
+    def _available_providers(self) -> List[Tuple[str, str, str, str]]:
+        """Providers in preference order, skipping those with an open circuit breaker"""
+        return [p for p in self._providers() if self.router.health(p[0]).is_available()]
+
+    async def _timed_try(
+        self, provider: Tuple[str, str, str, str], messages: list, profile: ModelProfile
+    ) -> LLMCompletion:
+        """Call provider, feeding latency and outcome into its health tracker"""
+        provider_name, api_key, base_url, model = provider
+        health = self.router.health(provider_name)
+        health.begin_request()
+        started = time.monotonic()
+        try:
+            result = await within_deadline(
+                self._try_provider(api_key, base_url, model, messages, provider_name, profile),
+                stage=f'{provider_name} answer',
+            )
+        except asyncio.CancelledError:
+            health.record_cancelled()
+            llm_upstream_duration.observe(
+                time.monotonic() - started, provider_name, 'complete', 'cancelled'
+            )
+            raise
+        except DeadlineExceeded:
+            # Out of budget is not the provider's failure
+            health.record_cancelled()
+            llm_upstream_duration.observe(
+                time.monotonic() - started, provider_name, 'complete', 'deadline'
+            )
+            raise
+        except Exception as e:
+            health.record_failure()
+            llm_upstream_duration.observe(
+                time.monotonic() - started, provider_name, 'complete', 'error'
+            )
+            llm_upstream_errors.inc(provider_name, type(e).__name__)
+            raise
+        finally:
+            record_span(f'llm.{provider_name}', started)
+        latency = time.monotonic() - started
+        health.record_success(latency)
+        llm_upstream_duration.observe(latency, provider_name, 'complete', 'ok')
+        return result
+
+    async def _hedged_complete(
+        self, providers: List[Tuple[str, str, str, str]], messages: list, profile: ModelProfile
+    ) -> LLMCompletion:
+        """
+        Race providers: start with the first one, and if it has not answered by its
+        p90 latency (or has failed), start the next. First successful answer wins,
+        the rest are cancelled.
+        """
+        queue = list(providers)
+        pending: Dict['asyncio.Task[LLMCompletion]', str] = {}
+
+        def launch() -> str:
+            provider = queue.pop(0)
+            task = asyncio.create_task(self._timed_try(provider, messages, profile))
+            pending[task] = provider[0]
+            return provider[0]
+
+        first_provider = launch()
+        last_error: Optional[Exception] = None
+        try:
+            while pending:
+                hedge_delay = None
+                if queue and self.router.hedging_enabled:
+                    hedge_delay = self.router.hedge_delay(first_provider)
+                done, _ = await asyncio.wait(
+                    pending, timeout=hedge_delay, return_when=asyncio.FIRST_COMPLETED
+                )
+
+                if not done:
+                    # Slow primary: fire the next provider and take whichever answers first
+                    hedge_provider = launch()
+                    self.router.hedges_fired += 1
+                    logger.info(
+                        '%s slower than %.2fs, hedging to %s',
+                        first_provider,
+                        hedge_delay,
+                        hedge_provider,
+                    )
+                    continue
+
+                for task in done:
+                    provider_name = pending.pop(task)
+                    try:
+                        result = task.result()
+                    except Exception as e:
+                        last_error = e
+                        logger.warning(f'Provider {provider_name} failed: {str(e)}')
+                        continue
+                    if provider_name != first_provider:
+                        self.router.hedges_won += 1
+                    logger.info('✓ Provider %s succeeded', provider_name)
+                    return result
+
+                if not pending and queue:
+                    launch()
+        finally:
+            for task in pending:
+                task.cancel()
+
+        raise last_error or Exception('No LLM provider answered')
+
+    def _attempt_budget(self, provider_name: str) -> float:
+        """Time an attempt needs to have a fair chance: the provider's median latency"""
+        median = self.router.health(provider_name).latency_percentile(0.5)
+        return max(settings.request_deadline_min_attempt_seconds, median or 0.0)
+
+    async def _complete_uncached(self, messages: list, profile: ModelProfile) -> LLMCompletion:
+        """
+        Query providers with hedging, circuit breaking and retry
+
+        Each attempt races the healthy providers (see _hedged_complete); providers
+        with an open circuit breaker are skipped until their cooldown passes. Attempts
+        only get what is left of the request's deadline, and no attempt is started
+        once less than the provider's median latency is left (DeadlineExceeded).
+        """
         last_error = None
 
-        # Try primary provider (artemox)
         for attempt in range(self.max_retries):
+            providers = self._available_providers()
+            if not providers:
+                last_error = Exception('all providers are unhealthy (circuit open)')
+                logger.warning(f'LLM attempt {attempt + 1}/{self.max_retries}: {last_error}')
+                break
+
+            ensure_budget(self._attempt_budget(providers[0][0]), f'LLM attempt {attempt + 1}')
             try:
                 logger.info(
-                    f'Trying primary provider (artemox), attempt {attempt + 1}/{self.max_retries}'
-                )
-                result = await self._try_provider(
-                    self.primary_api_key,
-                    self.primary_base_url,
-                    self.primary_model,
-                    messages,
-                    'artemox',
+                    'LLM attempt %d/%d, providers: %s',
+                    attempt + 1,
+                    self.max_retries,
+                    [p[0] for p in providers],
                 )
-                logger.info('✓ Primary provider (artemox) succeeded')
-                return result
+                return await self._hedged_complete(providers, messages, profile)
 
+            except DeadlineExceeded:
+                raise
             except Exception as e:
                 last_error = e
-                logger.warning(f'Primary provider (artemox) attempt {attempt + 1} failed: {str(e)}')
+                logger.warning(f'LLM attempt {attempt + 1} failed: {str(e)}')
                 if attempt < self.max_retries - 1:
                     await asyncio.sleep(0.5)  # Short delay between retries
 
-        # Fallback to secondary provider (deepseek)
-        if self.fallback_api_key:
-            logger.info('Falling back to secondary provider (deepseek)')
+        # All providers failed
+        logger.error(f'All LLM providers failed. Last error: {str(last_error)}')
+        raise Exception(f'All LLM providers failed: {str(last_error)}')
+
+    async def _stream_provider(
+        self,
+        api_key: str,
+        base_url: str,
+        model: str,
+        messages: list,
+        provider_name: str,
+        profile: ModelProfile,
+        timeout: Optional[float] = None,
+    ) -> AsyncIterator[str]:
+        """
+        Stream completion text deltas from a specific provider (stream: true mode)
+
+        timeout overrides the client timeout (connect, and each read) for this request.
+        """
+        if not api_key:
+            raise ValueError(f'{provider_name} API key not configured')
+
+        payload = self._build_payload(model, messages, profile, stream=True)
+        headers = {'Authorization': f'Bearer {api_key}', 'Content-Type': 'application/json'}
+
+        client = self._get_client(provider_name)
+        self._requests_total[provider_name] += 1
+        self._requests_in_flight[provider_name] += 1
+        try:
+            async with client.stream(
+                'POST',
+                f'{base_url}/chat/completions',
+                json=payload,
+                headers=headers,
+                timeout=httpx.USE_CLIENT_DEFAULT if timeout is None else timeout,
+            ) as response:
+                response.raise_for_status()
+                async for line in response.aiter_lines():
+                    # Server-sent events: "data: {...}" lines, terminated by "data: [DONE]"
+                    if not line.startswith('data:'):
+                        continue
+                    data = line[len('data:') :].strip()
+                    if data == '[DONE]':
+                        break
+                    choices = json.loads(data).get('choices') or []
+                    if not choices:
+                        continue
+                    delta = (choices[0].get('delta') or {}).get('content')
+                    if delta:
+                        yield delta
+        finally:
+            self._requests_in_flight[provider_name] -= 1
+
+    async def stream(
+        self,
+        text: str,
+        system_prompt: Optional[str] = None,
+        use_cache: bool = True,
+        history: Optional[List[dict]] = None,
+        profile: Optional[str] = None,
+    ) -> AsyncGenerator[str, None]:
+        """
+        Stream LLM response text deltas with fallback and retry
+
+        Providers are tried in preference order, skipping those with an open circuit
+        breaker. Retries and fallback only happen until the first delta is received;
+        errors after that are raised to the caller. Streams are not hedged. Waiting
+        for the first delta is bounded by the request's deadline (DeadlineExceeded).
+
+        Args:
+            text: User query text
+            system_prompt: Optional system prompt for context
+            use_cache: Serve a cached answer in one piece and cache the streamed answer
+            history: Earlier conversation messages to send before the text
+            profile: Completion profile name (default: chosen from the text)
+
+        Yields:
+            str: Response text deltas as they arrive
+
+        Raises:
+            Exception: If all providers fail before producing any output
+        """
+        use_cache = use_cache and settings.llm_cache_enabled
+        selected = self.profiles.select(text, profile)
+        if use_cache:
+            cache_key = self._cache_key(text, system_prompt, selected, history)
+            cached = response_cache.get(cache_key)
+            if cached is not None:
+                logger.info('LLM response served from cache')
+                yield cached[0]
+                return
 
+        messages = self._build_messages(text, system_prompt, history)
+        stream_started = time.monotonic()
+
+        last_error = None
+        for provider_name, api_key, base_url, model in self._providers():
+            health = self.router.health(provider_name)
             for attempt in range(self.max_retries):
+                if not health.is_available():
+                    logger.warning(f'Skipping {provider_name} for streaming: circuit open')
+                    break
+                ensure_budget(
+                    self._attempt_budget(provider_name), f'streaming from {provider_name}'
+                )
+                # Waiting for the first delta (and each later one) is bounded by the budget
+                left = remaining()
+                timeout = None if left is None else min(self.timeout, left)
+
+                started = False
+                failed = False
+                parts = []
+                health.begin_request()
+                request_started = time.monotonic()
                 try:
                     logger.info(
-                        f'Trying fallback provider (deepseek), attempt {attempt + 1}/{self.max_retries}'
+                        'Streaming from %s, attempt %d/%d',
+                        provider_name,
+                        attempt + 1,
+                        self.max_retries,
                     )
-                    result = await self._try_provider(
-                        self.fallback_api_key,
-                        self.fallback_base_url,
-                        self.fallback_model,
-                        messages,
-                        'deepseek',
-                    )
-                    logger.info('✓ Fallback provider (deepseek) succeeded')
-                    return result
+                    async for delta in self._stream_provider(
+                        api_key, base_url, model, messages, provider_name, selected, timeout
+                    ):
+                        if not started:
+                            # Time to first byte is what matters for streaming
+                            started = True
+                            latency = time.monotonic() - request_started
+                            record_span(f'llm.{provider_name}.first_delta', request_started)
+                            health.record_success(latency)
+                            llm_upstream_duration.observe(latency, provider_name, 'stream', 'ok')
+                            self._record_profile(selected, 'stream', stream_started, ok=True)
+                        parts.append(delta)
+                        yield delta
+                    if use_cache and parts:
+                        response_cache.set(cache_key, (''.join(parts), provider_name))
+                    return
 
                 except Exception as e:
+                    if started:
+                        logger.error(f'Stream from {provider_name} broke mid-response: {str(e)}')
+                        raise
+                    record_span(f'llm.{provider_name}.first_delta', request_started)
+                    left = remaining()
+                    if left is not None and left <= 0:
+                        # Timed out on the budget, not the provider's failure (see finally)
+                        llm_upstream_duration.observe(
+                            time.monotonic() - request_started, provider_name, 'stream', 'deadline'
+                        )
+                        raise DeadlineExceeded(
+                            f'Deadline exceeded while waiting for {provider_name}'
+                        ) from e
+                    failed = True
+                    health.record_failure()
+                    llm_upstream_duration.observe(
+                        time.monotonic() - request_started, provider_name, 'stream', 'error'
+                    )
+                    llm_upstream_errors.inc(provider_name, type(e).__name__)
                     last_error = e
                     logger.warning(
-                        f'Fallback provider (deepseek) attempt {attempt + 1} failed: {str(e)}'
+                        f'Streaming from {provider_name} attempt {attempt + 1} failed: {str(e)}'
                     )
                     if attempt < self.max_retries - 1:
                         await asyncio.sleep(0.5)
+                finally:
+                    if not started and not failed:
+                        # Client went away before the first byte
+                        health.record_cancelled()
 
-        # All providers failed
-        logger.error(f'All LLM providers failed. Last error: {str(last_error)}')
+        self._record_profile(selected, 'stream', stream_started, ok=False)
+        logger.error(f'All LLM providers failed to stream. Last error: {str(last_error)}')
         raise Exception(f'All LLM providers failed: {str(last_error)}')
 
 
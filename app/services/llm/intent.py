@@ -0,0 +1,292 @@
+"""
+On-box music intent classifier
+
+Logistic regression over hashed character n-grams (2-4 characters, word edges
+included) and words, so inflected forms ("металлику", "металлики") share features.
+A prediction hashes about a hundred features and sums their weights: tens of
+microseconds instead of an LLM round-trip. _detect_music_command asks the LLM only
+when the probability is between the confidence bounds or no query could be
+extracted, and feeds the LLM's answers back (learn()).
+
+The query is the utterance without leading and trailing command words ("включи",
+"песню", "пожалуйста"). Which words are command words is learned from the same
+labelled examples: words of a music command outside its query are command words.
+
+Needs NumPy (pip install -e ".[intent]"); without it detection always uses the LLM.
+Check held-out accuracy before enabling: python -m benchmarks.intent_eval
+"""
+
+import json
+import logging
+import math
+import os
+import random
+import re
+import zlib
+from collections import deque
+from dataclasses import dataclass
+from typing import Deque, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from app.core.config import settings
+from app.utils.text import normalize_text
+
+try:
+    import numpy as np
+
+    _HAS_NUMPY = True
+except ImportError:  # Optional dependency: pip install -e ".[intent]"
+    _HAS_NUMPY = False
+
+logger = logging.getLogger(__name__)
+
+# Labelled utterance: (text, music query), query None for anything but a music command
+Example = Tuple[str, Optional[str]]
+
+SEED_EXAMPLES_PATH = os.path.join(os.path.dirname(__file__), 'intent_examples.jsonl')
+
+DIMENSION_BITS = 16
+DIMENSIONS = 2**DIMENSION_BITS
+MIN_NGRAM, MAX_NGRAM = 2, 4  # Character n-gram sizes
+
+if _HAS_NUMPY:
+    _NGRAM_BASE = np.uint64(1000003)
+    _MIX = np.uint64(0x9E3779B97F4A7C15)  # Fibonacci hashing
+    _SHIFT = np.uint64(64 - DIMENSION_BITS)
+
+_TOKEN_EDGES = re.compile(r'^\W+|\W+$')
+
+
+def numpy_available() -> bool:
+    return _HAS_NUMPY
+
+
+def load_examples(path: str) -> List[Example]:
+    """Labelled utterances from a JSONL file of {"text": ..., "query": ... or null}"""
+    examples = []
+    with open(path, encoding='utf-8') as lines:
+        for line in lines:
+            if line.strip():
+                data = json.loads(line)
+                examples.append((data['text'], data.get('query') or None))
+    return examples
+
+
+def features(text: str):
+    """
+    Hashed features of the normalized text: (indices, value of each index)
+
+    A feature that occurs twice is listed twice; every occurrence is worth
+    1/sqrt(count), so the vector has unit length however long the text is.
+    Character n-grams are hashed in one pass over the code point array (polynomial
+    hash, each size extending the previous one, then a multiplicative mix down to
+    DIMENSION_BITS); the few words use crc32.
+    """
+    normalized = normalize_text(text)
+    codes = np.frombuffer(f' {normalized} '.encode('utf-32-le'), dtype=np.uint32)
+    codes = codes.astype(np.uint64)
+    ngrams = [codes]
+    for size in range(2, MAX_NGRAM + 1):
+        ngrams.append(ngrams[-1][:-1] * _NGRAM_BASE + codes[size - 1 :])
+    hashes = (np.concatenate(ngrams[MIN_NGRAM - 1 :]) * _MIX) >> _SHIFT
+    words = [zlib.crc32(word.encode('utf-8')) % DIMENSIONS for word in normalized.split()]
+    indices = np.concatenate((hashes.astype(np.intp), np.array(words, dtype=np.intp)))
+    return indices, 1.0 / math.sqrt(len(indices))
+
+
+def _word_key(token: str) -> str:
+    return normalize_text(_TOKEN_EDGES.sub('', token))
+
+
+@dataclass
+class IntentDecision:
+    """A confident local answer: music command (with its query) or not"""
+
+    is_music: bool
+    query: Optional[str]
+    probability: float
+
+
+class IntentClassifier:
+    """Music command probability and query span of an utterance"""
+
+    def __init__(self, confidence: float = 0.9):
+        if not _HAS_NUMPY:
+            raise RuntimeError('The intent classifier needs numpy (pip install -e ".[intent]")')
+        self.confidence = confidence
+        self.weights = np.zeros(DIMENSIONS)
+        self.bias = 0.0
+        # word -> [times outside the query of a music command, times inside it]
+        self.word_roles: Dict[str, List[int]] = {}
+        self.trained_examples = 0
+
+        # Utterances labelled by the LLM since startup (for persist())
+        self.learned: Deque[Example] = deque(maxlen=10000)
+        self.counters = {'music': 0, 'not_music': 0, 'uncertain': 0, 'learned': 0}
+
+    def predict_proba(self, text: str) -> float:
+        """Probability that text is a music command"""
+        indices, value = features(text)
+        score = float(self.weights[indices].sum()) * value + self.bias
+        return 1.0 / (1.0 + math.exp(-max(min(score, 30.0), -30.0)))
+
+    def _step(self, indices, value: float, label: float, learning_rate: float, l2: float) -> None:
+        score = float(self.weights[indices].sum()) * value + self.bias
+        error = 1.0 / (1.0 + math.exp(-max(min(score, 30.0), -30.0))) - label
+        # add.at: repeated features get one update per occurrence
+        update = -learning_rate * (error * value + l2 * self.weights[indices])
+        np.add.at(self.weights, indices, update)
+        self.bias -= learning_rate * error
+
+    def _learn_span(self, text: str, query: str) -> None:
+        query_words = {_word_key(token) for token in query.split()} - {''}
+        words = [_word_key(token) for token in text.split()]
+        if not query_words <= set(words):
+            # The query is not a literal part of the text (e.g. the LLM changed the
+            # inflection), so it says nothing reliable about the other words
+            return
+        for word in words:
+            if word:
+                roles = self.word_roles.setdefault(word, [0, 0])
+                roles[1 if word in query_words else 0] += 1
+
+    def fit(
+        self,
+        examples: Sequence[Example],
+        epochs: int = 15,
+        learning_rate: float = 0.5,
+        l2: float = 1e-4,
+        seed: int = 0,
+    ) -> 'IntentClassifier':
+        """Train on labelled utterances (SGD over shuffled examples)"""
+        vectors = [(features(text), 1.0 if query else 0.0) for text, query in examples]
+        rng = random.Random(seed)
+        for _ in range(epochs):
+            rng.shuffle(vectors)
+            for (indices, value), label in vectors:
+                self._step(indices, value, label, learning_rate, l2)
+        for text, query in examples:
+            if query:
+                self._learn_span(text, query)
+        self.trained_examples += len(examples)
+        return self
+
+    def learn(self, text: str, query: Optional[str], learning_rate: float = 0.1) -> None:
+        """Update from an utterance labelled by the LLM detection call"""
+        indices, value = features(text)
+        self._step(indices, value, 1.0 if query else 0.0, learning_rate, 1e-4)
+        if query:
+            self._learn_span(text, query)
+        self.learned.append((text, query))
+        self.counters['learned'] += 1
+
+    def is_command_word(self, word: str) -> bool:
+        outside, inside = self.word_roles.get(word, (0, 0))
+        return outside > inside
+
+    def extract_query(self, text: str) -> Optional[str]:
+        """The utterance without leading and trailing command words; None if nothing is left"""
+        tokens = text.split()
+        start, end = 0, len(tokens)
+        while start < end and self.is_command_word(_word_key(tokens[start])):
+            start += 1
+        while end > start and self.is_command_word(_word_key(tokens[end - 1])):
+            end -= 1
+        query = _TOKEN_EDGES.sub('', ' '.join(tokens[start:end]))
+        return query or None
+
+    def decide(self, text: str) -> Optional[IntentDecision]:
+        """Local answer when confident, None when the LLM should decide"""
+        probability = self.predict_proba(text)
+        if probability >= self.confidence:
+            query = self.extract_query(text)
+            if query:
+                self.counters['music'] += 1
+                return IntentDecision(True, query, probability)
+        elif probability <= 1.0 - self.confidence:
+            self.counters['not_music'] += 1
+            return IntentDecision(False, None, probability)
+        self.counters['uncertain'] += 1
+        return None
+
+    def save(self, path: str) -> None:
+        """Write the model (atomically, so a crash never leaves a torn file)"""
+        words = list(self.word_roles)
+        tmp_path = f'{path}.tmp'
+        with open(tmp_path, 'wb') as output:
+            np.savez_compressed(
+                output,
+                weights=self.weights,
+                bias=np.array(self.bias),
+                trained_examples=np.array(self.trained_examples),
+                words=np.array(words, dtype=str),
+                word_roles=np.array([self.word_roles[word] for word in words], dtype=np.int64),
+            )
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str, confidence: float = 0.9) -> 'IntentClassifier':
+        classifier = cls(confidence)
+        with np.load(path, allow_pickle=False) as data:
+            if data['weights'].shape != (DIMENSIONS,):
+                raise ValueError(f'{path} was trained with different feature dimensions')
+            classifier.weights = data['weights'].copy()
+            classifier.bias = float(data['bias'])
+            classifier.trained_examples = int(data['trained_examples'])
+            classifier.word_roles = {
+                str(word): [int(outside), int(inside)]
+                for word, (outside, inside) in zip(data['words'], data['word_roles'])
+            }
+        return classifier
+
+    def persist(self, model_path: str, examples_path: str = '') -> None:
+        """Save what was learned from the LLM since startup (called on app shutdown)"""
+        if not self.learned:
+            return
+        try:
+            self.save(model_path)
+            if examples_path:
+                with open(examples_path, 'a', encoding='utf-8') as output:
+                    for text, query in self.learned:
+                        example = {'text': text, 'query': query}
+                        output.write(json.dumps(example, ensure_ascii=False) + '\n')
+        except OSError as e:
+            logger.warning('Could not save the intent model to %s: %s', model_path, e)
+            return
+        self.learned.clear()
+
+    def stats(self) -> dict:
+        return {
+            **self.counters,
+            'confidence': self.confidence,
+            'trained_examples': self.trained_examples,
+            'command_words': sum(1 for word in self.word_roles if self.is_command_word(word)),
+        }
+
+
+def load_classifier(examples: Iterable[Example] = ()) -> Optional[IntentClassifier]:
+    """
+    Classifier from LLM_INTENT_MODEL_PATH, or trained on the bundled examples
+
+    Returns None when disabled or NumPy is missing.
+    """
+    if not settings.llm_intent_classifier_enabled:
+        return None
+    if not _HAS_NUMPY:
+        logger.warning(
+            'LLM_INTENT_CLASSIFIER_ENABLED is set but "numpy" is not installed, '
+            'using the LLM for intent detection'
+        )
+        return None
+
+    path = settings.llm_intent_model_path
+    confidence = settings.llm_intent_confidence
+    if os.path.exists(path):
+        try:
+            return IntentClassifier.load(path, confidence)
+        except (OSError, ValueError, KeyError) as e:
+            logger.warning('Could not load intent model %s (%s), retraining', path, e)
+    return IntentClassifier(confidence).fit(list(examples) or load_examples(SEED_EXAMPLES_PATH))
+
+
+# Singleton instance (None: detection always asks the LLM)
+intent_classifier = load_classifier()
@@ -0,0 +1,96 @@
+import re
+from dataclasses import dataclass
+from typing import Dict, Optional
+
+from app.core.config import settings
+from app.utils.text import normalize_text
+
+DETECTION = 'detection'
+SHORT = 'short'
+FULL = 'full'
+
+# Small talk and quick facts: a sentence is enough whatever the length of the question
+_SHORT_QUERY = re.compile(
+    r'^(привет\w*|здравствуй\w*|добр\w+ (утро|день|вечер)|доброй ночи|хай|пока|спасибо|'
+    r'благодарю|как дела|как ты|который час|сколько времени|какое сегодня число|'
+    r'какой сегодня день|да|нет|ок|хорошо)\b'
+)
+# Questions that ask for an explanation or a story need the full answer length
+_LONG_QUERY = re.compile(
+    r'\b(расскажи|объясни|почему|зачем|опиши|сравни|перечисли|придумай|анекдот|'
+    r'истори\w*|рецепт\w*|что так\w+|что значит|кто так\w+|кто (написал|придумал|изобрел)|'
+    r'как (сделать|приготовить|работает))\b|^как\b(?! (дела|ты|вы)\b)'
+)
+
+
+@dataclass(frozen=True)
+class ModelProfile:
+    """Completion parameters for a class of LLM calls"""
+
+    name: str
+    max_tokens: int
+    temperature: float
+    model: Optional[str] = None  # None: the provider's configured model
+
+
+def load_profiles() -> Dict[str, ModelProfile]:
+    """Profiles from settings: detection (tiny JSON), short answer, full answer"""
+    return {
+        DETECTION: ModelProfile(
+            name=DETECTION,
+            max_tokens=settings.llm_profile_detection_max_tokens,
+            temperature=0.0,
+            model=settings.llm_profile_detection_model or None,
+        ),
+        SHORT: ModelProfile(
+            name=SHORT,
+            max_tokens=settings.llm_profile_short_max_tokens,
+            temperature=settings.deepseek_temperature,
+            model=settings.llm_profile_short_model or None,
+        ),
+        FULL: ModelProfile(
+            name=FULL,
+            max_tokens=settings.deepseek_max_tokens,
+            temperature=settings.deepseek_temperature,
+        ),
+    }
+
+
+class ProfileSelector:
+    """
+    Choose the profile for a query
+
+    Callers that know what they need (intent detection) name the profile; answers
+    get the short profile for small talk (and, with short_max_words, for questions
+    of up to that many words without an explain/tell-me marker), the full one
+    otherwise. Disabled, everything is full.
+    """
+
+    def __init__(self, profiles: Dict[str, ModelProfile], enabled: bool, short_max_words: int):
+        self.profiles = profiles
+        self.enabled = enabled
+        self.short_max_words = short_max_words
+
+    def classify(self, text: str) -> str:
+        """Profile name for answering text"""
+        normalized = normalize_text(text)
+        if _LONG_QUERY.search(normalized):
+            return FULL
+        if _SHORT_QUERY.match(normalized):
+            return SHORT
+        if self.short_max_words and len(normalized.split()) <= self.short_max_words:
+            return SHORT
+        return FULL
+
+    def select(self, text: str, name: Optional[str] = None) -> ModelProfile:
+        if not self.enabled:
+            return self.profiles[FULL]
+        return self.profiles[name or self.classify(text)]
+
+
+# Singleton instance
+profile_selector = ProfileSelector(
+    load_profiles(),
+    enabled=settings.llm_profiles_enabled,
+    short_max_words=settings.llm_profile_short_max_words,
+)
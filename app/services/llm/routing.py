@@ -0,0 +1,177 @@
+import time
+from collections import deque
+from typing import Deque, Dict, Optional
+
+from app.core.config import settings
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+
+class ProviderHealth:
+    """
+    Health of a single LLM provider: EWMA latency/error rate and a circuit breaker
+
+    Breaker states:
+    - closed: requests flow normally
+    - open: provider is skipped until the cooldown has passed
+    - half_open: one probe request is let through; success closes, failure re-opens
+    """
+
+    def __init__(
+        self,
+        name: str,
+        alpha: float = 0.2,
+        failure_threshold: int = 3,
+        error_rate_threshold: float = 0.5,
+        min_requests: int = 10,
+        open_seconds: float = 30.0,
+        latency_window: int = 64,
+    ):
+        self.name = name
+        self.alpha = alpha
+        self.failure_threshold = failure_threshold
+        self.error_rate_threshold = error_rate_threshold
+        self.min_requests = min_requests
+        self.open_seconds = open_seconds
+
+        self.latency_ewma: Optional[float] = None
+        self.error_rate_ewma = 0.0
+        self._latencies: Deque[float] = deque(maxlen=latency_window)
+
+        self.requests = 0
+        self.failures = 0
+        self.consecutive_failures = 0
+        self.times_opened = 0
+
+        self._state = CLOSED
+        self._open_until = 0.0
+        self._probe_in_flight = False
+
+    @property
+    def state(self) -> str:
+        if self._state == OPEN and time.monotonic() >= self._open_until:
+            self._state = HALF_OPEN
+            self._probe_in_flight = False
+        return self._state
+
+    @property
+    def latency_samples(self) -> int:
+        return len(self._latencies)
+
+    def is_available(self) -> bool:
+        """Whether a request may be sent to the provider right now"""
+        state = self.state
+        if state == CLOSED:
+            return True
+        return state == HALF_OPEN and not self._probe_in_flight
+
+    def begin_request(self) -> None:
+        """Mark request start (takes the probe slot when half-open)"""
+        if self.state == HALF_OPEN:
+            self._probe_in_flight = True
+
+    def record_success(self, latency: float) -> None:
+        self.requests += 1
+        self.consecutive_failures = 0
+        self._latencies.append(latency)
+        if self.latency_ewma is None:
+            self.latency_ewma = latency
+        else:
+            self.latency_ewma = self.alpha * latency + (1 - self.alpha) * self.latency_ewma
+        self.error_rate_ewma = (1 - self.alpha) * self.error_rate_ewma
+        self._state = CLOSED
+        self._probe_in_flight = False
+
+    def record_failure(self) -> None:
+        self.requests += 1
+        self.failures += 1
+        self.consecutive_failures += 1
+        self.error_rate_ewma = self.alpha + (1 - self.alpha) * self.error_rate_ewma
+        if (
+            self.state == HALF_OPEN
+            or self.consecutive_failures >= self.failure_threshold
+            or (
+                self.requests >= self.min_requests
+                and self.error_rate_ewma >= self.error_rate_threshold
+            )
+        ):
+            self._open()
+
+    def record_cancelled(self) -> None:
+        """Request was cancelled (lost a hedge race): neither success nor failure"""
+        self._probe_in_flight = False
+
+    def _open(self) -> None:
+        if self._state != OPEN:
+            self.times_opened += 1
+        self._state = OPEN
+        self._open_until = time.monotonic() + self.open_seconds
+        self._probe_in_flight = False
+
+    def latency_percentile(self, percentile: float) -> Optional[float]:
+        """Latency percentile over recent successful requests"""
+        if not self._latencies:
+            return None
+        ordered = sorted(self._latencies)
+        index = min(len(ordered) - 1, int(percentile * len(ordered)))
+        return ordered[index]
+
+    def stats(self) -> dict:
+        p90 = self.latency_percentile(0.9)
+        return {
+            'state': self.state,
+            'latency_ewma_ms': round(self.latency_ewma * 1000, 1) if self.latency_ewma else None,
+            'latency_p90_ms': round(p90 * 1000, 1) if p90 is not None else None,
+            'error_rate_ewma': round(self.error_rate_ewma, 4),
+            'requests': self.requests,
+            'failures': self.failures,
+            'consecutive_failures': self.consecutive_failures,
+            'times_opened': self.times_opened,
+        }
+
+
+class ProviderRouter:
+    """Tracks provider health and decides when to hedge to the next provider"""
+
+    def __init__(self) -> None:
+        self.hedging_enabled = settings.llm_hedging_enabled
+        self.hedge_default_delay = settings.llm_hedge_default_delay
+        self.hedge_min_delay = settings.llm_hedge_min_delay
+        self.hedge_max_delay = settings.llm_hedge_max_delay
+        self.hedge_min_samples = 5
+
+        self._health: Dict[str, ProviderHealth] = {}
+
+        self.hedges_fired = 0
+        self.hedges_won = 0
+
+    def health(self, provider_name: str) -> ProviderHealth:
+        health = self._health.get(provider_name)
+        if health is None:
+            health = ProviderHealth(
+                provider_name,
+                failure_threshold=settings.llm_breaker_failure_threshold,
+                error_rate_threshold=settings.llm_breaker_error_rate,
+                open_seconds=settings.llm_breaker_open_seconds,
+            )
+            self._health[provider_name] = health
+        return health
+
+    def hedge_delay(self, provider_name: str) -> float:
+        """How long to wait for a provider before firing the next one (its p90 latency)"""
+        health = self.health(provider_name)
+        p90 = None
+        if health.latency_samples >= self.hedge_min_samples:
+            p90 = health.latency_percentile(0.9)
+        delay = self.hedge_default_delay if p90 is None else p90
+        return max(self.hedge_min_delay, min(self.hedge_max_delay, delay))
+
+    def stats(self) -> dict:
+        return {
+            'hedging_enabled': self.hedging_enabled,
+            'hedges_fired': self.hedges_fired,
+            'hedges_won': self.hedges_won,
+            'providers': {name: health.stats() for name, health in self._health.items()},
+        }
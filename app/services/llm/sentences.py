@@ -0,0 +1,41 @@
+import re
+from typing import List
+
+# Sentence end: terminal punctuation (optionally followed by closing quotes/brackets)
+# and whitespace, or a line break
+_SENTENCE_END = re.compile(r'[.!?…]+["»)\]]*\s+|\n+')
+
+
+class SentenceChunker:
+    """
+    Split streamed LLM text into sentence-sized chunks for TTS
+
+    Text deltas are buffered until a sentence boundary is seen. Fragments shorter than
+    min_chars (e.g. "Да." or "т. е.") are glued to the next sentence so TTS does not
+    receive tiny pieces.
+    """
+
+    def __init__(self, min_chars: int = 12):
+        self.min_chars = min_chars
+        self._buffer = ''
+
+    def feed(self, delta: str) -> List[str]:
+        """Add text delta, return completed sentences (possibly empty list)"""
+        self._buffer += delta
+        sentences = []
+        start = 0
+        for match in _SENTENCE_END.finditer(self._buffer):
+            end = match.end()
+            sentence = self._buffer[start:end].strip()
+            if len(sentence) < self.min_chars:
+                continue
+            sentences.append(sentence)
+            start = end
+        self._buffer = self._buffer[start:]
+        return sentences
+
+    def flush(self) -> str:
+        """Return whatever text is left once the stream has ended"""
+        tail = self._buffer.strip()
+        self._buffer = ''
+        return tail
@@ -0,0 +1,195 @@
+import asyncio
+import logging
+from pathlib import Path
+from typing import AsyncIterator, Dict, Optional, Set
+
+import httpx
+
+from app.core.config import settings
+from app.core.deadline import start_detached
+from app.services.music.yandex import YandexMusicService, yandex_music_service
+from app.utils.disk_cache import DiskLRUCache
+
+logger = logging.getLogger(__name__)
+
+AUDIO_MEDIA_TYPE = "audio/mpeg"
+
+# Upstream statuses meaning the signed direct link is no longer valid
+EXPIRED_LINK_STATUSES = (401, 403, 404, 410)
+
+
+class UpstreamAudioError(Exception):
+    """Audio storage answered with an error status"""
+
+    def __init__(self, status_code: int):
+        super().__init__(f"Audio storage returned HTTP {status_code}")
+        self.status_code = status_code
+
+
+class AudioProxy:
+    """
+    Stream track audio through the backend and keep it in an on-disk LRU cache
+
+    Full downloads are written to disk while they are streamed to the client, so the
+    next play of the track is served from a local file. Range requests for tracks
+    that are not cached yet are proxied upstream as is and the whole file is
+    fetched into the cache in the background (one download per track at a time).
+    """
+
+    def __init__(
+        self,
+        service: YandexMusicService,
+        cache: DiskLRUCache,
+        chunk_size: int = 64 * 1024,
+        timeout: float = 30.0,
+    ):
+        self.service = service
+        self.cache = cache
+        self.chunk_size = chunk_size
+        self.timeout = timeout
+
+        self._client: Optional[httpx.AsyncClient] = None
+        # Tracks currently being written to the cache (streamed or background fill)
+        self._writing: Set[str] = set()
+        self._fills: Dict[str, asyncio.Task] = {}
+
+        self.stats_counters: Dict[str, int] = {
+            "proxied": 0,  # Responses streamed from upstream
+            "range_proxied": 0,  # ... of them partial (Range) responses
+            "link_refreshes": 0,  # Expired direct links replaced during a request
+            "upstream_errors": 0,
+            "background_fills": 0,
+            "incomplete": 0,  # Downloads not cached (client left, size mismatch)
+        }
+
+    def _get_client(self) -> httpx.AsyncClient:
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                timeout=httpx.Timeout(self.timeout, connect=10.0), follow_redirects=True
+            )
+        return self._client
+
+    def cached_path(self, track_id: str) -> Optional[Path]:
+        """Local file with the track audio, None if not cached"""
+        return self.cache.get(track_id)
+
+    async def open_upstream(
+        self, track_id: str, range_header: Optional[str] = None
+    ) -> httpx.Response:
+        """
+        Start downloading the track from storage (response body not read yet)
+
+        A rejected direct link is dropped from the link cache and resolved again once.
+
+        Raises:
+            UpstreamAudioError: If storage answers with an error status
+        """
+        client = self._get_client()
+        # Identity encoding: cached bytes and Content-Length must match the file on disk
+        headers = {"Accept-Encoding": "identity"}
+        if range_header:
+            headers["Range"] = range_header
+
+        for attempt in range(2):
+            url = await self.service.get_track_download_url(track_id)
+            request = client.build_request("GET", url, headers=headers)
+            response = await client.send(request, stream=True)
+            if response.status_code < 400:
+                return response
+
+            await response.aclose()
+            if attempt == 0 and response.status_code in EXPIRED_LINK_STATUSES:
+                logger.warning(
+                    f"Direct link for track {track_id} rejected with HTTP "
+                    f"{response.status_code}, resolving a new one"
+                )
+                self.service.invalidate_direct_link(track_id)
+                self.stats_counters["link_refreshes"] += 1
+                continue
+            break
+
+        self.stats_counters["upstream_errors"] += 1
+        raise UpstreamAudioError(response.status_code)
+
+    async def iter_body(self, track_id: str, response: httpx.Response) -> AsyncIterator[bytes]:
+        """
+        Yield the upstream body; a complete (non-Range) body is also stored in the cache
+        """
+        self.stats_counters["proxied"] += 1
+        if response.status_code == 206:
+            self.stats_counters["range_proxied"] += 1
+
+        temp_path = None
+        output = None
+        if response.status_code == 200 and track_id not in self._writing:
+            self._writing.add(track_id)
+            temp_path = self.cache.temp_path(track_id)
+            output = open(temp_path, "wb")
+
+        written = 0
+        try:
+            async for chunk in response.aiter_bytes(self.chunk_size):
+                if output is not None:
+                    # Buffered write into the page cache; cheap enough for the event loop
+                    output.write(chunk)
+                written += len(chunk)
+                yield chunk
+
+            if output is not None and temp_path is not None:
+                output.close()
+                expected = response.headers.get("content-length")
+                if expected is None or int(expected) == written:
+                    self.cache.commit(track_id, temp_path)
+                    temp_path = None
+                    logger.info("Cached audio for track %s (%s bytes)", track_id, written)
+        finally:
+            await response.aclose()
+            if output is not None:
+                output.close()
+                self._writing.discard(track_id)
+            if temp_path is not None:
+                self.stats_counters["incomplete"] += 1
+                temp_path.unlink(missing_ok=True)
+
+    def schedule_fill(self, track_id: str) -> None:
+        """Download the whole track into the cache in the background"""
+        if track_id in self._writing or track_id in self._fills:
+            return
+        self._fills[track_id] = start_detached(self._fill(track_id))
+        self.stats_counters["background_fills"] += 1
+
+    async def _fill(self, track_id: str) -> None:
+        try:
+            response = await self.open_upstream(track_id)
+            async for _ in self.iter_body(track_id, response):
+                pass
+        except Exception as e:
+            logger.warning(f"Background caching of track {track_id} failed: {str(e)}")
+        finally:
+            self._fills.pop(track_id, None)
+
+    async def close(self) -> None:
+        """Cancel background downloads and close the HTTP client (called on app shutdown)"""
+        tasks = list(self._fills.values())
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    def stats(self) -> dict:
+        return {
+            **self.stats_counters,
+            "downloads_in_progress": len(self._writing),
+            "disk": self.cache.stats(),
+        }
+
+
+# Singleton instance
+audio_proxy = AudioProxy(
+    yandex_music_service,
+    DiskLRUCache(
+        settings.music_audio_cache_dir, settings.music_audio_cache_max_bytes, suffix=".mp3"
+    ),
+)
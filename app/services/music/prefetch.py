@@ -0,0 +1,158 @@
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+from typing import Dict, Iterable, Optional
+
+from app.core.config import settings
+from app.core.deadline import start_detached
+from app.services.music.yandex import YandexMusicService, yandex_music_service
+
+logger = logging.getLogger(__name__)
+
+
+class StreamPrefetcher:
+    """
+    Resolve stream URLs for top search results in the background
+
+    The user nearly always plays one of the first results, so resolving their direct
+    links right after a search turns the follow-up /track/{id}/stream call into a
+    cache lookup. Work is bounded by a concurrency cap and a pending-task limit
+    (oldest prefetches are cancelled first).
+    """
+
+    def __init__(
+        self,
+        service: YandexMusicService,
+        top_k: int = 3,
+        max_concurrency: int = 2,
+        max_pending: int = 12,
+        link_ttl: float = 600.0,
+    ):
+        self.service = service
+        self.top_k = top_k
+        self.max_concurrency = max_concurrency
+        self.max_pending = max_pending
+        self.link_ttl = link_ttl
+
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._tasks: 'OrderedDict[str, asyncio.Task]' = OrderedDict()
+        # track_id -> resolve time, until the stream URL is requested or goes stale
+        self._prefetched: 'OrderedDict[str, float]' = OrderedDict()
+
+        self.stats_counters: Dict[str, int] = {
+            'scheduled': 0,
+            'completed': 0,
+            'failed': 0,
+            'cancelled': 0,
+            'hits': 0,  # Stream request for an already prefetched track
+            'in_flight_hits': 0,  # Stream request joined a running prefetch
+            'wasted': 0,  # Prefetched links that were never requested
+        }
+
+    def schedule(self, track_ids: Iterable[str]) -> int:
+        """
+        Schedule stream URL resolution for the first top_k track IDs
+
+        Returns:
+            int: Number of newly scheduled prefetches
+        """
+        self._expire_stale()
+
+        scheduled = 0
+        for track_id in list(track_ids)[: self.top_k]:
+            if track_id in self._tasks or track_id in self._prefetched:
+                continue
+            task = start_detached(self._prefetch(track_id))
+            self._tasks[track_id] = task
+            scheduled += 1
+
+        # Bound outstanding work: superseded (oldest) prefetches are cancelled
+        while len(self._tasks) > self.max_pending:
+            _, task = self._tasks.popitem(last=False)
+            task.cancel()
+            self.stats_counters['cancelled'] += 1
+
+        self.stats_counters['scheduled'] += scheduled
+        return scheduled
+
+    def _concurrency(self) -> asyncio.Semaphore:
+        # Created on first use, inside the event loop
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        return self._semaphore
+
+    async def _prefetch(self, track_id: str) -> None:
+        try:
+            async with self._concurrency():
+                await self.service.get_track_download_url(track_id)
+            self._prefetched[track_id] = time.monotonic()
+            self.stats_counters['completed'] += 1
+        except Exception as e:
+            self.stats_counters['failed'] += 1
+            logger.warning(f'Prefetch of stream URL for track {track_id} failed: {str(e)}')
+        finally:
+            if self._tasks.get(track_id) is asyncio.current_task():
+                del self._tasks[track_id]
+
+    async def claim(self, track_id: str) -> None:
+        """
+        Account for a stream request; if a prefetch of the track is running, wait
+        for it so the URL is resolved once
+        """
+        if self._prefetched.pop(track_id, None) is not None:
+            self.stats_counters['hits'] += 1
+            return
+
+        task = self._tasks.get(track_id)
+        if task is not None:
+            self.stats_counters['in_flight_hits'] += 1
+            # wait() neither cancels the prefetch when the requesting client disconnects
+            # nor raises if the prefetch fails or is cancelled (superseded, shutdown):
+            # the caller then resolves the URL itself and reports errors
+            await asyncio.wait({task})
+            self._prefetched.pop(track_id, None)
+
+    def _expire_stale(self) -> None:
+        """Count prefetched links whose cache lifetime passed without a request"""
+        cutoff = time.monotonic() - self.link_ttl
+        while self._prefetched:
+            track_id, resolved_at = next(iter(self._prefetched.items()))
+            if resolved_at > cutoff:
+                break
+            del self._prefetched[track_id]
+            self.stats_counters['wasted'] += 1
+
+    async def close(self) -> None:
+        """Cancel outstanding prefetches (called on app shutdown)"""
+        tasks = list(self._tasks.values())
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._tasks.clear()
+
+    def stats(self) -> dict:
+        self._expire_stale()
+        resolved = self.stats_counters['completed']
+        used = self.stats_counters['hits'] + self.stats_counters['in_flight_hits']
+        return {
+            **self.stats_counters,
+            'pending': len(self._tasks),
+            'unused_prefetched': len(self._prefetched),
+            'hit_rate': round(used / resolved, 4) if resolved else 0.0,
+            'top_k': self.top_k,
+            'max_concurrency': self.max_concurrency,
+        }
+
+
+# Singleton instance
+stream_prefetcher = StreamPrefetcher(
+    yandex_music_service,
+    top_k=settings.music_prefetch_top_k,
+    max_concurrency=settings.music_prefetch_concurrency,
+    max_pending=settings.music_prefetch_top_k * 4,
+    link_ttl=max(
+        settings.music_direct_link_ttl_seconds - settings.music_direct_link_refresh_margin_seconds,
+        0,
+    ),
+)
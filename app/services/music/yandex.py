@@ -1,28 +1,197 @@
 from yandex_music import ClientAsync
-from typing import List, Optional
+from yandex_music.exceptions import NetworkError, UnauthorizedError
+from typing import Any, Awaitable, Dict, List, Optional, Tuple, TypeVar, Union
+import asyncio
 import logging
+import time
 
 from app.core.config import settings
+from app.core.deadline import DeadlineExceeded, start_detached, within_deadline
+from app.core.metrics import yandex_call_duration
+from app.core.tracing import span
+from app.database.state import state_backend
 from app.schemas.music import TrackInfo
+from app.utils.cache import LRUCache
+from app.utils.singleflight import SingleFlight
+from app.utils.text import normalize_text
 
 logger = logging.getLogger(__name__)
 
+# Compact cached form of TrackInfo: (id, title, artist, album, duration_ms, cover_url)
+TrackTuple = Tuple[str, str, str, Optional[str], Optional[int], Optional[str]]
+
+T = TypeVar("T")
+
+
+def _is_session_error(error: Exception) -> bool:
+    """
+    Token rejected or connection-level failure: the client is worth re-initializing
+
+    Subclasses of NetworkError (timeouts, 400, 404) are about the request, not the session.
+    """
+    return isinstance(error, UnauthorizedError) or type(error) is NetworkError
+
+
+def _track_to_tuple(track: TrackInfo) -> TrackTuple:
+    return (
+        track.id,
+        track.title,
+        track.artist,
+        track.album,
+        track.duration_ms,
+        track.cover_url,
+    )
+
+
+def _track_from_tuple(values) -> TrackInfo:
+    track_id, title, artist, album, duration_ms, cover_url = values
+    return TrackInfo(
+        id=track_id,
+        title=title,
+        artist=artist,
+        album=album,
+        duration_ms=duration_ms,
+        cover_url=cover_url,
+    )
+
 
 class YandexMusicService:
     """Service for interacting with Yandex Music API"""
 
-    def __init__(self):
+    def __init__(self) -> None:
         self.token = settings.yandex_music_token
         self._client: Optional[ClientAsync] = None
 
+        # Concurrent callers share one init(); warm-up and re-init run in the background
+        self._init_inflight = SingleFlight()
+        self._warmup_task: Optional[asyncio.Task] = None
+        self._reinit_task: Optional[asyncio.Task] = None
+        self._last_reinit = float("-inf")
+        self.reinit_interval = settings.music_client_reinit_interval_seconds
+        self.call_timeout = settings.music_call_timeout_seconds
+        self.init_error: Optional[str] = None
+        self.reinits = 0
+
+        # Search results: (normalized query, limit) -> list of track tuples;
+        # an empty list is a short-lived negative entry
+        self.search_cache = LRUCache(
+            max_items=settings.music_search_cache_max_items,
+            ttl=settings.music_search_cache_ttl_seconds,
+            backend=state_backend,
+            namespace='music_search',
+        )
+        self.search_negative_ttl = settings.music_search_negative_ttl_seconds
+
+        # Best-quality DownloadInfo per track_id (holds a client reference, so local only)
+        self.download_info_cache = LRUCache(
+            max_items=settings.music_download_info_cache_max_items,
+            ttl=settings.music_download_info_ttl_seconds,
+        )
+        # Signed direct links, reused until shortly before they expire
+        self.direct_link_cache = LRUCache(
+            max_items=settings.music_download_info_cache_max_items,
+            ttl=max(
+                settings.music_direct_link_ttl_seconds
+                - settings.music_direct_link_refresh_margin_seconds,
+                0,
+            ),
+            backend=state_backend,
+            namespace="music_direct_links",
+        )
+
+        self.upstream_calls = {
+            "init": 0,
+            "search": 0,
+            "tracks": 0,
+            "download_info": 0,
+            "direct_link": 0,
+        }
+
+        # Concurrent identical searches / stream URL lookups share one upstream call
+        self.search_inflight = SingleFlight()
+        self.download_url_inflight = SingleFlight()
+
+    @property
+    def ready(self) -> bool:
+        """Client initialized: music requests will not wait for init()"""
+        return self._client is not None
+
+    def start(self) -> None:
+        """Initialize the client in the background (called on app startup)"""
+        if self.token and self._warmup_task is None:
+            self._warmup_task = asyncio.create_task(self._warm_up())
+
+    async def _warm_up(self) -> None:
+        try:
+            await self._get_client()
+            logger.info("Yandex Music client ready")
+        except Exception as e:
+            # The first music request retries init()
+            logger.warning("Yandex Music client warm-up failed: %s", e)
+
     async def _get_client(self) -> ClientAsync:
-        """Get or create Yandex Music client"""
+        """Get or create Yandex Music client (concurrent callers share one init())"""
         if not self.token:
             raise ValueError("Yandex Music token not configured")
 
-        if self._client is None:
-            self._client = await ClientAsync(self.token).init()
-        return self._client
+        if self._client is not None:
+            return self._client
+        return await self._init_inflight.do("init", self._init_client)
+
+    async def _init_client(self) -> ClientAsync:
+        try:
+            client = await self._upstream("init", ClientAsync(self.token).init())
+        except Exception as e:
+            self.init_error = str(e)
+            raise
+        self._client = client
+        self.init_error = None
+        return client
+
+    def _schedule_reinit(self, error: Exception) -> None:
+        """Re-initialize the client in the background; requests keep using the current one"""
+        if self._reinit_task is not None and not self._reinit_task.done():
+            return
+        now = time.monotonic()
+        if now - self._last_reinit < self.reinit_interval:
+            return
+        self._last_reinit = now
+        self.reinits += 1
+        logger.warning("Yandex Music session error (%s), re-initializing client", error)
+        self._reinit_task = start_detached(self._reinit())
+
+    async def _reinit(self) -> None:
+        try:
+            await self._init_inflight.do("init", self._init_client)
+            logger.info("Yandex Music client re-initialized")
+        except Exception as e:
+            logger.warning("Yandex Music client re-initialization failed: %s", e)
+
+    async def _upstream(self, call: str, awaitable: Awaitable[T]) -> T:
+        """
+        Await a Yandex Music API call, counting it and recording its latency
+
+        The call is bounded by MUSIC_CALL_TIMEOUT_SECONDS and the request's deadline.
+        """
+        self.upstream_calls[call] += 1
+        started = time.perf_counter()
+        outcome = "error"
+        try:
+            with span(f"yandex.{call}"):
+                result = await within_deadline(
+                    awaitable, stage=f"yandex.{call}", timeout=self.call_timeout
+                )
+            outcome = "ok"
+            return result
+        except DeadlineExceeded:
+            outcome = "deadline"
+            raise
+        except Exception as e:
+            if call != "init" and _is_session_error(e):
+                self._schedule_reinit(e)
+            raise
+        finally:
+            yandex_call_duration.observe(time.perf_counter() - started, call, outcome)
 
     async def search_tracks(self, query: str, limit: int = 10) -> List[TrackInfo]:
         """
@@ -35,14 +204,28 @@ class YandexMusicService:
         Returns:
             List[TrackInfo]: List of found tracks
         """
+        cache_key = (normalize_text(query), limit)
+        cached = self.search_cache.get(cache_key)
+        if cached is not None:
+            logger.info("Search cache hit for query: %s (%s tracks)", query, len(cached))
+            return [_track_from_tuple(values) for values in cached]
+
+        return await self.search_inflight.do(
+            cache_key, lambda: self._search_uncached(query, limit, cache_key)
+        )
+
+    async def _search_uncached(
+        self, query: str, limit: int, cache_key: Tuple[str, int]
+    ) -> List[TrackInfo]:
         try:
             client = await self._get_client()
 
             # Perform search
-            search_result = await client.search(query, type_="track")
+            search_result = await self._upstream("search", client.search(query, type_="track"))
 
             if not search_result or not search_result.tracks:
-                logger.info(f"No tracks found for query: {query}")
+                logger.info("No tracks found for query: %s", query)
+                self.search_cache.set(cache_key, [], ttl=self.search_negative_ttl)
                 return []
 
             tracks = []
@@ -62,52 +245,201 @@ class YandexMusicService:
                 )
                 tracks.append(track_info)
 
-            logger.info(f"Found {len(tracks)} tracks for query: {query}")
+            logger.info("Found %s tracks for query: %s", len(tracks), query)
+            self.search_cache.set(
+                cache_key,
+                [_track_to_tuple(track) for track in tracks],
+                ttl=None if tracks else self.search_negative_ttl,
+            )
             return tracks
 
         except Exception as e:
             logger.error(f"Error searching tracks: {str(e)}")
             raise
 
-    async def get_track_download_url(self, track_id: str) -> str:
+    async def _get_best_download_info(self, track_id: str, track: Any = None) -> Tuple[Any, bool]:
         """
-        Get direct download/stream URL for a track
+        Get highest quality download info for a track
 
         Args:
             track_id: Track ID
+            track: Already fetched track object (batch resolution), skips tracks() call
 
         Returns:
-            str: Direct download URL
+            (download_info, from_cache)
         """
-        try:
+        cached = self.download_info_cache.get(track_id)
+        if cached is not None:
+            return cached, True
+
+        if track is None:
             client = await self._get_client()
 
             # Get track
-            track = await client.tracks([track_id])
-            if not track or len(track) == 0:
+            tracks = await self._upstream("tracks", client.tracks([track_id]))
+            if not tracks or len(tracks) == 0:
                 raise ValueError(f"Track {track_id} not found")
+            track = tracks[0]
+
+        # Get download info
+        download_info = await self._upstream("download_info", track.get_download_info_async())
 
-            # Get download info
-            download_info = await track[0].get_download_info_async()
+        if not download_info:
+            raise ValueError(f"No download info available for track {track_id}")
+
+        # Get highest quality download
+        best_quality = max(download_info, key=lambda x: x.bitrate_in_kbps)
+        self.download_info_cache.set(track_id, best_quality)
+        return best_quality, False
+
+    async def get_track_download_url(self, track_id: str) -> str:
+        """
+        Get direct download/stream URL for a track
+
+        Direct links are reused until shortly before they expire; download info
+        (track metadata + available qualities) is cached for much longer, so a
+        refresh costs one upstream call instead of three.
+
+        Args:
+            track_id: Track ID
+
+        Returns:
+            str: Direct download URL
+        """
+        direct_link: Optional[str] = self.direct_link_cache.get(track_id)
+        if direct_link is not None:
+            logger.info("Stream URL for track %s served from cache", track_id)
+            return direct_link
 
-            if not download_info:
-                raise ValueError(f"No download info available for track {track_id}")
+        return await self.download_url_inflight.do(
+            track_id, lambda: self._resolve_download_url(track_id)
+        )
 
-            # Get highest quality download
-            best_quality = max(download_info, key=lambda x: x.bitrate_in_kbps)
+    async def _resolve_download_url(self, track_id: str, track: Any = None) -> str:
+        try:
+            best_quality, from_cache = await self._get_best_download_info(track_id, track)
 
             # Get direct link
-            direct_link = await best_quality.get_direct_link_async()
+            try:
+                direct_link: str = await self._upstream(
+                    "direct_link", best_quality.get_direct_link_async()
+                )
+            except Exception as e:
+                if not from_cache:
+                    raise
+                # Cached download info went stale: resolve the whole chain again
+                logger.warning(f"Cached download info for track {track_id} failed: {str(e)}")
+                self.download_info_cache.pop(track_id)
+                best_quality, _ = await self._get_best_download_info(track_id)
+                direct_link = await self._upstream(
+                    "direct_link", best_quality.get_direct_link_async()
+                )
 
-            logger.info(f"Got stream URL for track {track_id}")
+            self.direct_link_cache.set(track_id, direct_link)
+            logger.info("Got stream URL for track %s", track_id)
             return direct_link
 
         except Exception as e:
             logger.error(f"Error getting track download URL: {str(e)}")
             raise
 
+    async def get_track_download_urls(
+        self, track_ids: List[str], max_concurrency: int = 4
+    ) -> Dict[str, Union[str, Exception]]:
+        """
+        Get direct download/stream URLs for several tracks at once
+
+        Metadata of tracks without cached download info is fetched with a single
+        tracks() call; download info and direct links are then resolved
+        concurrently (at most max_concurrency at a time).
+
+        Args:
+            track_ids: Track IDs (duplicates are resolved once)
+            max_concurrency: Maximum parallel link resolutions
+
+        Returns:
+            Dict[str, Union[str, Exception]]: track_id -> URL, or the error for that track
+        """
+        results: Dict[str, Union[str, Exception]] = {}
+        pending: List[str] = []
+        for track_id in dict.fromkeys(track_ids):
+            direct_link = self.direct_link_cache.get(track_id)
+            if direct_link is not None:
+                results[track_id] = direct_link
+            else:
+                pending.append(track_id)
+
+        if not pending:
+            return results
+
+        # One tracks() call for everything that is not resolvable from cache
+        tracks: Dict[str, Any] = {}
+        missing = [track_id for track_id in pending if track_id not in self.download_info_cache]
+        if missing:
+            client = await self._get_client()
+            try:
+                fetched = await self._upstream("tracks", client.tracks(missing))
+            except Exception as e:
+                logger.error(f"Error fetching tracks {missing}: {str(e)}")
+                fetched = None
+                for track_id in missing:
+                    results[track_id] = e
+            by_id = {str(track.id): track for track in fetched or []}
+            for track_id in missing:
+                # IDs may come as "track:album"; the track object carries the bare ID
+                track = by_id.get(track_id) or by_id.get(track_id.split(":")[0])
+                if track is not None:
+                    tracks[track_id] = track
+                elif track_id not in results:
+                    results[track_id] = ValueError(f"Track {track_id} not found")
+            pending = [track_id for track_id in pending if track_id not in results]
+
+        semaphore = asyncio.Semaphore(max_concurrency)
+
+        async def resolve(track_id: str) -> None:
+            async with semaphore:
+                try:
+                    results[track_id] = await self.download_url_inflight.do(
+                        track_id, lambda: self._resolve_download_url(track_id, tracks.get(track_id))
+                    )
+                except Exception as e:
+                    results[track_id] = e
+
+        await asyncio.gather(*(resolve(track_id) for track_id in pending))
+        return {track_id: results[track_id] for track_id in dict.fromkeys(track_ids)}
+
+    def invalidate_direct_link(self, track_id: str) -> None:
+        """Forget cached direct link (e.g. upstream rejected it as expired)"""
+        self.direct_link_cache.pop(track_id)
+
+    def cache_stats(self) -> dict:
+        """Music cache statistics"""
+        return {
+            "search": {
+                **self.search_cache.stats(),
+                "negative_ttl_seconds": self.search_negative_ttl,
+            },
+            "download_info": self.download_info_cache.stats(),
+            "direct_links": self.direct_link_cache.stats(),
+            "upstream_calls": dict(self.upstream_calls),
+            "client": {
+                "ready": self.ready,
+                "reinits": self.reinits,
+                "init_error": self.init_error,
+            },
+            "coalescing": {
+                "search": self.search_inflight.stats(),
+                "download_url": self.download_url_inflight.stats(),
+            },
+        }
+
     async def close(self):
-        """Close client connection"""
+        """Stop background init and drop the client (called on app shutdown)"""
+        tasks = [task for task in (self._warmup_task, self._reinit_task) if task is not None]
+        self._warmup_task = self._reinit_task = None
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
         if self._client:
             # Yandex Music client doesn't have explicit close method
             self._client = None
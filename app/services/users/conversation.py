@@ -0,0 +1,190 @@
+import time
+from collections import OrderedDict, deque
+from typing import Deque, Dict, List, Optional, Tuple
+
+from app.core.config import settings
+
+# Chat formatting overhead per message (role, separators), in tokens
+MESSAGE_OVERHEAD_TOKENS = 4
+
+# Summary of dropped turns: at most this many earlier questions, each cut to SUMMARY_ITEM_CHARS
+SUMMARY_MAX_ITEMS = 5
+SUMMARY_ITEM_CHARS = 80
+SUMMARY_PREFIX = 'Ранее пользователь спрашивал: '
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Fast approximate token count: UTF-8 bytes / 4
+
+    BPE tokenizers average ~4 characters per token for English and ~2 for Russian,
+    which is also ~4 UTF-8 bytes (Cyrillic letters take two bytes), so this errs on
+    the safe side for both without running a tokenizer.
+    """
+    return len(text.encode('utf-8')) // 4 + 1
+
+
+# (role, content, tokens)
+Turn = Tuple[str, str, int]
+
+
+class Conversation:
+    """
+    Recent turns of one device's conversation
+
+    Turns live in a ring buffer of max_turns; user questions from turns that fall
+    out of it are kept as a short one-line summary.
+    """
+
+    __slots__ = ('turns', 'summary_items', 'last_active')
+
+    def __init__(self, max_turns: int):
+        self.turns: Deque[Turn] = deque(maxlen=max_turns)
+        self.summary_items: Deque[str] = deque(maxlen=SUMMARY_MAX_ITEMS)
+        self.last_active = time.monotonic()
+
+    def add(self, role: str, content: str) -> None:
+        if len(self.turns) == self.turns.maxlen:
+            self._collapse(self.turns[0])
+        self.turns.append((role, content, estimate_tokens(content) + MESSAGE_OVERHEAD_TOKENS))
+
+    def _collapse(self, turn: Turn) -> None:
+        """Remember the question of a turn that is about to be dropped"""
+        role, content, _ = turn
+        if role == 'user':
+            self.summary_items.append(content[:SUMMARY_ITEM_CHARS])
+
+    def context(self, budget: int) -> List[dict]:
+        """
+        Newest turns (plus the summary if it fits) within budget tokens, oldest first
+
+        Turns that don't fit are dropped from the prompt and collapsed into the summary.
+        """
+        selected: List[Turn] = []
+        used = 0
+        for turn in reversed(self.turns):
+            if used + turn[2] > budget:
+                break
+            selected.append(turn)
+            used += turn[2]
+
+        # Make room for the summary of dropped turns by dropping more of the oldest ones
+        messages = []
+        while True:
+            summary_items = list(self.summary_items)
+            for role, content, _ in list(self.turns)[: len(self.turns) - len(selected)]:
+                if role == 'user':
+                    summary_items.append(content[:SUMMARY_ITEM_CHARS])
+            if not summary_items:
+                break
+            summary = SUMMARY_PREFIX + '; '.join(summary_items[-SUMMARY_MAX_ITEMS:])
+            summary_tokens = estimate_tokens(summary) + MESSAGE_OVERHEAD_TOKENS
+            if used + summary_tokens <= budget:
+                messages.append({'role': 'system', 'content': summary})
+                break
+            if not selected:
+                break
+            used -= selected.pop()[2]
+
+        for role, content, _ in reversed(selected):
+            messages.append({'role': role, 'content': content})
+        return messages
+
+
+class ConversationStore:
+    """
+    Per-device conversation memory with a prompt token budget
+
+    Sessions idle for longer than idle_ttl are evicted (checked lazily, O(1) per
+    call, since sessions are kept in last-activity order); at most max_sessions
+    are kept, least recently active dropped first.
+    """
+
+    def __init__(
+        self,
+        max_turns: int = 20,
+        token_budget: int = 1500,
+        idle_ttl: float = 1800.0,
+        max_sessions: int = 1000,
+    ):
+        self.max_turns = max_turns
+        self.token_budget = token_budget
+        self.idle_ttl = idle_ttl
+        self.max_sessions = max_sessions
+
+        self._sessions: 'OrderedDict[str, Conversation]' = OrderedDict()
+
+        self.evictions = 0
+        self.trimmed_prompts = 0  # Prompts where history was cut to fit the budget
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+    def _evict_idle(self, now: float) -> None:
+        cutoff = now - self.idle_ttl
+        while self._sessions:
+            device_id, conversation = next(iter(self._sessions.items()))
+            if conversation.last_active > cutoff and len(self._sessions) <= self.max_sessions:
+                break
+            del self._sessions[device_id]
+            self.evictions += 1
+
+    def build_history(
+        self, device_id: str, system_prompt: Optional[str], text: str
+    ) -> List[dict]:
+        """
+        History messages to send between the system prompt and the user's text
+
+        The whole prompt (system prompt + history + text) stays within token_budget.
+        """
+        now = time.monotonic()
+        self._evict_idle(now)
+        conversation = self._sessions.get(device_id)
+        if conversation is None or not conversation.turns:
+            return []
+
+        fixed = estimate_tokens(text) + MESSAGE_OVERHEAD_TOKENS
+        if system_prompt:
+            fixed += estimate_tokens(system_prompt) + MESSAGE_OVERHEAD_TOKENS
+        history = conversation.context(max(self.token_budget - fixed, 0))
+        if sum(1 for message in history if message['role'] != 'system') < len(conversation.turns):
+            self.trimmed_prompts += 1
+        return history
+
+    def record(self, device_id: str, text: str, answer: str) -> None:
+        """Store a completed exchange"""
+        now = time.monotonic()
+        conversation = self._sessions.pop(device_id, None)
+        if conversation is None:
+            conversation = Conversation(self.max_turns)
+        conversation.add('user', text)
+        conversation.add('assistant', answer)
+        conversation.last_active = now
+        self._sessions[device_id] = conversation
+        self._evict_idle(now)
+
+    def clear(self, device_id: Optional[str] = None) -> None:
+        """Forget one device's conversation, or all of them"""
+        if device_id is None:
+            self._sessions.clear()
+        else:
+            self._sessions.pop(device_id, None)
+
+    def stats(self) -> Dict[str, object]:
+        return {
+            'sessions': len(self._sessions),
+            'max_turns': self.max_turns,
+            'token_budget': self.token_budget,
+            'idle_ttl_seconds': self.idle_ttl,
+            'evictions': self.evictions,
+            'trimmed_prompts': self.trimmed_prompts,
+        }
+
+
+# Singleton instance
+conversation_store = ConversationStore(
+    max_turns=settings.conversation_max_turns,
+    token_budget=settings.conversation_token_budget,
+    idle_ttl=settings.conversation_idle_ttl_seconds,
+    max_sessions=settings.conversation_max_sessions,
+)
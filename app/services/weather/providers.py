@@ -0,0 +1,219 @@
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta, timezone
+from typing import List, Optional
+
+import httpx
+
+from app.schemas.weather import CurrentWeather, DailyForecast, WeatherResponse
+
+# WMO weather interpretation codes (as used by Open-Meteo)
+WMO_DESCRIPTIONS = {
+    0: "Ясно",
+    1: "Преимущественно ясно",
+    2: "Переменная облачность",
+    3: "Пасмурно",
+    45: "Туман",
+    48: "Туман с изморозью",
+    51: "Слабая морось",
+    53: "Морось",
+    55: "Сильная морось",
+    56: "Ледяная морось",
+    57: "Ледяная морось",
+    61: "Небольшой дождь",
+    63: "Дождь",
+    65: "Сильный дождь",
+    66: "Ледяной дождь",
+    67: "Ледяной дождь",
+    71: "Небольшой снег",
+    73: "Снег",
+    75: "Сильный снег",
+    77: "Снежные зёрна",
+    80: "Небольшой ливень",
+    81: "Ливень",
+    82: "Сильный ливень",
+    85: "Снегопад",
+    86: "Сильный снегопад",
+    95: "Гроза",
+    96: "Гроза с градом",
+    99: "Гроза с сильным градом",
+}
+
+
+def describe_weather_code(code: int) -> str:
+    return WMO_DESCRIPTIONS.get(code, "Неизвестно")
+
+
+@dataclass(frozen=True)
+class Location:
+    """Named point to fetch weather for"""
+
+    name: str
+    latitude: float
+    longitude: float
+
+
+def parse_locations(value: str) -> List[Location]:
+    """
+    Parse locations from settings: "name:lat:lon" entries separated by ";"
+
+    Example: "Москва:55.7558:37.6173;Санкт-Петербург:59.9386:30.3141"
+
+    Raises:
+        ValueError: Malformed entry or no locations at all
+    """
+    locations = []
+    for entry in value.split(";"):
+        if not entry.strip():
+            continue
+        parts = entry.rsplit(":", 2)
+        try:
+            if len(parts) != 3 or not parts[0].strip():
+                raise ValueError
+            location = Location(parts[0].strip(), float(parts[1]), float(parts[2]))
+        except ValueError:
+            raise ValueError(
+                f"Invalid weather location '{entry.strip()}': expected 'name:latitude:longitude'"
+            ) from None
+        if not (-90 <= location.latitude <= 90 and -180 <= location.longitude <= 180):
+            raise ValueError(
+                f"Invalid weather location '{entry.strip()}': coordinates out of range"
+            )
+        locations.append(location)
+    if not locations:
+        raise ValueError("At least one weather location must be configured")
+    return locations
+
+
+def _utc_now() -> str:
+    return datetime.now(timezone.utc).isoformat(timespec="seconds")
+
+
+class WeatherProvider:
+    """Weather data source"""
+
+    name = "base"
+
+    async def fetch(self, location: Location) -> WeatherResponse:
+        raise NotImplementedError
+
+    async def close(self) -> None:
+        pass
+
+
+class OpenMeteoProvider(WeatherProvider):
+    """Open-Meteo forecast API (free, no API key)"""
+
+    name = "open-meteo"
+
+    def __init__(
+        self,
+        base_url: str = "https://api.open-meteo.com/v1/forecast",
+        timeout: float = 10.0,
+        forecast_days: int = 3,
+    ):
+        self.base_url = base_url
+        self.timeout = timeout
+        self.forecast_days = forecast_days
+        self._client: Optional[httpx.AsyncClient] = None
+
+    def _get_client(self) -> httpx.AsyncClient:
+        if self._client is None:
+            self._client = httpx.AsyncClient(timeout=self.timeout)
+        return self._client
+
+    async def fetch(self, location: Location) -> WeatherResponse:
+        response = await self._get_client().get(
+            self.base_url,
+            params={
+                "latitude": location.latitude,
+                "longitude": location.longitude,
+                "current": "temperature_2m,apparent_temperature,relative_humidity_2m,"
+                "wind_speed_10m,weather_code",
+                "daily": "weather_code,temperature_2m_max,temperature_2m_min",
+                "wind_speed_unit": "ms",
+                "timezone": "auto",
+                "forecast_days": self.forecast_days,
+            },
+        )
+        response.raise_for_status()
+        data = response.json()
+
+        current = data["current"]
+        daily = data["daily"]
+        return WeatherResponse(
+            location=location.name,
+            latitude=location.latitude,
+            longitude=location.longitude,
+            current=CurrentWeather(
+                temperature=current["temperature_2m"],
+                apparent_temperature=current.get("apparent_temperature"),
+                humidity=current.get("relative_humidity_2m"),
+                wind_speed=current.get("wind_speed_10m"),
+                weather_code=current["weather_code"],
+                description=describe_weather_code(current["weather_code"]),
+            ),
+            daily=[
+                DailyForecast(
+                    date=day,
+                    temperature_min=temperature_min,
+                    temperature_max=temperature_max,
+                    weather_code=code,
+                    description=describe_weather_code(code),
+                )
+                for day, code, temperature_max, temperature_min in zip(
+                    daily["time"],
+                    daily["weather_code"],
+                    daily["temperature_2m_max"],
+                    daily["temperature_2m_min"],
+                )
+            ],
+            provider=self.name,
+            updated_at=_utc_now(),
+        )
+
+    async def close(self) -> None:
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+
+class StubWeatherProvider(WeatherProvider):
+    """Fixed local data: for tests and running without network access"""
+
+    name = "stub"
+
+    def __init__(self, temperature: float = 15.0, weather_code: int = 2, forecast_days: int = 3):
+        self.temperature = temperature
+        self.weather_code = weather_code
+        self.forecast_days = forecast_days
+        self.calls = 0
+
+    async def fetch(self, location: Location) -> WeatherResponse:
+        self.calls += 1
+        today = date.today()
+        return WeatherResponse(
+            location=location.name,
+            latitude=location.latitude,
+            longitude=location.longitude,
+            current=CurrentWeather(
+                temperature=self.temperature,
+                apparent_temperature=self.temperature - 2,
+                humidity=60,
+                wind_speed=3.0,
+                weather_code=self.weather_code,
+                description=describe_weather_code(self.weather_code),
+            ),
+            daily=[
+                DailyForecast(
+                    date=(today + timedelta(days=offset)).isoformat(),
+                    temperature_min=self.temperature - 5,
+                    temperature_max=self.temperature + 3,
+                    weather_code=self.weather_code,
+                    description=describe_weather_code(self.weather_code),
+                )
+                for offset in range(self.forecast_days)
+            ],
+            provider=self.name,
+            updated_at=_utc_now(),
+        )
+
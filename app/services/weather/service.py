@@ -0,0 +1,198 @@
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+import asyncio
+import json
+import logging
+import time
+
+from app.core.config import settings
+from app.core.deadline import start_detached
+from app.schemas.weather import WeatherResponse
+from app.services.weather.providers import (
+    Location,
+    OpenMeteoProvider,
+    StubWeatherProvider,
+    WeatherProvider,
+    parse_locations,
+)
+from app.utils.singleflight import SingleFlight
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class WeatherSnapshot:
+    """Weather for one location, serialized once when fetched"""
+
+    data: WeatherResponse
+    body: bytes  # Ready-to-send JSON response body
+    fetched_at: float  # time.monotonic()
+
+    @property
+    def age(self) -> float:
+        return time.monotonic() - self.fetched_at
+
+
+class WeatherService:
+    """
+    Weather for configured locations, served from in-memory snapshots
+
+    A background task refreshes every location each refresh_interval seconds and
+    stores the pre-serialized response, so reads are a dict lookup. A snapshot older
+    than refresh_interval (e.g. the background refresh failed) is still served while
+    a refresh runs in the background (stale-while-revalidate). Concurrent refreshes
+    of the same location share one provider call.
+    """
+
+    def __init__(
+        self,
+        provider: WeatherProvider,
+        locations: List[Location],
+        refresh_interval: float = 1800.0,
+    ):
+        if not locations:
+            raise ValueError("At least one weather location must be configured")
+        self.provider = provider
+        self.locations: Dict[str, Location] = {location.name: location for location in locations}
+        self.default_location = locations[0].name
+        self.refresh_interval = refresh_interval
+
+        self._snapshots: Dict[str, WeatherSnapshot] = {}
+        self._inflight = SingleFlight()
+        self._background: Dict[str, asyncio.Task] = {}
+        self._loop_task: Optional[asyncio.Task] = None
+
+        self.stats_counters: Dict[str, int] = {
+            "fresh_reads": 0,
+            "stale_reads": 0,
+            "cold_reads": 0,  # No snapshot yet: the request waited for the provider
+            "refreshes": 0,
+            "refresh_errors": 0,
+        }
+
+    def resolve_location(self, name: Optional[str]) -> Location:
+        """Configured location by name (case-insensitive); default location for None"""
+        if name is None:
+            return self.locations[self.default_location]
+        location = self.locations.get(name)
+        if location is None:
+            for candidate in self.locations.values():
+                if candidate.name.lower() == name.lower():
+                    return candidate
+            raise ValueError(f"Unknown weather location '{name}'")
+        return location
+
+    async def get(self, location: Location) -> WeatherSnapshot:
+        """
+        Current snapshot for a location; only waits for the provider if there is none
+
+        Raises:
+            Exception: Provider error when no snapshot exists yet
+        """
+        snapshot = self._snapshots.get(location.name)
+        if snapshot is None:
+            self.stats_counters["cold_reads"] += 1
+            return await self.refresh(location)
+
+        if snapshot.age >= self.refresh_interval:
+            self.stats_counters["stale_reads"] += 1
+            self._revalidate(location)
+        else:
+            self.stats_counters["fresh_reads"] += 1
+        return snapshot
+
+    def _revalidate(self, location: Location) -> None:
+        """Refresh a stale snapshot in the background (at most one task per location)"""
+        if location.name in self._background:
+            return
+        task = start_detached(self._refresh_quietly(location))
+        self._background[location.name] = task
+        task.add_done_callback(lambda _: self._background.pop(location.name, None))
+
+    async def refresh(self, location: Location) -> WeatherSnapshot:
+        """Fetch weather for a location and replace its snapshot"""
+        return await self._inflight.do(location.name, lambda: self._fetch(location))
+
+    async def _fetch(self, location: Location) -> WeatherSnapshot:
+        try:
+            data = await self.provider.fetch(location)
+        except Exception as e:
+            self.stats_counters["refresh_errors"] += 1
+            logger.warning(f"Weather refresh for {location.name} failed: {str(e)}")
+            raise
+
+        body = json.dumps(data.model_dump(mode="json"), ensure_ascii=False).encode("utf-8")
+        snapshot = WeatherSnapshot(data=data, body=body, fetched_at=time.monotonic())
+        self._snapshots[location.name] = snapshot
+        self.stats_counters["refreshes"] += 1
+        logger.info(
+            f"Weather for {location.name} updated: {data.current.temperature}°C, "
+            f"{data.current.description}"
+        )
+        return snapshot
+
+    async def _refresh_quietly(self, location: Location) -> None:
+        try:
+            await self.refresh(location)
+        except Exception:
+            pass  # Logged in _fetch; the previous snapshot stays in use
+
+    async def refresh_all(self) -> None:
+        """Refresh every configured location concurrently"""
+        await asyncio.gather(
+            *(self._refresh_quietly(location) for location in self.locations.values())
+        )
+
+    async def _refresh_loop(self) -> None:
+        while True:
+            await self.refresh_all()
+            await asyncio.sleep(self.refresh_interval)
+
+    def start(self) -> None:
+        """Start background refresh (called on app startup)"""
+        if self._loop_task is None:
+            self._loop_task = asyncio.create_task(self._refresh_loop())
+
+    async def close(self) -> None:
+        """Stop background refresh and close the provider (called on app shutdown)"""
+        tasks = list(self._background.values())
+        if self._loop_task is not None:
+            tasks.append(self._loop_task)
+            self._loop_task = None
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        await self.provider.close()
+
+    def stats(self) -> dict:
+        return {
+            **self.stats_counters,
+            "provider": self.provider.name,
+            "refresh_interval_seconds": self.refresh_interval,
+            "snapshots": {
+                name: {"age_seconds": round(snapshot.age, 1), "bytes": len(snapshot.body)}
+                for name, snapshot in self._snapshots.items()
+            },
+            "coalescing": self._inflight.stats(),
+        }
+
+
+def create_weather_provider(name: str) -> WeatherProvider:
+    """Weather provider selected by settings.weather_provider"""
+    if name == StubWeatherProvider.name:
+        return StubWeatherProvider(forecast_days=settings.weather_forecast_days)
+    if name == OpenMeteoProvider.name:
+        return OpenMeteoProvider(
+            base_url=settings.weather_open_meteo_url,
+            timeout=settings.weather_timeout,
+            forecast_days=settings.weather_forecast_days,
+        )
+    raise ValueError(f"Unknown weather provider: {name}")
+
+
+# Singleton instance
+weather_service = WeatherService(
+    create_weather_provider(settings.weather_provider),
+    parse_locations(settings.weather_locations),
+    refresh_interval=settings.weather_refresh_interval_seconds,
+)
@@ -0,0 +1,188 @@
+import json
+import sys
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Hashable, Optional
+
+from app.database.state import BACKEND_ERRORS
+
+
+def approximate_size(value: Any) -> int:
+    """Rough memory footprint of a cached value in bytes"""
+    if isinstance(value, (str, bytes)):
+        return sys.getsizeof(value)
+    if isinstance(value, (tuple, list)):
+        return sys.getsizeof(value) + sum(approximate_size(item) for item in value)
+    if hasattr(value, '__dict__'):
+        return sys.getsizeof(value) + sum(approximate_size(v) for v in vars(value).values())
+    return sys.getsizeof(value)
+
+
+class LRUCache:
+    """
+    In-process LRU cache with per-entry TTL and a memory budget
+
+    Entries are evicted least-recently-used first once either max_items or max_bytes is
+    exceeded. Expired entries are dropped lazily on access and when evicting.
+    Not thread-safe: meant to be used from the event loop only.
+
+    With a shared state backend (see app.database.state) the cache becomes two-tier:
+    local misses are looked up in the backend and writes go to both, so worker
+    processes warm each other. Values must then be JSON-serializable.
+    """
+
+    def __init__(
+        self,
+        max_items: Optional[int] = None,
+        max_bytes: Optional[int] = None,
+        ttl: Optional[float] = None,
+        size_of: Callable[[Any], int] = approximate_size,
+        backend: Any = None,
+        namespace: str = '',
+    ):
+        self.max_items = max_items
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.size_of = size_of
+        # Memory backends are per-process, so this cache already is that state
+        self.backend = backend if backend is not None and backend.shared else None
+        self.namespace = namespace
+
+        # key -> (value, expires_at, size)
+        self._entries: 'OrderedDict[Hashable, tuple]' = OrderedDict()
+        self._bytes = 0
+
+        self.hits = 0
+        self.misses = 0
+        self.shared_hits = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.backend_errors = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, key: Hashable) -> bool:
+        entry = self._entries.get(key)
+        return entry is not None and (entry[1] is None or entry[1] > time.monotonic())
+
+    @staticmethod
+    def _backend_key(key: Hashable) -> str:
+        return key if isinstance(key, str) else json.dumps(key, ensure_ascii=False)
+
+    def _get_shared(self, key: Hashable, default: Any) -> Any:
+        """Look up a local miss in the shared backend"""
+        if self.backend is None:
+            self.misses += 1
+            return default
+        try:
+            entry = self.backend.cache_get(self.namespace, self._backend_key(key))
+        except BACKEND_ERRORS:
+            # Shared tier busy: treat as a miss, the caller recomputes
+            self.backend_errors += 1
+            entry = None
+        if entry is None:
+            self.misses += 1
+            return default
+        raw, expires_at = entry
+        value = json.loads(raw)
+        # Keep the remaining lifetime set by the writer (short negative entries,
+        # signed links), not a fresh default TTL
+        ttl = None if expires_at is None else max(expires_at - time.time(), 0.0)
+        self._store(key, value, ttl)
+        self.hits += 1
+        self.shared_hits += 1
+        return value
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """Get value and mark it as recently used; default if missing or expired"""
+        entry = self._entries.get(key)
+        if entry is None:
+            return self._get_shared(key, default)
+
+        value, expires_at, _ = entry
+        if expires_at is not None and expires_at <= time.monotonic():
+            self._remove(key)
+            self.expirations += 1
+            return self._get_shared(key, default)
+
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None) -> None:
+        """Store value; ttl overrides the cache default (None means cache default)"""
+        ttl = self.ttl if ttl is None else ttl
+        self._store(key, value, ttl)
+        if self.backend is not None:
+            try:
+                self.backend.cache_set(
+                    self.namespace,
+                    self._backend_key(key),
+                    json.dumps(value, ensure_ascii=False),
+                    ttl,
+                )
+            except BACKEND_ERRORS:
+                self.backend_errors += 1
+
+    def _store(self, key: Hashable, value: Any, ttl: Optional[float]) -> None:
+        expires_at = time.monotonic() + ttl if ttl is not None else None
+        size = self.size_of(value)
+
+        if self.max_bytes is not None and size > self.max_bytes:
+            # Would evict everything else and still not fit
+            self.pop(key)
+            return
+
+        if key in self._entries:
+            self._remove(key)
+        self._entries[key] = (value, expires_at, size)
+        self._bytes += size
+        self._evict()
+
+    def pop(self, key: Hashable, default: Any = None) -> Any:
+        """Remove entry and return its value"""
+        entry = self._entries.get(key)
+        if entry is None:
+            return default
+        self._remove(key)
+        return entry[0]
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self._bytes = 0
+
+    def _remove(self, key: Hashable) -> None:
+        _, _, size = self._entries.pop(key)
+        self._bytes -= size
+
+    def _evict(self) -> None:
+        """Drop least recently used entries until limits are met"""
+        while self._entries and (
+            (self.max_items is not None and len(self._entries) > self.max_items)
+            or (self.max_bytes is not None and self._bytes > self.max_bytes)
+        ):
+            key, (_, expires_at, _) = next(iter(self._entries.items()))
+            self._remove(key)
+            if expires_at is not None and expires_at <= time.monotonic():
+                self.expirations += 1
+            else:
+                self.evictions += 1
+
+    def stats(self) -> dict:
+        """Cache statistics"""
+        lookups = self.hits + self.misses
+        return {
+            'entries': len(self._entries),
+            'bytes': self._bytes,
+            'max_items': self.max_items,
+            'max_bytes': self.max_bytes,
+            'ttl_seconds': self.ttl,
+            'hits': self.hits,
+            'shared_hits': self.shared_hits,
+            'misses': self.misses,
+            'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0,
+            'evictions': self.evictions,
+            'expirations': self.expirations,
+            'backend_errors': self.backend_errors,
+        }
@@ -0,0 +1,152 @@
+import os
+import re
+import time
+import uuid
+from collections import OrderedDict
+from pathlib import Path
+from typing import Optional
+
+
+class DiskLRUCache:
+    """
+    Size-bounded LRU cache of files in a directory
+
+    Files are written by the caller to a temporary path (temp_path) and published
+    atomically with commit(), so readers never see partial files. Least recently
+    used files are deleted once max_bytes is exceeded. The index is rebuilt from
+    the directory on first use (recency from file mtime, which get() refreshes),
+    so the cache survives restarts. Not thread-safe: meant for the event loop only.
+
+    Several worker processes may share the directory: every commit() re-scans it
+    before evicting, so max_bytes bounds the directory as a whole, not each
+    worker's own files. A scan is one listdir per stored track, which is nothing
+    next to the download that produced it.
+    """
+
+    PART_SUFFIX = '.part'
+    # Temporary files untouched for this long are leftovers of a crashed download
+    # (live ones are written continuously, possibly by another worker)
+    PART_MAX_AGE = 3600.0
+
+    def __init__(self, directory: str, max_bytes: int, suffix: str = ''):
+        self.directory = Path(directory)
+        self.max_bytes = max_bytes
+        self.suffix = suffix
+
+        # file name (sanitized key) -> file size, least recently used first
+        self._entries: 'OrderedDict[str, int]' = OrderedDict()
+        self._bytes = 0
+        self._loaded = False
+
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.evictions = 0
+
+    @staticmethod
+    def _name(key: str) -> str:
+        return re.sub(r'[^\w.-]', '_', key)
+
+    def _load(self) -> None:
+        """Index files left by a previous run"""
+        self._loaded = True
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self._scan()
+        self._evict()
+
+    def _scan(self) -> None:
+        """Rebuild the index from the directory (other workers add and evict files too)"""
+        stale_before = time.time() - self.PART_MAX_AGE
+        files = []
+        for path in self.directory.iterdir():
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue  # Evicted or committed by another worker meanwhile
+            if path.name.endswith(self.PART_SUFFIX):
+                if stat.st_mtime < stale_before:
+                    path.unlink(missing_ok=True)
+            elif path.is_file() and path.name.endswith(self.suffix):
+                name = path.name[: len(path.name) - len(self.suffix)]
+                files.append((stat.st_mtime, name, stat.st_size))
+
+        # Equal mtimes (coarse filesystem clocks) keep the order we already know
+        known = {name: index for index, name in enumerate(self._entries)}
+        files.sort(key=lambda file: (file[0], known.get(file[1], len(known))))
+        self._entries.clear()
+        self._bytes = 0
+        for _, name, size in files:
+            self._entries[name] = size
+            self._bytes += size
+
+    def path(self, key: str) -> Path:
+        return self.directory / (self._name(key) + self.suffix)
+
+    def get(self, key: str) -> Optional[Path]:
+        """Path of the cached file (marked as recently used), None if not cached"""
+        if not self._loaded:
+            self._load()
+
+        name = self._name(key)
+        if name in self._entries:
+            path = self.path(key)
+            try:
+                os.utime(path)
+            except FileNotFoundError:
+                # Removed behind our back
+                self._bytes -= self._entries.pop(name)
+            else:
+                self._entries.move_to_end(name)
+                self.hits += 1
+                return path
+
+        self.misses += 1
+        return None
+
+    def temp_path(self, key: str) -> Path:
+        """Unique temporary path to write a new file for key to"""
+        if not self._loaded:
+            self._load()
+        return self.directory / f'{self._name(key)}.{uuid.uuid4().hex}{self.PART_SUFFIX}'
+
+    def commit(self, key: str, temp_path: Path) -> Optional[Path]:
+        """Publish a fully written temporary file; None if it exceeds the whole budget"""
+        size = temp_path.stat().st_size
+        if size > self.max_bytes:
+            temp_path.unlink(missing_ok=True)
+            return None
+
+        path = self.path(key)
+        os.replace(temp_path, path)
+        self._scan()
+        # Just written, so normally already last; don't let mtime ties evict it first
+        name = self._name(key)
+        if name in self._entries:
+            self._entries.move_to_end(name)
+        self.stores += 1
+        self._evict()
+        return path
+
+    def _evict(self) -> None:
+        """Delete least recently used files until the byte budget is met"""
+        while self._entries and self._bytes > self.max_bytes:
+            name, size = self._entries.popitem(last=False)
+            self._bytes -= size
+            (self.directory / (name + self.suffix)).unlink(missing_ok=True)
+            self.evictions += 1
+
+    def stats(self) -> dict:
+        """Cache statistics"""
+        if not self._loaded:
+            self._load()
+        lookups = self.hits + self.misses
+        return {
+            'files': len(self._entries),
+            'bytes': self._bytes,
+            'max_bytes': self.max_bytes,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0,
+            'stores': self.stores,
+            'evictions': self.evictions,
+        }
@@ -0,0 +1,63 @@
+import asyncio
+from typing import Any, Callable, Coroutine, Dict, Hashable, TypeVar
+
+from app.core.deadline import DeadlineExceeded, start_detached, within_deadline
+
+T = TypeVar('T')
+
+
+class SingleFlight:
+    """
+    Coalesce concurrent identical calls into one upstream call
+
+    The first caller for a key starts the call as a task; callers arriving while it
+    is in flight await the same task. Results and errors are delivered to every
+    waiter. A waiter being cancelled (client disconnected) does not cancel the shared
+    call while other waiters remain; the call is only cancelled when nobody waits.
+
+    The call runs without a request deadline; each waiter gives up at its own
+    deadline (DeadlineExceeded) like a cancelled waiter.
+    """
+
+    def __init__(self) -> None:
+        self._calls: Dict[Hashable, asyncio.Task] = {}
+        self._waiters: Dict[Hashable, int] = {}
+        self.calls = 0
+        self.coalesced = 0
+
+    async def do(self, key: Hashable, fn: Callable[[], Coroutine[Any, Any, T]]) -> T:
+        """Run fn() unless an identical call (same key) is already in flight"""
+        task = self._calls.get(key)
+        if task is None:
+            task = start_detached(fn())
+            self._calls[key] = task
+            self._waiters[key] = 0
+            task.add_done_callback(lambda t: self._forget(key, t))
+            self.calls += 1
+        else:
+            self.coalesced += 1
+
+        self._waiters[key] += 1
+        try:
+            return await within_deadline(asyncio.shield(task), stage='coalesced call')
+        except (asyncio.CancelledError, DeadlineExceeded):
+            if not task.done() and self._waiters.get(key) == 1 and self._calls.get(key) is task:
+                task.cancel()
+            raise
+        finally:
+            if self._calls.get(key) is task:
+                self._waiters[key] -= 1
+
+    def _forget(self, key: Hashable, task: asyncio.Task) -> None:
+        if self._calls.get(key) is task:
+            del self._calls[key]
+            del self._waiters[key]
+
+    def stats(self) -> dict:
+        total = self.calls + self.coalesced
+        return {
+            'in_flight': len(self._calls),
+            'calls': self.calls,
+            'coalesced': self.coalesced,
+            'coalesced_ratio': round(self.coalesced / total, 4) if total else 0.0,
+        }
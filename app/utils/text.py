@@ -0,0 +1,15 @@
+import re
+
+_WHITESPACE = re.compile(r'\s+')
+_EDGE_PUNCTUATION = re.compile(r'^[\s.,!?…:;"«»\'-]+|[\s.,!?…:;"«»\'-]+$')
+
+
+def normalize_text(text: str) -> str:
+    """
+    Normalize user text for cache lookups
+
+    "Какая погода?", "какая  погода" and "Какая погода!" all map to "какая погода".
+    """
+    text = text.lower().replace('ё', 'е')
+    text = _EDGE_PUNCTUATION.sub('', text)
+    return _WHITESPACE.sub(' ', text)
@@ -0,0 +1,111 @@
+"""
+Local stand-in for an OpenAI-compatible /chat/completions provider
+
+Answers the backend's prompts the way a real model would (music detection JSON,
+combined intent JSON, short chat answers) after a configurable latency with jitter;
+a fraction of requests fails with HTTP 500. `stream: true` requests get SSE deltas.
+
+Usage:
+    python -m benchmarks.fake_llm [--port 18001] [--latency 0.3] [--jitter 0.1]
+        [--error-rate 0] [--chunk-delay 0.02]
+"""
+import argparse
+import asyncio
+import json
+import random
+from typing import List, Optional
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+ANSWER = "Это ответ тестовой модели. Он нужен только для замеров задержки."
+MUSIC_VERBS = ("включи", "поставь", "play")
+
+
+def _music_query(text: str) -> Optional[str]:
+    words = text.strip().split()
+    if len(words) > 1 and words[0].lower() in MUSIC_VERBS:
+        return " ".join(words[1:])
+    return None
+
+
+def reply_for(messages: List[dict]) -> str:
+    """What a well-behaved model would answer to the backend's prompts"""
+    system = next((m["content"] for m in messages if m["role"] == "system"), "")
+    query = _music_query(messages[-1]["content"])
+    if '"is_music_command"' in system:
+        return json.dumps({"is_music_command": query is not None, "query": query or ""})
+    if '"type": "music"' in system:
+        if query:
+            return json.dumps({"type": "music", "query": query}, ensure_ascii=False)
+        return json.dumps({"type": "answer", "text": ANSWER}, ensure_ascii=False)
+    return ANSWER
+
+
+def create_app(
+    latency: float = 0.3,
+    jitter: float = 0.1,
+    error_rate: float = 0.0,
+    chunk_delay: float = 0.02,
+    seed: Optional[int] = None,
+) -> FastAPI:
+    app = FastAPI(title="Fake LLM provider")
+    rng = random.Random(seed)
+    app.state.requests = 0
+
+    async def delay() -> None:
+        await asyncio.sleep(max(0.0, latency + rng.uniform(-jitter, jitter)))
+
+    @app.post("/v1/chat/completions")
+    async def chat_completions(request: Request):
+        body = await request.json()
+        app.state.requests += 1
+        if rng.random() < error_rate:
+            await delay()
+            return JSONResponse(status_code=500, content={"error": "injected failure"})
+
+        text = reply_for(body["messages"])
+        usage = {
+            "prompt_tokens": sum(len(m["content"]) // 4 for m in body["messages"]),
+            "completion_tokens": len(text) // 4,
+        }
+
+        if not body.get("stream"):
+            await delay()
+            return {
+                "choices": [{"message": {"role": "assistant", "content": text}}],
+                "usage": usage,
+            }
+
+        async def events():
+            await delay()  # Time to first token
+            for word in text.split(" "):
+                delta = {"choices": [{"delta": {"content": word + " "}}]}
+                yield f"data: {json.dumps(delta, ensure_ascii=False)}\n\n"
+                await asyncio.sleep(chunk_delay)
+            yield "data: [DONE]\n\n"
+
+        return StreamingResponse(events(), media_type="text/event-stream")
+
+    return app
+
+
+def main():
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=18001)
+    parser.add_argument("--latency", type=float, default=0.3, help="seconds per response")
+    parser.add_argument("--jitter", type=float, default=0.1, help="+- seconds of latency")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="share of HTTP 500s")
+    parser.add_argument("--chunk-delay", type=float, default=0.02, help="seconds between deltas")
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+
+    app = create_app(args.latency, args.jitter, args.error_rate, args.chunk_delay, args.seed)
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""
+Stand-in for the Yandex Music client: same calls and result shapes, local latency
+
+install() puts it into YandexMusicService in place of ClientAsync, so search,
+track lookup, download info and direct links run through the real service code
+(caches, coalescing, metrics) without network access or a token.
+"""
+import asyncio
+import random
+import zlib
+from types import SimpleNamespace
+from typing import List, Optional
+
+
+class FakeDownloadInfo:
+    def __init__(self, client: "FakeYandexClient", track_id: str, bitrate_in_kbps: int):
+        self.client = client
+        self.track_id = track_id
+        self.bitrate_in_kbps = bitrate_in_kbps
+
+    async def get_direct_link_async(self) -> str:
+        await self.client.delay()
+        return f"https://storage.fake/{self.track_id}/{self.bitrate_in_kbps}.mp3?sign=bench"
+
+
+class FakeTrack:
+    def __init__(self, client: "FakeYandexClient", track_id: str, title: str, artist: str):
+        self.client = client
+        self.id = track_id
+        self.title = title
+        self.artists = [SimpleNamespace(name=artist)]
+        self.albums = [SimpleNamespace(title=f"{artist} - Greatest Hits")]
+        self.duration_ms = 180_000 + int(track_id) % 120_000
+        self.cover_uri = f"avatars.fake/{track_id}/%%"
+
+    async def get_download_info_async(self) -> List[FakeDownloadInfo]:
+        await self.client.delay()
+        return [FakeDownloadInfo(self.client, self.id, bitrate) for bitrate in (128, 192, 320)]
+
+
+class FakeYandexClient:
+    """Async subset of yandex_music.ClientAsync used by YandexMusicService"""
+
+    def __init__(
+        self,
+        latency: float = 0.05,
+        jitter: float = 0.02,
+        results: int = 10,
+        seed: Optional[int] = None,
+    ):
+        self.latency = latency
+        self.jitter = jitter
+        self.results = results
+        self.rng = random.Random(seed)
+        self.calls = {"search": 0, "tracks": 0}
+
+    async def delay(self) -> None:
+        await asyncio.sleep(max(0.0, self.latency + self.rng.uniform(-self.jitter, self.jitter)))
+
+    def _track(self, track_id: str) -> FakeTrack:
+        return FakeTrack(self, track_id, f"Track {track_id}", f"Artist {int(track_id) % 97}")
+
+    async def search(self, text: str, type_: str = "all") -> SimpleNamespace:
+        self.calls["search"] += 1
+        await self.delay()
+        # Same query -> same tracks, so caches and prefetch behave as in production
+        first = zlib.crc32(text.encode("utf-8")) % 1_000_000 * self.results
+        tracks = [self._track(str(first + offset)) for offset in range(self.results)]
+        return SimpleNamespace(tracks=SimpleNamespace(results=tracks))
+
+    async def tracks(self, track_ids: List[str]) -> List[FakeTrack]:
+        self.calls["tracks"] += 1
+        await self.delay()
+        return [self._track(str(track_id).split(":")[0]) for track_id in track_ids]
+
+
+def install(service, client: FakeYandexClient) -> None:
+    """Make a YandexMusicService use the fake client"""
+    service.token = "fake-token"
+    service._client = client
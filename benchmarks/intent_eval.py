@@ -0,0 +1,101 @@
+"""
+Held-out accuracy and latency of the local music intent classifier
+
+Splits the labelled utterances (bundled examples plus any --data JSONL files, e.g.
+LLM_INTENT_EXAMPLES_PATH), trains on one part and reports on the rest: accuracy,
+music precision/recall, how many utterances it would answer without the LLM at the
+confidence threshold and how accurate those answers are, exact query matches and
+microseconds per prediction. --output trains on all examples and saves the model.
+
+Usage:
+    python -m benchmarks.intent_eval [--data examples.jsonl ...] [--test-fraction 0.25]
+        [--confidence 0.9] [--output intent_model.npz]
+"""
+import argparse
+import json
+import random
+import time
+
+from app.services.llm.intent import (
+    SEED_EXAMPLES_PATH,
+    IntentClassifier,
+    load_examples,
+    numpy_available,
+)
+from app.utils.text import normalize_text
+
+
+def _ratio(part: int, whole: int):
+    return round(part / whole, 4) if whole else None
+
+
+def evaluate(examples, test_fraction: float, confidence: float, seed: int) -> dict:
+    examples = list(examples)
+    random.Random(seed).shuffle(examples)
+    split = max(1, int(len(examples) * test_fraction))
+    test, train = examples[:split], examples[split:]
+    classifier = IntentClassifier(confidence).fit(train, seed=seed)
+
+    correct = true_pos = false_pos = false_neg = 0
+    local = local_correct = span_checked = span_exact = 0
+    started = time.perf_counter()
+    probabilities = [classifier.predict_proba(text) for text, _ in test]
+    elapsed = time.perf_counter() - started
+
+    for (text, query), probability in zip(test, probabilities):
+        actual, predicted = query is not None, probability >= 0.5
+        correct += actual == predicted
+        true_pos += actual and predicted
+        false_pos += predicted and not actual
+        false_neg += actual and not predicted
+
+        decision = classifier.decide(text)
+        if decision is None:
+            continue
+        local += 1
+        local_correct += decision.is_music == actual
+        if decision.is_music and actual:
+            span_checked += 1
+            span_exact += normalize_text(decision.query) == normalize_text(query)
+
+    return {
+        "examples": len(examples),
+        "train": len(train),
+        "test": len(test),
+        "accuracy": _ratio(correct, len(test)),
+        "music_precision": _ratio(true_pos, true_pos + false_pos),
+        "music_recall": _ratio(true_pos, true_pos + false_neg),
+        "confidence": confidence,
+        "answered_locally": _ratio(local, len(test)),
+        "local_accuracy": _ratio(local_correct, local),
+        "query_exact_match": _ratio(span_exact, span_checked),
+        "us_per_prediction": round(elapsed / len(test) * 1e6, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--data", action="append", default=[], help="Extra JSONL examples")
+    parser.add_argument("--no-seed-examples", action="store_true")
+    parser.add_argument("--test-fraction", type=float, default=0.25)
+    parser.add_argument("--confidence", type=float, default=0.9)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="Train on all examples and save the model here")
+    args = parser.parse_args()
+
+    if not numpy_available():
+        parser.error('numpy is not installed (pip install -e ".[intent]")')
+
+    paths = args.data if args.no_seed_examples else [SEED_EXAMPLES_PATH, *args.data]
+    examples = [example for path in paths for example in load_examples(path)]
+    if len(examples) < 2:
+        parser.error("need at least two labelled examples")
+
+    print(json.dumps(evaluate(examples, args.test_fraction, args.confidence, args.seed), indent=2))
+    if args.output:
+        IntentClassifier(args.confidence).fit(examples, seed=args.seed).save(args.output)
+        print(f"Saved the model trained on {len(examples)} examples to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,244 @@
+"""
+Load test: drive the backend at a target request rate against local provider stand-ins
+
+Starts benchmarks.fake_llm and the backend with the fake Yandex Music client
+(benchmarks.serve) as subprocesses, then sends open-loop traffic for each scenario:
+requests start on schedule whether or not earlier ones have finished, so a slow
+backend shows up as latency instead of a silently lower request rate. Results
+(latency percentiles, throughput, status codes, backend RSS) are printed as JSON
+and can be saved to compare runs.
+
+Usage:
+    python -m benchmarks.load [--rps 20] [--duration 20] [--scenarios llm,search,stream]
+        [--llm-latency 0.3] [--llm-jitter 0.1] [--llm-error-rate 0] [--yandex-latency 0.05]
+        [--distinct 50] [--no-cache] [--output results.json]
+    python -m benchmarks.load --base-url http://127.0.0.1:8000 ...  # already running backend
+"""
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+import httpx
+
+# (method, path, JSON body) for the i-th request
+Request = Tuple[str, str, Optional[dict]]
+
+
+def _llm_request(i: int, distinct: int) -> Request:
+    n = i % distinct
+    # Every fifth query is a music command, like on a real mirror
+    text = f"включи исполнителя {n}" if n % 5 == 0 else f"Сколько будет {n} плюс {n}?"
+    return "POST", "/api/llm/query", {"text": text}
+
+
+def _search_request(i: int, distinct: int) -> Request:
+    return "GET", f"/api/music/search?q=исполнитель {i % distinct}&limit=10", None
+
+
+def _stream_request(i: int, distinct: int) -> Request:
+    return "GET", f"/api/music/track/{100_000 + i % distinct}/stream", None
+
+
+SCENARIOS: Dict[str, Callable[[int, int], Request]] = {
+    "llm": _llm_request,
+    "search": _search_request,
+    "stream": _stream_request,
+}
+
+
+def percentile(ordered: List[float], fraction: float) -> Optional[float]:
+    """Nearest-rank percentile of a sorted list"""
+    if not ordered:
+        return None
+    index = min(len(ordered) - 1, max(0, round(fraction * len(ordered) + 0.5) - 1))
+    return ordered[index]
+
+
+def rss_mb(pid: Optional[int]) -> Optional[float]:
+    """Resident set size of a process (Linux /proc), None if unavailable"""
+    if pid is None:
+        return None
+    try:
+        with open(f"/proc/{pid}/status") as status:
+            for line in status:
+                if line.startswith("VmRSS:"):
+                    return round(int(line.split()[1]) / 1024, 1)
+    except OSError:
+        pass
+    return None
+
+
+async def run_scenario(
+    client: httpx.AsyncClient,
+    name: str,
+    rps: float,
+    duration: float,
+    distinct: int,
+    headers: Dict[str, str],
+) -> dict:
+    make_request = SCENARIOS[name]
+    total = max(1, int(rps * duration))
+    latencies: List[float] = []
+    statuses: Dict[str, int] = {}
+
+    async def one(i: int) -> None:
+        method, path, body = make_request(i, distinct)
+        started = time.perf_counter()
+        try:
+            response = await client.request(method, path, json=body, headers=headers)
+            status = str(response.status_code)
+        except httpx.HTTPError as e:
+            status = type(e).__name__
+        latency = time.perf_counter() - started
+        statuses[status] = statuses.get(status, 0) + 1
+        if status == "200":
+            latencies.append(latency)
+
+    started = time.perf_counter()
+    tasks = []
+    for i in range(total):
+        delay = started + i / rps - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        tasks.append(asyncio.create_task(one(i)))
+    await asyncio.gather(*tasks)
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+
+    def ms(value: Optional[float]) -> Optional[float]:
+        return round(value * 1000, 1) if value is not None else None
+
+    return {
+        "scenario": name,
+        "target_rps": rps,
+        "requests": total,
+        "ok": len(latencies),
+        "errors": total - len(latencies),
+        "status_codes": statuses,
+        "elapsed_seconds": round(elapsed, 2),
+        "throughput_rps": round(len(latencies) / elapsed, 2),
+        "latency_ms": {
+            "p50": ms(percentile(latencies, 0.50)),
+            "p95": ms(percentile(latencies, 0.95)),
+            "p99": ms(percentile(latencies, 0.99)),
+            "max": ms(latencies[-1] if latencies else None),
+            "mean": ms(sum(latencies) / len(latencies) if latencies else None),
+        },
+    }
+
+
+async def wait_ready(base_url: str, timeout: float = 30.0) -> None:
+    deadline = time.monotonic() + timeout
+    async with httpx.AsyncClient(base_url=base_url) as client:
+        while True:
+            try:
+                if (await client.get("/health")).status_code == 200:
+                    return
+            except httpx.HTTPError:
+                pass
+            if time.monotonic() > deadline:
+                raise RuntimeError(f"Backend at {base_url} did not become ready")
+            await asyncio.sleep(0.2)
+
+
+def start_stand_ins(args) -> Tuple[List[subprocess.Popen], str, int]:
+    """Start the fake LLM provider and the backend; returns (processes, base URL, backend pid)"""
+    fake_llm = subprocess.Popen(
+        [
+            sys.executable, "-m", "benchmarks.fake_llm",
+            "--port", str(args.llm_port),
+            "--latency", str(args.llm_latency),
+            "--jitter", str(args.llm_jitter),
+            "--error-rate", str(args.llm_error_rate),
+        ],
+        stdout=sys.stderr,
+    )  # fmt: skip
+    env = {
+        **os.environ,
+        "DEEPSEEK_API_KEY": "bench",
+        "DEEPSEEK_BASE_URL": f"http://127.0.0.1:{args.llm_port}/v1",
+        "DEEPSEEK_FALLBACK_API_KEY": "bench",
+        "DEEPSEEK_FALLBACK_BASE_URL": f"http://127.0.0.1:{args.llm_port}/v1",
+        "RATE_LIMIT_ENABLED": "false",
+        "WEATHER_PROVIDER": "stub",
+    }
+    backend = subprocess.Popen(
+        [
+            sys.executable, "-m", "benchmarks.serve",
+            "--port", str(args.port),
+            "--yandex-latency", str(args.yandex_latency),
+        ],
+        env=env,
+        # Keep stdout for the JSON report
+        stdout=sys.stderr,
+    )  # fmt: skip
+    return [backend, fake_llm], f"http://127.0.0.1:{args.port}", backend.pid
+
+
+async def run(args) -> dict:
+    processes: List[subprocess.Popen] = []
+    backend_pid = None
+    base_url = args.base_url
+    if base_url is None:
+        processes, base_url, backend_pid = start_stand_ins(args)
+    try:
+        await wait_ready(base_url)
+        headers = {"Cache-Control": "no-cache"} if args.no_cache else {}
+        limits = httpx.Limits(max_connections=None, max_keepalive_connections=200)
+        results = []
+        async with httpx.AsyncClient(base_url=base_url, timeout=120, limits=limits) as client:
+            for name in args.scenarios.split(","):
+                result = await run_scenario(
+                    client, name, args.rps, args.duration, args.distinct, headers
+                )
+                result["backend_rss_mb"] = rss_mb(backend_pid)
+                results.append(result)
+    finally:
+        for process in processes:
+            process.terminate()
+        for process in processes:
+            process.wait(timeout=10)
+
+    config = {
+        key: value for key, value in vars(args).items() if key not in ("output", "base_url")
+    }
+    return {"config": config, "results": results}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--base-url", default=None, help="use a running backend instead")
+    parser.add_argument("--port", type=int, default=18000)
+    parser.add_argument("--llm-port", type=int, default=18001)
+    parser.add_argument("--scenarios", default="llm,search,stream")
+    parser.add_argument("--rps", type=float, default=20.0)
+    parser.add_argument("--duration", type=float, default=20.0, help="seconds per scenario")
+    parser.add_argument("--distinct", type=int, default=50, help="distinct queries/track IDs")
+    parser.add_argument("--no-cache", action="store_true", help="send Cache-Control: no-cache")
+    parser.add_argument("--llm-latency", type=float, default=0.3)
+    parser.add_argument("--llm-jitter", type=float, default=0.1)
+    parser.add_argument("--llm-error-rate", type=float, default=0.0)
+    parser.add_argument("--yandex-latency", type=float, default=0.05)
+    parser.add_argument("--output", default=None, help="also write the JSON report here")
+    args = parser.parse_args()
+
+    unknown = set(args.scenarios.split(",")) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"unknown scenarios: {', '.join(sorted(unknown))}")
+
+    report = asyncio.run(run(args))
+    text = json.dumps(report, indent=2, ensure_ascii=False)
+    print(text)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as output:
+            output.write(text + "\n")
+
+
+if __name__ == "__main__":
+    main()
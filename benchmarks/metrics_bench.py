@@ -0,0 +1,78 @@
+"""
+Micro-benchmark: per-request cost of MetricsMiddleware and of a histogram observation
+
+Usage:
+    python -m benchmarks.metrics_bench [--requests 200000]
+"""
+import argparse
+import asyncio
+import json
+import time
+
+from app.api.middleware.metrics import MetricsMiddleware
+from app.core.metrics import Histogram
+
+
+class _Route:
+    path = "/api/music/track/{track_id}/stream"
+
+
+async def _app(scope, receive, send):
+    scope["route"] = _Route
+    await send({"type": "http.response.start", "status": 200, "headers": []})
+    await send({"type": "http.response.body", "body": b""})
+
+
+async def _send(message):
+    pass
+
+
+async def _receive():
+    return {"type": "http.request"}
+
+
+async def _run(app, requests: int) -> float:
+    scope = {"type": "http", "method": "GET", "path": "/api/music/track/1/stream"}
+    started = time.perf_counter()
+    for _ in range(requests):
+        await app(dict(scope), _receive, _send)
+    return time.perf_counter() - started
+
+
+def bench_middleware(requests: int) -> dict:
+    bare = asyncio.run(_run(_app, requests))
+    wrapped = asyncio.run(_run(MetricsMiddleware(_app), requests))
+    return {
+        "case": "middleware",
+        "requests": requests,
+        "ns_per_request_bare": round(bare / requests * 1e9),
+        "ns_per_request_with_metrics": round(wrapped / requests * 1e9),
+        "overhead_ns": round((wrapped - bare) / requests * 1e9),
+    }
+
+
+def bench_observe(requests: int) -> dict:
+    histogram = Histogram("bench_seconds", "bench", ("provider", "mode", "outcome"))
+    values = [(i % 1000) / 100 for i in range(requests)]
+    started = time.perf_counter()
+    for value in values:
+        histogram.observe(value, "artemox", "complete", "ok")
+    elapsed = time.perf_counter() - started
+    return {
+        "case": "histogram.observe",
+        "requests": requests,
+        "ns_per_observation": round(elapsed / requests * 1e9),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--requests", type=int, default=200_000)
+    args = parser.parse_args()
+
+    results = [bench_middleware(args.requests), bench_observe(args.requests)]
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
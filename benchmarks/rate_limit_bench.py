@@ -0,0 +1,54 @@
+"""
+Micro-benchmark: per-request cost of RateLimitMiddleware as the number of clients grows
+
+Usage:
+    python -m benchmarks.rate_limit_bench [--requests 200000]
+"""
+import argparse
+import json
+import random
+import time
+
+from app.api.middleware.rate_limit import RateLimitMiddleware
+
+KEY_COUNTS = [10, 1_000, 10_000, 100_000]
+PATHS = ["/api/llm/query", "/api/music/search", "/api/music/track/1/stream"]
+
+
+def bench(keys: int, requests: int) -> dict:
+    middleware = RateLimitMiddleware(
+        app=None, requests_per_minute=10**9, llm_requests_per_minute=10**9, max_keys=keys
+    )
+    ips = [f"10.{i >> 16 & 255}.{i >> 8 & 255}.{i & 255}" for i in range(keys)]
+
+    # Warm the key table so every measured request hits an existing key
+    now = time.monotonic()
+    for ip in ips:
+        middleware._is_rate_limited(ip, PATHS[0], now)
+
+    rng = random.Random(42)
+    sample = [(rng.choice(ips), rng.choice(PATHS)) for _ in range(requests)]
+
+    started = time.perf_counter()
+    for ip, path in sample:
+        middleware._is_rate_limited(ip, path, time.monotonic())
+    elapsed = time.perf_counter() - started
+
+    return {
+        "keys": keys,
+        "requests": requests,
+        "ns_per_request": round(elapsed / requests * 1e9),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--requests", type=int, default=200_000)
+    args = parser.parse_args()
+
+    results = [bench(keys, args.requests) for keys in KEY_COUNTS]
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,32 @@
+"""
+Run the backend with the fake Yandex Music client installed
+
+LLM calls go wherever DEEPSEEK_BASE_URL points (benchmarks.load starts
+benchmarks.fake_llm and sets it).
+
+Usage:
+    python -m benchmarks.serve [--port 18000] [--yandex-latency 0.05]
+"""
+import argparse
+
+import uvicorn
+
+from app.main import app
+from app.services.music.yandex import yandex_music_service
+from benchmarks.fake_yandex import FakeYandexClient, install
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=18000)
+    parser.add_argument("--yandex-latency", type=float, default=0.05)
+    parser.add_argument("--yandex-jitter", type=float, default=0.02)
+    args = parser.parse_args()
+
+    install(yandex_music_service, FakeYandexClient(args.yandex_latency, args.yandex_jitter))
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,15 @@
 import pytest
 
+from app.services.weather.providers import StubWeatherProvider
+from app.services.weather.service import weather_service
+
 
 @pytest.fixture
 def sample_data():
     return {"key": "value"}
+
+
+@pytest.fixture(autouse=True)
+def offline_weather(monkeypatch):
+    """Keep the app's weather refresh (started with TestClient) off the network"""
+    monkeypatch.setattr(weather_service, "provider", StubWeatherProvider())
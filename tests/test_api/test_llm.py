@@ -0,0 +1,212 @@
+import asyncio
+import gc
+import warnings
+
+import pytest
+
+from app.api.endpoints import llm
+from app.schemas.llm import LLMQueryRequest
+from app.services.llm.cache import detection_cache, response_cache
+from app.services.llm.deepseek import LLMCompletion, deepseek_service
+
+
+@pytest.fixture(autouse=True)
+def clear_llm_caches():
+    response_cache.clear()
+    detection_cache.clear()
+
+
+def _fake_complete(detection_reply: str, chat_delay: float = 0.0):
+    async def complete(text, system_prompt=None, use_cache=True, history=None, **kwargs):
+        if system_prompt == llm.MUSIC_DETECTION_PROMPT:
+            return LLMCompletion(text=detection_reply, provider='fake')
+        await asyncio.sleep(chat_delay)
+        return LLMCompletion(text='answer', provider='fake', completion_tokens=5)
+
+    return complete
+
+
+def test_parse_music_detection():
+    assert llm._parse_music_detection('{"is_music_command": true, "query": "Metallica"}') == (
+        'Metallica'
+    )
+    assert llm._parse_music_detection('{"is_music_command": false, "query": ""}') is None
+    assert llm._parse_music_detection('not json') is None
+
+
+@pytest.mark.asyncio
+async def test_speculative_returns_answer_for_regular_query(monkeypatch):
+    monkeypatch.setattr(
+        deepseek_service, 'complete', _fake_complete('{"is_music_command": false}')
+    )
+    music_query, answer = await llm._detect_and_answer_speculatively('привет')
+    assert music_query is None
+    assert answer == 'answer'
+
+
+@pytest.mark.asyncio
+async def test_speculative_cancels_answer_for_music_command(monkeypatch):
+    monkeypatch.setattr(
+        deepseek_service,
+        'complete',
+        _fake_complete('{"is_music_command": true, "query": "Metallica"}', chat_delay=10),
+    )
+    before = llm.speculation_stats.cancelled_calls
+    music_query, answer = await llm._detect_and_answer_speculatively('включи металлику')
+    assert music_query == 'Metallica'
+    assert answer is None
+    assert llm.speculation_stats.cancelled_calls == before + 1
+
+
+@pytest.mark.asyncio
+async def test_speculative_cached_answer_is_not_wasted(monkeypatch):
+    async def complete(text, system_prompt=None, use_cache=True, history=None, **kwargs):
+        if system_prompt == llm.MUSIC_DETECTION_PROMPT:
+            await asyncio.sleep(0.01)  # The answer finishes first
+            return LLMCompletion(
+                text='{"is_music_command": true, "query": "Кино"}', provider='fake'
+            )
+        return LLMCompletion(text='answer', provider='fake', completion_tokens=5, cached=True)
+
+    monkeypatch.setattr(deepseek_service, 'complete', complete)
+    wasted_calls = llm.speculation_stats.wasted_calls
+    wasted_tokens = llm.speculation_stats.wasted_tokens
+
+    assert await llm._detect_and_answer_speculatively('включи кино') == ('Кино', None)
+    assert llm.speculation_stats.wasted_calls == wasted_calls
+    assert llm.speculation_stats.wasted_tokens == wasted_tokens
+
+
+@pytest.mark.asyncio
+async def test_speculative_answer_error_is_retrieved_when_detection_fails(monkeypatch):
+    async def complete(text, system_prompt=None, use_cache=True, history=None, **kwargs):
+        if system_prompt == llm.MUSIC_DETECTION_PROMPT:
+            await asyncio.sleep(0.01)
+            raise RuntimeError('detection failed')
+        raise RuntimeError('answer failed')
+
+    monkeypatch.setattr(deepseek_service, 'complete', complete)
+    unhandled = []
+    loop = asyncio.get_running_loop()
+    loop.set_exception_handler(lambda _, context: unhandled.append(context))
+    try:
+        with pytest.raises(RuntimeError, match='detection failed'):
+            await llm._detect_and_answer_speculatively('привет')
+        gc.collect()
+        await asyncio.sleep(0)
+    finally:
+        loop.set_exception_handler(None)
+    assert unhandled == []
+
+
+@pytest.mark.asyncio
+async def test_speculative_answer_is_not_created_for_a_cached_music_command(monkeypatch):
+    calls = []
+
+    async def complete(text, system_prompt=None, use_cache=True, history=None, **kwargs):
+        calls.append(system_prompt)
+        return LLMCompletion(text='answer', provider='fake')
+
+    monkeypatch.setattr(deepseek_service, 'complete', complete)
+    detection_cache.set('включи кино', 'Кино')
+
+    with warnings.catch_warnings(record=True) as caught:
+        warnings.simplefilter('always')
+        assert await llm._detect_and_answer_speculatively('Включи Кино') == ('Кино', None)
+        await asyncio.sleep(0)  # Let the cancelled answer task finish
+        gc.collect()
+    assert calls == []
+    assert not [w for w in caught if 'never awaited' in str(w.message)]
+
+
+def test_parse_combined_response():
+    parse = llm._parse_combined_response
+    assert parse('{"type": "music", "query": "Metallica"}') == ('Metallica', None)
+    assert parse('{"is_music_command": true, "query": "Kino"}') == ('Kino', None)
+    assert parse('```json\n{"type": "answer", "text": "Привет!"}\n```') == (None, 'Привет!')
+    assert parse('Просто ответ без JSON') == (None, 'Просто ответ без JSON')
+    assert parse('{"type": "answer", "text": ') == (None, None)
+    assert parse('{"type": "music", "query": ""}') == (None, None)
+
+
+def test_query_stream_emits_sentence_chunks(monkeypatch):
+    from fastapi.testclient import TestClient
+
+    from app.main import app
+
+    async def fake_stream(text, system_prompt=None, use_cache=True, history=None, **kwargs):
+        for delta in ['Привет! Как ', 'у тебя дела? ', 'Всё хорошо']:
+            yield delta
+
+    monkeypatch.setattr(
+        deepseek_service, 'complete', _fake_complete('{"is_music_command": false}')
+    )
+    monkeypatch.setattr(deepseek_service, 'stream', fake_stream)
+
+    with TestClient(app) as client:
+        response = client.post('/api/llm/query/stream', json={'text': 'привет'})
+
+    assert response.status_code == 200
+    assert response.headers['content-type'].startswith('text/event-stream')
+    events = [block for block in response.text.split('\n\n') if block]
+    assert events[0] == 'event: chunk\ndata: {"text": "Привет! Как у тебя дела?"}'
+    assert events[1] == 'event: chunk\ndata: {"text": "Всё хорошо"}'
+    assert events[-1].startswith('event: done')
+
+
+@pytest.mark.asyncio
+async def test_detection_result_is_cached(monkeypatch):
+    calls = []
+    fake = _fake_complete('{"is_music_command": true, "query": "Кино"}')
+
+    async def counting_complete(text, system_prompt=None, use_cache=True, history=None, **kwargs):
+        calls.append(text)
+        return await fake(text, system_prompt, use_cache)
+
+    monkeypatch.setattr(deepseek_service, 'complete', counting_complete)
+
+    assert await llm._detect_music_command('Включи Кино') == 'Кино'
+    assert await llm._detect_music_command('включи кино!') == 'Кино'
+    assert len(calls) == 1
+    assert await llm._detect_music_command('включи кино', use_cache=False) == 'Кино'
+    assert len(calls) == 2
+
+
+def test_cache_control_bypass():
+    assert llm._use_cache(None)
+    assert llm._use_cache('max-age=0')
+    assert not llm._use_cache('no-cache')
+    assert not llm._use_cache('private, No-Store')
+
+
+@pytest.mark.asyncio
+async def test_query_sends_device_conversation_history(monkeypatch):
+    from app.services.users.conversation import conversation_store
+
+    conversation_store.clear()
+    seen_history = []
+
+    async def complete(text, system_prompt=None, use_cache=True, history=None, **kwargs):
+        if system_prompt == llm.MUSIC_DETECTION_PROMPT:
+            return LLMCompletion(text='{"is_music_command": false}', provider='fake')
+        seen_history.append(history)
+        return LLMCompletion(text=f'ответ на {text}', provider='fake')
+
+    monkeypatch.setattr(deepseek_service, 'complete', complete)
+    monkeypatch.setattr(llm.settings, 'llm_combined_intent', False)
+    monkeypatch.setattr(llm.settings, 'llm_speculative_answer', False)
+
+    for text, device_id in [
+        ('Кто написал Онегина?', 'mirror-1'),
+        ('А когда?', 'mirror-1'),
+        ('А когда?', None),
+    ]:
+        await llm.query_llm(LLMQueryRequest(text=text), cache_control=None, x_device_id=device_id)
+
+    assert seen_history[0] is None
+    assert seen_history[1] == [
+        {'role': 'user', 'content': 'Кто написал Онегина?'},
+        {'role': 'assistant', 'content': 'ответ на Кто написал Онегина?'},
+    ]
+    assert seen_history[2] is None
+    conversation_store.clear()
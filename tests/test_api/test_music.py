@@ -0,0 +1,26 @@
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.services.music.audio import audio_proxy
+from app.utils.disk_cache import DiskLRUCache
+
+AUDIO = b'ID3' + bytes(range(256)) * 40
+
+
+def test_cached_audio_supports_range_requests(monkeypatch, tmp_path):
+    cache = DiskLRUCache(str(tmp_path), 10**6, suffix='.mp3')
+    temp_path = cache.temp_path('42')
+    temp_path.write_bytes(AUDIO)
+    cache.commit('42', temp_path)
+    monkeypatch.setattr(audio_proxy, 'cache', cache)
+
+    with TestClient(app) as client:
+        response = client.get('/api/music/track/42/audio', headers={'Range': 'bytes=100-199'})
+        full = client.get('/api/music/track/42/audio')
+
+    assert response.status_code == 206
+    assert response.headers['content-range'] == f'bytes 100-199/{len(AUDIO)}'
+    assert response.content == AUDIO[100:200]
+    assert full.status_code == 200
+    assert full.headers['accept-ranges'] == 'bytes'
+    assert full.content == AUDIO
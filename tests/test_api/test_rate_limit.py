@@ -0,0 +1,125 @@
+import sqlite3
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.api.middleware.rate_limit import RateLimitMiddleware, SlidingWindowLimiter
+from app.database.state import MemoryStateBackend, SQLiteStateBackend, StateBackend
+
+
+def _client(requests_per_minute=5, llm_requests_per_minute=2) -> TestClient:
+    app = FastAPI()
+
+    @app.get("/health")
+    async def health():
+        return {"status": "ok"}
+
+    @app.get("/api/llm/health")
+    async def llm_health():
+        return {"status": "ok"}
+
+    @app.get("/api/music/health")
+    async def music_health():
+        return {"status": "ok"}
+
+    app.add_middleware(
+        RateLimitMiddleware,
+        requests_per_minute=requests_per_minute,
+        llm_requests_per_minute=llm_requests_per_minute,
+    )
+    return TestClient(app)
+
+
+def test_llm_class_limited_by_prefix():
+    client = _client()
+    assert client.get("/api/llm/health").status_code == 200
+    assert client.get("/api/llm/health").status_code == 200
+
+    response = client.get("/api/llm/health")
+    assert response.status_code == 429
+    assert response.json()["detail"].startswith("LLM rate limit exceeded")
+    assert 1 <= int(response.headers["Retry-After"]) <= 60
+
+    # Other routes still have room in the global budget
+    assert client.get("/api/music/health").status_code == 200
+
+
+def test_health_is_exempt():
+    client = _client(requests_per_minute=1)
+    for _ in range(5):
+        assert client.get("/health").status_code == 200
+
+
+def test_sliding_window_retry_after():
+    limiter = SlidingWindowLimiter(window=60)
+    key = "global:1.2.3.4"
+    for _ in range(3):
+        assert limiter.check(key, 3, now=10.0) == 0
+        limiter.hit(key, now=10.0)
+
+    # Full window: retry once the next window starts
+    assert limiter.check(key, 3, now=30.0) == 30.0
+    # Half-way into the next window the previous window's share has decayed to 1.5 hits
+    assert limiter.check(key, 3, now=90.0) == 0
+
+
+def test_key_table_is_bounded():
+    backend = MemoryStateBackend(max_keys=10)
+    limiter = SlidingWindowLimiter(window=60, backend=backend)
+    for i in range(100):
+        limiter.hit(f"global:10.0.0.{i}", now=1.0)
+    assert len(limiter) == 10
+    assert backend.evictions == 90
+
+
+def test_sqlite_backend_shares_counters_between_workers(tmp_path):
+    path = str(tmp_path / "state.db")
+    # Two backends on one file behave like two uvicorn worker processes
+    worker_a = SlidingWindowLimiter(window=60, backend=SQLiteStateBackend(path))
+    worker_b = SlidingWindowLimiter(window=60, backend=SQLiteStateBackend(path))
+
+    worker_a.hit("llm:1.2.3.4", now=10.0)
+    worker_b.hit("llm:1.2.3.4", now=11.0)
+
+    assert worker_a.check("llm:1.2.3.4", 2, now=12.0) > 0
+    assert worker_b.check("llm:1.2.3.4", 3, now=12.0) == 0
+    assert len(worker_a) == 1
+
+
+def test_incomplete_backend_fails_at_construction():
+    class CacheOnlyBackend(StateBackend):
+        def rate_keys(self) -> int:
+            return 0
+
+    with pytest.raises(TypeError):
+        CacheOnlyBackend()
+
+
+def test_locked_sqlite_backend_fails_open(tmp_path):
+    path = str(tmp_path / "state.db")
+    app = FastAPI()
+
+    @app.get("/api/music/health")
+    async def music_health():
+        return {"status": "ok"}
+
+    app.add_middleware(RateLimitMiddleware, requests_per_minute=1, backend=SQLiteStateBackend(path))
+    client = TestClient(app)
+    assert client.get("/api/music/health").status_code == 200
+
+    # Another worker holds the write lock for longer than the busy timeout
+    blocker = sqlite3.connect(path, isolation_level=None)
+    blocker.execute("BEGIN IMMEDIATE")
+    try:
+        assert client.get("/api/music/health").status_code == 200
+    finally:
+        blocker.execute("ROLLBACK")
+        blocker.close()
+
+    middleware = client.app.middleware_stack
+    while not isinstance(middleware, RateLimitMiddleware):
+        middleware = middleware.app
+    assert middleware.backend_errors == 1
+    # The lock is gone: limits apply again
+    assert client.get("/api/music/health").status_code == 429
@@ -0,0 +1,83 @@
+import pytest
+
+from app.api.endpoints import ws
+from app.services.llm.cache import detection_cache, response_cache
+from app.services.llm.deepseek import LLMCompletion, deepseek_service
+
+
+@pytest.fixture(autouse=True)
+def clear_llm_caches():
+    response_cache.clear()
+    detection_cache.clear()
+
+
+@pytest.fixture
+def client(monkeypatch):
+    from fastapi.testclient import TestClient
+
+    from app.main import app
+
+    async def fake_complete(text, system_prompt=None, use_cache=True, history=None, profile=None):
+        return LLMCompletion(text='{"is_music_command": false}', provider='fake')
+
+    async def fake_stream(text, system_prompt=None, use_cache=True, history=None):
+        for delta in ['Привет, как твои дела? ', 'У меня всё хорошо.']:
+            yield delta
+
+    monkeypatch.setattr(deepseek_service, 'complete', fake_complete)
+    monkeypatch.setattr(deepseek_service, 'stream', fake_stream)
+    monkeypatch.setattr(ws.settings, 'rate_limit_enabled', False)
+
+    with TestClient(app) as client:
+        yield client
+
+
+def test_stream_and_ping_are_multiplexed(client):
+    with client.websocket_connect('/ws/mirror') as websocket:
+        websocket.send_json({'id': 'a', 'type': 'llm.stream', 'text': 'привет'})
+        websocket.send_json({'id': 'b', 'type': 'ping'})
+
+        messages = [websocket.receive_json() for _ in range(4)]
+
+    assert {'id': 'b', 'type': 'pong'} in messages
+    stream = [m for m in messages if m['id'] == 'a']
+    assert [m['type'] for m in stream] == ['chunk', 'chunk', 'done']
+    assert stream[0]['text'] == 'Привет, как твои дела?'
+    assert stream[-1]['response'] == 'Привет, как твои дела? У меня всё хорошо.'
+
+
+
+def test_cancel_of_an_unknown_id_is_ignored(client):
+    with client.websocket_connect('/ws/mirror') as websocket:
+        websocket.send_json({'id': ['a'], 'type': 'cancel'})
+        websocket.send_json({'id': 'b', 'type': 'ping'})
+        assert websocket.receive_json() == {'id': 'b', 'type': 'pong'}
+
+def test_invalid_requests_get_errors(client):
+    with client.websocket_connect('/ws/mirror') as websocket:
+        websocket.send_text('not json')
+        assert websocket.receive_json()['status'] == 400
+
+        websocket.send_json({'id': 'x', 'type': 'unknown'})
+        assert websocket.receive_json() == {
+            'id': 'x',
+            'type': 'error',
+            'status': 400,
+            'detail': "Unknown message type 'unknown'",
+        }
+
+        websocket.send_json({'id': 'y', 'type': 'llm.query', 'text': ''})
+        error = websocket.receive_json()
+        assert (error['id'], error['status']) == ('y', 422)
+
+        websocket.send_json({'id': 'z', 'type': 'music.search', 'q': 'Кино', 'prefetch': 'false'})
+        error = websocket.receive_json()
+        assert (error['id'], error['status']) == ('z', 422)
+
+
+def test_llm_limit_is_keyed_like_the_http_middleware(client):
+    headers = {'X-Forwarded-For': '203.0.113.7, 10.0.0.1'}
+    with client.websocket_connect('/ws/mirror', headers=headers):
+        (connection,) = ws.connections
+
+    assert connection.client_ip == '203.0.113.7'
@@ -0,0 +1,81 @@
+import asyncio
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.core.deadline import (
+    DeadlineExceeded,
+    ensure_budget,
+    parse_timeout_header,
+    remaining,
+    start_deadline,
+    start_detached,
+    within_deadline,
+)
+from app.services.llm.deepseek import deepseek_service
+
+
+def test_timeout_header_is_capped_and_validated(monkeypatch):
+    monkeypatch.setattr('app.core.deadline.settings.request_deadline_max_seconds', 30.0)
+
+    assert parse_timeout_header('2.5') == 2.5
+    assert parse_timeout_header('600') == 30.0
+    assert parse_timeout_header('soon') is None
+    assert parse_timeout_header('0') is None
+    assert parse_timeout_header(None) is None
+
+
+@pytest.mark.asyncio
+async def test_awaits_get_only_the_remaining_budget():
+    start_deadline(0.05)
+
+    started = time.monotonic()
+    with pytest.raises(DeadlineExceeded):
+        await within_deadline(asyncio.sleep(1), stage='answer')
+    assert time.monotonic() - started < 0.5
+
+    # Out of budget: the next stage is not started at all
+    with pytest.raises(DeadlineExceeded, match='before answer'):
+        ensure_budget(0.1, 'answer')
+
+
+@pytest.mark.asyncio
+async def test_own_timeout_shorter_than_deadline_is_a_plain_timeout():
+    start_deadline(5)
+
+    with pytest.raises(asyncio.TimeoutError):
+        await within_deadline(asyncio.sleep(1), timeout=0.01)
+    assert remaining() > 4
+
+
+@pytest.mark.asyncio
+async def test_detached_tasks_have_no_deadline():
+    start_deadline(0.01)
+
+    task = start_detached(within_deadline(asyncio.sleep(0.05, 'done'), stage='background'))
+    assert await task == 'done'
+    assert remaining() is not None
+
+
+def test_query_over_budget_returns_504(monkeypatch):
+    from app.api.endpoints import llm
+    from app.main import app
+
+    async def complete(text, system_prompt=None, use_cache=True, history=None, profile=None):
+        return await within_deadline(asyncio.sleep(5), stage='answer')
+
+    monkeypatch.setattr(deepseek_service, 'complete', complete)
+    monkeypatch.setattr(llm.settings, 'llm_combined_intent', True)
+
+    started = time.monotonic()
+    with TestClient(app) as client:
+        response = client.post(
+            '/api/llm/query',
+            json={'text': 'который час'},
+            headers={'Cache-Control': 'no-cache', 'X-Request-Timeout': '0.2'},
+        )
+
+    assert response.status_code == 504
+    assert 'Deadline exceeded' in response.json()['detail']
+    assert time.monotonic() - started < 3
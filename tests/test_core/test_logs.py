@@ -0,0 +1,58 @@
+import json
+import logging
+import queue
+
+import pytest
+
+from app.core.logs import (
+    JsonFormatter,
+    NonBlockingQueueHandler,
+    SamplingFilter,
+    log_records_dropped,
+    parse_sample_rates,
+)
+
+
+def _record(name='app.test', level=logging.INFO, msg='Found %s tracks', args=(3,)):
+    return logging.LogRecord(name, level, __file__, 1, msg, args, None)
+
+
+def test_json_formatter_builds_message_from_args():
+    line = JsonFormatter().format(_record())
+
+    entry = json.loads(line)
+    assert entry['message'] == 'Found 3 tracks'
+    assert entry['level'] == 'INFO'
+    assert entry['logger'] == 'app.test'
+
+
+def test_queue_handler_drops_when_full_and_does_not_format():
+    class Unformattable:
+        def __str__(self):
+            raise AssertionError('formatted on the event loop')
+
+    handler = NonBlockingQueueHandler(queue.Queue(maxsize=1))
+    dropped_before = log_records_dropped.value()
+
+    handler.handle(_record(args=(Unformattable(),)))
+    handler.handle(_record())
+
+    assert handler.queue.qsize() == 1
+    assert handler.dropped == 1
+    assert log_records_dropped.value() == dropped_before + 1
+
+
+def test_sampling_keeps_every_nth_info_record_of_child_loggers():
+    sampling = SamplingFilter(parse_sample_rates('httpx=3'))
+
+    kept = [sampling.filter(_record(name='httpx._client')) for _ in range(6)]
+
+    assert kept == [True, False, False, True, False, False]
+    assert sampling.filter(_record(name='httpx._client', level=logging.WARNING))
+    assert sampling.filter(_record(name='app.test'))
+
+
+@pytest.mark.parametrize('value', ['httpx', 'httpx=0', '=5', 'httpx=many'])
+def test_invalid_sample_rates_are_rejected(value):
+    with pytest.raises(ValueError, match='logger=N'):
+        parse_sample_rates(value)
@@ -0,0 +1,46 @@
+from fastapi.testclient import TestClient
+
+from app.core.metrics import Histogram, MetricsRegistry, http_request_duration
+
+
+def test_histogram_renders_cumulative_buckets():
+    registry = MetricsRegistry()
+    histogram = registry.histogram('test_seconds', 'Test latency', ('call',), buckets=(0.1, 1.0))
+    counter = registry.counter('test_total', 'Test events', ('kind',))
+    for value in (0.05, 0.1, 0.5, 3.0):
+        histogram.observe(value, 'search')
+    counter.inc('a"b')
+
+    lines = registry.render().splitlines()
+
+    assert '# TYPE test_seconds histogram' in lines
+    assert 'test_seconds_bucket{call="search",le="0.1"} 2' in lines
+    assert 'test_seconds_bucket{call="search",le="1.0"} 3' in lines
+    assert 'test_seconds_bucket{call="search",le="+Inf"} 4' in lines
+    assert 'test_seconds_sum{call="search"} 3.65' in lines
+    assert 'test_seconds_count{call="search"} 4' in lines
+    assert 'test_total{kind="a\\"b"} 1' in lines
+
+
+def test_histogram_count_by_labels():
+    histogram = Histogram('test_seconds', 'Test latency', ('provider',))
+    histogram.observe(0.2, 'artemox')
+    assert histogram.count('artemox') == 1
+    assert histogram.count('deepseek') == 0
+
+
+def test_requests_are_recorded_by_route_template():
+    from app.main import app
+
+    before = http_request_duration.count('GET', '/api/weather/locations', '200')
+    with TestClient(app) as client:
+        assert client.get('/api/weather/locations').status_code == 200
+        response = client.get('/metrics')
+
+    assert response.status_code == 200
+    assert response.headers['content-type'].startswith('text/plain; version=0.0.4')
+    assert http_request_duration.count('GET', '/api/weather/locations', '200') == before + 1
+    assert (
+        'smartmirror_http_request_duration_seconds_count'
+        '{method="GET",route="/api/weather/locations",status="200"}'
+    ) in response.text
@@ -0,0 +1,89 @@
+import asyncio
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.api.middleware.tracing import TracingMiddleware
+from app.core.tracing import SlowTraces, Trace, slow_traces, span, start_trace, traced
+from app.services.llm.deepseek import LLMCompletion, deepseek_service
+
+
+def test_span_outside_request_is_noop():
+    with span('detect') as stage:
+        pass
+    assert stage.trace is None
+
+
+@pytest.mark.asyncio
+async def test_spans_of_child_tasks_join_the_request_trace():
+    async def request():
+        trace = start_trace('POST', '/api/llm/query')
+        with span('detect'):
+            await asyncio.create_task(traced('answer', lambda: asyncio.sleep(0.01)))
+        return trace
+
+    trace = await asyncio.create_task(request())
+
+    assert [name for name, _, _ in trace.spans] == ['answer', 'detect']
+    assert trace.server_timing().startswith('answer;dur=')
+    assert 'total;dur=' in trace.server_timing()
+
+
+def test_slow_traces_keep_the_slowest():
+    slow = SlowTraces(capacity=2)
+    for duration in (0.3, 0.1, 0.5, 0.2):
+        trace = Trace('GET', f'/{duration}')
+        trace.ended = trace.started + duration
+        slow.record(trace)
+
+    assert [trace['path'] for trace in slow.snapshot()] == ['/0.5', '/0.3']
+    assert slow.recorded == 4
+
+
+@pytest.mark.asyncio
+async def test_streamed_responses_are_not_kept():
+    async def stream(scope, receive, send):
+        await send({'type': 'http.response.start', 'status': 200, 'headers': []})
+        await send({'type': 'http.response.body', 'body': b'chunk', 'more_body': True})
+        await send({'type': 'http.response.body', 'body': b''})
+
+    async def send(message):
+        pass
+
+    slow_traces.clear()
+    streamed = slow_traces.streamed
+    scope = {'type': 'http', 'method': 'GET', 'path': '/api/music/track/1/audio'}
+    await TracingMiddleware(stream)(scope, None, send)
+
+    assert slow_traces.snapshot() == []
+    assert slow_traces.streamed == streamed + 1
+
+
+def test_query_reports_stages_in_server_timing(monkeypatch):
+    from app.api.endpoints import llm
+    from app.main import app
+
+    async def complete(text, system_prompt=None, use_cache=True, history=None, profile=None):
+        if system_prompt == llm.MUSIC_DETECTION_PROMPT:
+            return LLMCompletion(text='{"is_music_command": false}', provider='fake')
+        return LLMCompletion(text='answer', provider='fake')
+
+    monkeypatch.setattr(deepseek_service, 'complete', complete)
+    monkeypatch.setattr(llm.settings, 'llm_combined_intent', False)
+    monkeypatch.setattr(llm.settings, 'llm_speculative_answer', False)
+    slow_traces.clear()
+
+    with TestClient(app) as client:
+        response = client.post(
+            '/api/llm/query', json={'text': 'который час'}, headers={'Cache-Control': 'no-cache'}
+        )
+        debug_endpoint = client.get('/debug/traces')
+    traces = slow_traces.snapshot()
+
+    assert response.status_code == 200
+    stages = [part.split(';')[0] for part in response.headers['server-timing'].split(', ')]
+    assert stages == ['detect', 'answer', 'total']
+    traced_query = next(trace for trace in traces if trace['path'] == '/api/llm/query')
+    assert [stage['name'] for stage in traced_query['spans']] == ['detect', 'answer']
+    # Not served without TRACING_DEBUG_ENDPOINTS / DEBUG
+    assert debug_endpoint.status_code == 404
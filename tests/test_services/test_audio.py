@@ -0,0 +1,70 @@
+import httpx
+import pytest
+
+from app.services.music.audio import AudioProxy, UpstreamAudioError
+from app.utils.disk_cache import DiskLRUCache
+
+AUDIO = b'ID3' + bytes(range(256)) * 40
+
+
+class FakeMusicService:
+    def __init__(self):
+        self.version = 0
+        self.invalidated = []
+
+    async def get_track_download_url(self, track_id):
+        return f'https://storage.example/{track_id}?v={self.version}'
+
+    def invalidate_direct_link(self, track_id):
+        self.invalidated.append(track_id)
+        self.version += 1
+
+
+def _proxy(tmp_path, handler) -> AudioProxy:
+    proxy = AudioProxy(FakeMusicService(), DiskLRUCache(str(tmp_path), 10**6), chunk_size=1024)
+    proxy._client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    return proxy
+
+
+async def _read(proxy, track_id, range_header=None) -> bytes:
+    response = await proxy.open_upstream(track_id, range_header)
+    return b''.join([chunk async for chunk in proxy.iter_body(track_id, response)])
+
+
+@pytest.mark.asyncio
+async def test_full_download_is_cached(tmp_path):
+    requests = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        requests.append(request)
+        return httpx.Response(200, content=AUDIO)
+
+    proxy = _proxy(tmp_path, handler)
+
+    assert proxy.cached_path('1') is None
+    assert await _read(proxy, '1') == AUDIO
+    assert proxy.cached_path('1').read_bytes() == AUDIO
+    assert len(requests) == 1
+    await proxy.close()
+
+
+@pytest.mark.asyncio
+async def test_expired_link_is_refreshed_once(tmp_path):
+    def handler(request: httpx.Request) -> httpx.Response:
+        if request.url.params['v'] == '0':
+            return httpx.Response(410)
+        assert request.headers['range'] == 'bytes=0-9'
+        return httpx.Response(206, content=AUDIO[:10])
+
+    proxy = _proxy(tmp_path, handler)
+
+    assert await _read(proxy, '1', 'bytes=0-9') == AUDIO[:10]
+    assert proxy.service.invalidated == ['1']
+    # Partial responses are not cached
+    assert proxy.cached_path('1') is None
+
+    proxy.service.version = 0
+    proxy._client = httpx.AsyncClient(transport=httpx.MockTransport(lambda r: httpx.Response(410)))
+    with pytest.raises(UpstreamAudioError):
+        await proxy.open_upstream('1')
+    await proxy.close()
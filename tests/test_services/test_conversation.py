@@ -0,0 +1,60 @@
+from app.services.users.conversation import ConversationStore, estimate_tokens
+
+
+def test_estimate_tokens_counts_utf8_bytes():
+    assert estimate_tokens('') == 1
+    assert estimate_tokens('abcdefgh') == 3
+    # Cyrillic letters take two bytes each
+    assert estimate_tokens('привет') == 4
+
+
+def test_history_is_trimmed_to_token_budget_with_summary():
+    store = ConversationStore(max_turns=20, token_budget=200)
+    for i in range(6):
+        store.record('mirror', f'Вопрос номер {i} про погоду', f'Ответ номер {i}, всё хорошо')
+
+    history = store.build_history('mirror', 'Ты помощник', 'А завтра?')
+
+    assert history[0]['role'] == 'system'
+    assert history[0]['content'].startswith('Ранее пользователь спрашивал: Вопрос номер 0')
+    # Newest turns are kept, in order, and the whole prompt fits the budget
+    assert history[-1] == {'role': 'assistant', 'content': 'Ответ номер 5, всё хорошо'}
+    assert len(history) < 12
+    total = sum(estimate_tokens(m['content']) + 4 for m in history)
+    assert total + estimate_tokens('Ты помощник') + estimate_tokens('А завтра?') + 8 <= 200
+    assert store.stats()['trimmed_prompts'] == 1
+
+
+def test_ring_buffer_collapses_dropped_questions():
+    store = ConversationStore(max_turns=4, token_budget=10_000)
+    for i in range(3):
+        store.record('mirror', f'q{i}', f'a{i}')
+
+    history = store.build_history('mirror', None, 'next')
+    assert history == [
+        {'role': 'system', 'content': 'Ранее пользователь спрашивал: q0'},
+        {'role': 'user', 'content': 'q1'},
+        {'role': 'assistant', 'content': 'a1'},
+        {'role': 'user', 'content': 'q2'},
+        {'role': 'assistant', 'content': 'a2'},
+    ]
+
+
+def test_idle_and_excess_sessions_are_evicted(monkeypatch):
+    store = ConversationStore(idle_ttl=60, max_sessions=2)
+    clock = [1000.0]
+    monkeypatch.setattr('app.services.users.conversation.time.monotonic', lambda: clock[0])
+
+    store.record('a', 'q', 'a')
+    clock[0] += 30
+    store.record('b', 'q', 'a')
+    store.record('c', 'q', 'a')
+    assert len(store) == 2  # 'a' dropped: least recently active over max_sessions
+
+    clock[0] += 45
+    assert store.build_history('b', None, 'x') != []
+
+    clock[0] += 20
+    assert store.build_history('b', None, 'x') == []
+    assert len(store) == 0
+    assert store.stats()['evictions'] == 3
@@ -0,0 +1,158 @@
+import asyncio
+import json
+import time
+
+import httpx
+import pytest
+
+from app.core.deadline import DeadlineExceeded, start_deadline
+from app.services.llm.cache import response_cache
+from app.services.llm.deepseek import DeepSeekService
+
+
+@pytest.fixture(autouse=True)
+def clear_response_cache():
+    response_cache.clear()
+
+
+def _completion(text: str) -> dict:
+    return {'choices': [{'message': {'content': text}}]}
+
+
+def _service_with_transport(handler) -> DeepSeekService:
+    service = DeepSeekService()
+    service.primary_api_key = 'test-key'
+    service.fallback_api_key = ''
+    client = service._get_client('artemox')
+    client._transport = httpx.MockTransport(handler)
+    return service
+
+
+@pytest.mark.asyncio
+async def test_query_reuses_pooled_client():
+    calls = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        calls.append(request)
+        return httpx.Response(200, json=_completion('ok'))
+
+    service = _service_with_transport(handler)
+    client = service._get_client('artemox')
+
+    assert await service.query('hi', use_cache=False) == 'ok'
+    assert await service.query('hi again', use_cache=False) == 'ok'
+    assert service._get_client('artemox') is client
+    assert len(calls) == 2
+
+    stats = service.pool_stats()['artemox']
+    assert stats['requests_total'] == 2
+    assert stats['requests_in_flight'] == 0
+
+    await service.close()
+    assert service.pool_stats() == {}
+
+
+@pytest.mark.asyncio
+async def test_stream_parses_sse_deltas():
+    body = (
+        'data: {"choices": [{"delta": {"role": "assistant"}}]}\n\n'
+        'data: {"choices": [{"delta": {"content": "При"}}]}\n\n'
+        'data: {"choices": [{"delta": {"content": "вет"}}]}\n\n'
+        'data: [DONE]\n\n'
+    )
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        assert b'"stream": true' in request.content or b'"stream":true' in request.content
+        return httpx.Response(200, text=body, headers={'Content-Type': 'text/event-stream'})
+
+    service = _service_with_transport(handler)
+    deltas = [delta async for delta in service.stream('hi')]
+    assert deltas == ['При', 'вет']
+
+
+@pytest.mark.asyncio
+async def test_repeated_query_served_from_cache():
+    calls = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        calls.append(request)
+        return httpx.Response(200, json=_completion('Солнечно'))
+
+    service = _service_with_transport(handler)
+
+    first = await service.complete('Какая погода?')
+    second = await service.complete('какая   погода')
+    assert second.text == first.text
+    assert second.cached
+    assert len(calls) == 1
+
+    await service.complete('какая погода', use_cache=False)
+    assert len(calls) == 2
+
+
+@pytest.mark.asyncio
+async def test_attempts_stop_at_the_request_deadline():
+    calls = []
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        calls.append(request)
+        await asyncio.sleep(1)
+        return httpx.Response(200, json=_completion('late'))
+
+    service = _service_with_transport(handler)
+    start_deadline(0.6)
+
+    started = time.monotonic()
+    with pytest.raises(DeadlineExceeded):
+        await service.query('hi', use_cache=False)
+
+    # No retry once the budget is gone, and running out of it is not a provider failure
+    assert time.monotonic() - started < 0.9
+    assert len(calls) == 1
+    assert service.router.health('artemox').failures == 0
+
+
+@pytest.mark.asyncio
+async def test_profile_sets_completion_limits_and_is_reported():
+    payloads = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        payloads.append(json.loads(request.content))
+        return httpx.Response(200, json=_completion('{"is_music_command": false}'))
+
+    service = _service_with_transport(handler)
+    await service.query('Который час?', system_prompt='detect', profile='detection')
+    await service.query('Который час?', system_prompt='chat')
+
+    detection, short = payloads
+    assert detection['temperature'] == 0
+    assert detection['max_tokens'] == service.profiles.profiles['detection'].max_tokens
+    assert short['max_tokens'] == service.profiles.profiles['short'].max_tokens
+
+    stats = service.profile_stats()['profiles']
+    assert stats['detection']['requests'] == 1
+    assert stats['short']['mean_latency_ms'] is not None
+    assert stats['full']['requests'] == 0
+
+
+@pytest.mark.asyncio
+async def test_short_answer_cut_off_at_max_tokens_is_asked_again_in_full():
+    payloads = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        payload = json.loads(request.content)
+        payloads.append(payload)
+        if payload['max_tokens'] == service.profiles.profiles['short'].max_tokens:
+            body = _completion('Доброе утро! Сегодня')
+            body['choices'][0]['finish_reason'] = 'length'
+            return httpx.Response(200, json=body)
+        return httpx.Response(200, json=_completion('Доброе утро! Сегодня солнечно.'))
+
+    service = _service_with_transport(handler)
+
+    first = await service.complete('Доброе утро', system_prompt='chat')
+    again = await service.complete('Доброе утро', system_prompt='chat')
+
+    assert first.text == again.text == 'Доброе утро! Сегодня солнечно.'
+    assert len(payloads) == 2  # The full answer is cached for the short key too
+    assert service.profile_stats()['profiles']['short']['length_retries'] == 1
@@ -0,0 +1,130 @@
+import pytest
+
+pytest.importorskip('numpy')
+
+from app.api.endpoints import llm  # noqa: E402
+from app.services.llm.cache import detection_cache  # noqa: E402
+from app.services.llm.deepseek import LLMCompletion, deepseek_service  # noqa: E402
+from app.services.llm.intent import (  # noqa: E402
+    SEED_EXAMPLES_PATH,
+    IntentClassifier,
+    features,
+    load_examples,
+)
+
+
+@pytest.fixture(scope='module')
+def trained():
+    return IntentClassifier(confidence=0.9).fit(load_examples(SEED_EXAMPLES_PATH))
+
+
+@pytest.fixture(autouse=True)
+def clear_detection_cache():
+    detection_cache.clear()
+
+
+def test_features_are_stable_and_unit_length():
+    indices, value = features('Включи Metallica!')
+    again, _ = features('включи metallica')
+    assert list(indices) == list(again)
+    assert value * value * len(indices) == pytest.approx(1.0)
+
+
+@pytest.mark.parametrize(
+    'text, query',
+    [
+        ('Включи Сплин', 'Сплин'),
+        ('Поставь, пожалуйста, песню Кино', 'Кино'),
+        ('Включи трек Numb', 'Numb'),
+    ],
+)
+def test_confident_music_command_with_query(trained, text, query):
+    decision = trained.decide(text)
+    assert decision is not None and decision.is_music
+    assert decision.query == query
+
+
+@pytest.mark.parametrize('text', ['Какая погода завтра?', 'Расскажи анекдот', 'Привет'])
+def test_confident_other_utterances(trained, text):
+    decision = trained.decide(text)
+    assert decision is not None and not decision.is_music
+
+
+def test_command_words_leave_no_query(trained):
+    assert trained.extract_query('Включи песню') is None
+    assert trained.extract_query('Включи, пожалуйста, Queen!') == 'Queen'
+
+
+def test_learning_from_llm_results_moves_the_probability():
+    classifier = IntentClassifier().fit(load_examples(SEED_EXAMPLES_PATH))
+    before = classifier.predict_proba('Заведи шарманку Зверей')
+    for _ in range(20):
+        classifier.learn('Заведи шарманку Зверей', 'Зверей')
+    assert classifier.predict_proba('Заведи шарманку Зверей') > before
+    assert classifier.extract_query('Заведи шарманку Сплина') == 'Сплина'
+    assert classifier.stats()['learned'] == 20
+
+
+def test_span_is_not_learned_from_a_rewritten_query():
+    classifier = IntentClassifier()
+    classifier.learn('Включи моргенштерна', 'Моргенштерн')
+    assert classifier.word_roles == {}
+
+
+def test_save_and_load_round_trip(trained, tmp_path):
+    path = str(tmp_path / 'intent_model.npz')
+    trained.save(path)
+    loaded = IntentClassifier.load(path, confidence=0.8)
+    text = 'Поставь Daft Punk'
+    assert loaded.predict_proba(text) == pytest.approx(trained.predict_proba(text))
+    assert loaded.extract_query(text) == trained.extract_query(text)
+    assert loaded.confidence == 0.8
+
+
+def test_persist_writes_learned_examples(tmp_path):
+    classifier = IntentClassifier()
+    model_path, examples_path = str(tmp_path / 'model.npz'), str(tmp_path / 'learned.jsonl')
+    classifier.persist(model_path, examples_path)
+    assert not (tmp_path / 'model.npz').exists()
+
+    classifier.learn('Включи Queen', 'Queen')
+    classifier.learn('Привет', None)
+    classifier.persist(model_path, examples_path)
+    assert load_examples(examples_path) == [('Включи Queen', 'Queen'), ('Привет', None)]
+    assert IntentClassifier.load(model_path).word_roles == classifier.word_roles
+
+
+def _counting_complete(calls, reply):
+    async def complete(text, system_prompt=None, use_cache=True, history=None, **kwargs):
+        calls.append(text)
+        return LLMCompletion(text=reply, provider='fake')
+
+    return complete
+
+
+@pytest.mark.asyncio
+async def test_detection_skips_the_llm_when_confident(monkeypatch, trained):
+    calls = []
+    monkeypatch.setattr(llm, 'intent_classifier', trained)
+    monkeypatch.setattr(deepseek_service, 'complete', _counting_complete(calls, '{}'))
+
+    assert await llm._detect_music_command('Включи Сплин') == 'Сплин'
+    assert await llm._detect_music_command('Какая погода завтра?') is None
+    assert calls == []
+
+
+@pytest.mark.asyncio
+async def test_uncertain_detection_asks_the_llm_and_learns(monkeypatch):
+    calls = []
+    classifier = IntentClassifier()  # Untrained: p = 0.5 for everything
+    monkeypatch.setattr(llm, 'intent_classifier', classifier)
+    monkeypatch.setattr(
+        deepseek_service,
+        'complete',
+        _counting_complete(calls, '{"is_music_command": true, "query": "Сплин"}'),
+    )
+
+    assert await llm._detect_music_command('Включи Сплин') == 'Сплин'
+    assert calls == ['Включи Сплин']
+    assert classifier.predict_proba('Включи Сплин') > 0.5
+    assert list(classifier.learned) == [('Включи Сплин', 'Сплин')]
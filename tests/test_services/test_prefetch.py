@@ -0,0 +1,72 @@
+import asyncio
+
+import pytest
+
+from app.services.music.prefetch import StreamPrefetcher
+
+
+class FakeService:
+    def __init__(self, delay: float = 0.0):
+        self.delay = delay
+        self.resolved = []
+        self.running = 0
+        self.max_running = 0
+
+    async def get_track_download_url(self, track_id: str) -> str:
+        self.running += 1
+        self.max_running = max(self.max_running, self.running)
+        try:
+            await asyncio.sleep(self.delay)
+        finally:
+            self.running -= 1
+        self.resolved.append(track_id)
+        return f'https://storage.example/{track_id}'
+
+
+@pytest.mark.asyncio
+async def test_prefetches_top_k_with_concurrency_cap():
+    service = FakeService(delay=0.01)
+    prefetcher = StreamPrefetcher(service, top_k=3, max_concurrency=2)
+
+    assert prefetcher.schedule(['1', '2', '3', '4', '5']) == 3
+    await asyncio.sleep(0.1)
+
+    assert sorted(service.resolved) == ['1', '2', '3']
+    assert service.max_running == 2
+
+    await prefetcher.claim('2')
+    await prefetcher.claim('9')
+    stats = prefetcher.stats()
+    assert stats['completed'] == 3
+    assert stats['hits'] == 1
+    assert stats['unused_prefetched'] == 2
+
+
+@pytest.mark.asyncio
+async def test_claim_joins_running_prefetch_and_close_cancels():
+    service = FakeService(delay=0.05)
+    prefetcher = StreamPrefetcher(service, top_k=2, max_concurrency=1)
+    prefetcher.schedule(['1', '2'])
+
+    await prefetcher.claim('1')
+    assert service.resolved == ['1']
+    assert prefetcher.stats()['in_flight_hits'] == 1
+
+    await prefetcher.close()
+    assert prefetcher.stats()['pending'] == 0
+    assert service.resolved == ['1']
+
+
+@pytest.mark.asyncio
+async def test_claim_survives_superseded_prefetch():
+    service = FakeService(delay=0.05)
+    prefetcher = StreamPrefetcher(service, top_k=3, max_concurrency=1, max_pending=3)
+
+    prefetcher.schedule(['1', '2', '3'])
+    claim = asyncio.create_task(prefetcher.claim('1'))
+    await asyncio.sleep(0)
+    prefetcher.schedule(['4', '5', '6'])  # Cancels prefetches 1-3
+
+    await claim  # Falls through to normal resolution instead of raising CancelledError
+    assert prefetcher.stats()['cancelled'] == 3
+    await prefetcher.close()
@@ -0,0 +1,64 @@
+import pytest
+
+from app.services.llm.profiles import (
+    DETECTION,
+    FULL,
+    SHORT,
+    ModelProfile,
+    ProfileSelector,
+    load_profiles,
+)
+
+
+@pytest.fixture
+def selector():
+    return ProfileSelector(load_profiles(), enabled=True, short_max_words=4)
+
+
+@pytest.mark.parametrize(
+    'text, expected',
+    [
+        ('Привет!', SHORT),
+        ('Который час?', SHORT),
+        ('Сколько будет дважды два?', SHORT),
+        ('Доброе утро, какая сегодня погода в Москве и нужен ли зонт', SHORT),
+        ('Расскажи анекдот', FULL),
+        ('Почему небо голубое?', FULL),
+        ('Какие фильмы посмотреть вечером с друзьями', FULL),
+        ('Что такое чёрная дыра?', FULL),
+        ('Кто написал Войну и мир?', FULL),
+        ('Кто такой Пушкин?', FULL),
+        ('Как доехать до вокзала?', FULL),
+        ('Как дела?', SHORT),
+    ],
+)
+def test_answers_are_classified_by_rules_and_length(selector, text, expected):
+    assert selector.classify(text) == expected
+
+
+def test_only_small_talk_is_short_by_default():
+    selector = ProfileSelector(load_profiles(), enabled=True, short_max_words=0)
+
+    assert selector.classify('Привет!') == SHORT
+    assert selector.classify('Сколько будет дважды два?') == FULL
+
+
+def test_named_profile_wins_unless_disabled(selector):
+    detection = selector.select('Включи Metallica', DETECTION)
+    assert detection.temperature == 0.0
+    assert detection.max_tokens < selector.profiles[FULL].max_tokens
+
+    disabled = ProfileSelector(selector.profiles, enabled=False, short_max_words=4)
+    assert disabled.select('Включи Metallica', DETECTION).name == FULL
+    assert disabled.select('Привет').name == FULL
+
+
+def test_profile_model_overrides_provider_model(selector):
+    from app.services.llm.deepseek import DeepSeekService
+
+    profile = ModelProfile(name=SHORT, max_tokens=20, temperature=0.3, model='deepseek-lite')
+    payload = DeepSeekService()._build_payload('deepseek-chat', [], profile)
+
+    assert payload['model'] == 'deepseek-lite'
+    assert payload['max_tokens'] == 20
+    assert payload['temperature'] == 0.3
@@ -0,0 +1,70 @@
+import asyncio
+import time
+
+import pytest
+
+from app.services.llm.deepseek import DeepSeekService, LLMCompletion
+from app.services.llm.routing import CLOSED, HALF_OPEN, OPEN, ProviderHealth
+
+
+def test_breaker_opens_and_recovers(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr(time, 'monotonic', lambda: now[0])
+
+    health = ProviderHealth('artemox', failure_threshold=2, open_seconds=10)
+    health.record_failure()
+    assert health.state == CLOSED
+    health.record_failure()
+    assert health.state == OPEN
+    assert not health.is_available()
+
+    now[0] += 11
+    assert health.state == HALF_OPEN
+    assert health.is_available()
+    health.begin_request()
+    assert not health.is_available()  # only one probe at a time
+
+    health.record_success(0.2)
+    assert health.state == CLOSED
+    assert health.latency_ewma == pytest.approx(0.2)
+
+
+def _service(delays: dict) -> DeepSeekService:
+    service = DeepSeekService()
+    service.primary_api_key = 'primary-key'
+    service.fallback_api_key = 'fallback-key'
+    service.router.hedging_enabled = True
+    service.router.hedge_default_delay = 0.05
+    service.router.hedge_min_delay = 0.01
+
+    async def fake_try(api_key, base_url, model, messages, provider_name, profile):
+        delay = delays[provider_name]
+        if isinstance(delay, Exception):
+            raise delay
+        await asyncio.sleep(delay)
+        return LLMCompletion(text=provider_name, provider=provider_name)
+
+    service._try_provider = fake_try
+    return service
+
+
+@pytest.mark.asyncio
+async def test_slow_primary_is_hedged_to_fallback():
+    service = _service({'artemox': 5, 'deepseek': 0.01})
+    result = await service.complete('hi', use_cache=False)
+
+    assert result.provider == 'deepseek'
+    assert service.router.hedges_fired == 1
+    assert service.router.hedges_won == 1
+    # The losing primary request was cancelled, not counted as a failure
+    assert service.router.health('artemox').failures == 0
+
+
+@pytest.mark.asyncio
+async def test_failed_primary_falls_back_immediately():
+    service = _service({'artemox': RuntimeError('boom'), 'deepseek': 0.01})
+    result = await service.complete('hi', use_cache=False)
+
+    assert result.provider == 'deepseek'
+    assert service.router.hedges_fired == 0
+    assert service.router.health('artemox').failures == 1
@@ -0,0 +1,74 @@
+import asyncio
+import json
+
+import pytest
+
+from app.services.weather.providers import Location, StubWeatherProvider, parse_locations
+from app.services.weather.service import WeatherService
+
+MOSCOW = Location('Москва', 55.7558, 37.6173)
+
+
+class SlowProvider(StubWeatherProvider):
+    def __init__(self):
+        super().__init__()
+        self.fail = False
+
+    async def fetch(self, location):
+        await asyncio.sleep(0.01)
+        if self.fail:
+            raise RuntimeError('provider down')
+        return await super().fetch(location)
+
+
+def test_parse_locations():
+    assert parse_locations('Москва:55.7558:37.6173; Сочи:43.6:39.73') == [
+        MOSCOW,
+        Location('Сочи', 43.6, 39.73),
+    ]
+
+
+@pytest.mark.parametrize(
+    'value', ['Москва:55.75', 'Москва:north:37.6', ':55.7:37.6', 'X:95:37', ' ; ']
+)
+def test_parse_locations_rejects_malformed_value(value):
+    with pytest.raises(ValueError, match='weather location'):
+        parse_locations(value)
+
+
+@pytest.mark.asyncio
+async def test_cold_reads_share_one_fetch_and_body_is_preserialized():
+    provider = SlowProvider()
+    service = WeatherService(provider, [MOSCOW])
+
+    snapshots = await asyncio.gather(*(service.get(MOSCOW) for _ in range(5)))
+
+    assert provider.calls == 1
+    assert all(snapshot is snapshots[0] for snapshot in snapshots)
+    body = json.loads(snapshots[0].body)
+    assert body['location'] == 'Москва'
+    assert body['current']['description'] == 'Переменная облачность'
+
+    await service.get(MOSCOW)
+    assert provider.calls == 1
+    assert service.stats()['fresh_reads'] == 1
+
+
+@pytest.mark.asyncio
+async def test_stale_snapshot_served_while_revalidating():
+    provider = SlowProvider()
+    service = WeatherService(provider, [MOSCOW], refresh_interval=0.0)
+    first = await service.get(MOSCOW)
+
+    # Failed background refresh keeps the old snapshot
+    provider.fail = True
+    assert await service.get(MOSCOW) is first
+    await asyncio.sleep(0.03)
+    assert await service.get(MOSCOW) is first
+    assert service.stats()['refresh_errors'] == 1
+
+    provider.fail = False
+    await asyncio.sleep(0.03)
+    assert await service.get(MOSCOW) is not first
+    assert service.stats()['stale_reads'] == 3
+    await service.close()
@@ -0,0 +1,205 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from app.services.music.yandex import YandexMusicService
+
+
+def _track(track_id: int, title: str) -> SimpleNamespace:
+    return SimpleNamespace(
+        id=track_id,
+        title=title,
+        artists=[SimpleNamespace(name='Metallica')],
+        albums=[SimpleNamespace(title='Metallica')],
+        duration_ms=331000,
+        cover_uri='avatars.yandex.net/get-music-content/%%',
+    )
+
+
+class FakeDownloadInfo:
+    def __init__(self, client, track_id, bitrate):
+        self.client = client
+        self.track_id = track_id
+        self.bitrate_in_kbps = bitrate
+
+    async def get_direct_link_async(self):
+        self.client.calls.append('direct_link')
+        return f'https://storage.example/{self.track_id}/{self.bitrate_in_kbps}'
+
+
+class FakeTrack:
+    def __init__(self, client, track_id):
+        self.client = client
+        self.id = track_id
+        self.track_id = track_id
+
+    async def get_download_info_async(self):
+        self.client.calls.append('download_info')
+        return [FakeDownloadInfo(self.client, self.track_id, b) for b in (128, 320, 192)]
+
+
+class FakeClient:
+    def __init__(self, results):
+        self.results = results
+        self.search_calls = []
+        self.calls = []
+
+    async def tracks(self, track_ids):
+        self.calls.append('tracks')
+        return [FakeTrack(self, track_id) for track_id in track_ids if track_id != '404']
+
+    async def search(self, query, type_='track'):
+        self.search_calls.append(query)
+        tracks = self.results.get(query.lower())
+        if not tracks:
+            return SimpleNamespace(tracks=None)
+        return SimpleNamespace(tracks=SimpleNamespace(results=tracks))
+
+
+@pytest.fixture
+def service():
+    service = YandexMusicService()
+    service.token = 'test-token'
+    service._client = FakeClient({'metallica': [_track(1, 'Enter Sandman')]})
+    return service
+
+
+@pytest.mark.asyncio
+async def test_search_results_are_cached(service):
+    first = await service.search_tracks('Metallica', limit=10)
+    second = await service.search_tracks('  metallica!', limit=10)
+
+    assert [t.title for t in second] == ['Enter Sandman']
+    assert second == first
+    assert second[0].cover_url == 'https://avatars.yandex.net/get-music-content/400x400'
+    assert len(service._client.search_calls) == 1
+
+    # Different limit is a different cache entry
+    await service.search_tracks('metallica', limit=1)
+    assert len(service._client.search_calls) == 2
+
+
+@pytest.mark.asyncio
+async def test_empty_results_are_negatively_cached(service):
+    assert await service.search_tracks('nothing here') == []
+    assert await service.search_tracks('Nothing here') == []
+    assert len(service._client.search_calls) == 1
+    assert service.search_cache.get(('nothing here', 10)) == []
+
+
+@pytest.mark.asyncio
+async def test_stream_url_reuses_cached_link_and_download_info(service):
+    url = await service.get_track_download_url('42')
+    assert url == 'https://storage.example/42/320'
+    assert service._client.calls == ['tracks', 'download_info', 'direct_link']
+
+    # Replay: zero upstream calls
+    assert await service.get_track_download_url('42') == url
+    assert len(service._client.calls) == 3
+
+    # Link expired: only the direct link is refreshed
+    service.invalidate_direct_link('42')
+    assert await service.get_track_download_url('42') == url
+    assert service._client.calls[3:] == ['direct_link']
+
+
+@pytest.mark.asyncio
+async def test_concurrent_identical_calls_are_coalesced(service):
+    results = await asyncio.gather(*(service.search_tracks('Metallica') for _ in range(3)))
+    assert all(r == results[0] for r in results)
+    assert len(service._client.search_calls) == 1
+
+    urls = await asyncio.gather(*(service.get_track_download_url('7') for _ in range(3)))
+    assert len(set(urls)) == 1
+    assert service._client.calls == ['tracks', 'download_info', 'direct_link']
+    assert service.cache_stats()['coalescing']['download_url']['coalesced'] == 2
+
+
+@pytest.mark.asyncio
+async def test_batch_stream_urls_use_one_tracks_call(service):
+    await service.get_track_download_url('1')
+    service._client.calls.clear()
+
+    urls = await service.get_track_download_urls(['1', '2', '3', '404', '2'])
+
+    assert list(urls) == ['1', '2', '3', '404']
+    assert urls['1'] == 'https://storage.example/1/320'
+    assert urls['3'] == 'https://storage.example/3/320'
+    assert isinstance(urls['404'], ValueError)
+    # '1' came from the link cache; '2' and '3' share one tracks() call
+    assert service._client.calls.count('tracks') == 1
+    assert service._client.calls.count('direct_link') == 2
+
+
+class FakeClientAsync:
+    """Stands in for yandex_music.ClientAsync: init() takes a while and is counted"""
+
+    inits = 0
+
+    def __init__(self, token):
+        self.token = token
+
+    async def init(self):
+        FakeClientAsync.inits += 1
+        await asyncio.sleep(0.01)
+        return FakeClient({'metallica': [_track(1, 'Enter Sandman')]})
+
+
+@pytest.fixture
+def uninitialized(monkeypatch):
+    monkeypatch.setattr('app.services.music.yandex.ClientAsync', FakeClientAsync)
+    FakeClientAsync.inits = 0
+    service = YandexMusicService()
+    service.token = 'test-token'
+    return service
+
+
+@pytest.mark.asyncio
+async def test_concurrent_callers_share_one_init(uninitialized):
+    uninitialized.start()
+    clients = await asyncio.gather(*(uninitialized._get_client() for _ in range(5)))
+
+    assert FakeClientAsync.inits == 1
+    assert all(client is clients[0] for client in clients)
+    assert uninitialized.ready
+    await uninitialized.close()
+
+
+@pytest.mark.asyncio
+async def test_session_error_reinitializes_in_background(uninitialized):
+    from yandex_music.exceptions import UnauthorizedError
+
+    old_client = await uninitialized._get_client()
+
+    async def rejected(query, type_='track'):
+        raise UnauthorizedError('token expired')
+
+    old_client.search = rejected
+    with pytest.raises(UnauthorizedError):
+        await uninitialized.search_tracks('Metallica')
+    # The failed request did not wait for the new client
+    assert uninitialized._client is old_client
+
+    await uninitialized._reinit_task
+    assert uninitialized._client is not old_client
+    assert uninitialized.reinits == 1
+    assert [t.title for t in await uninitialized.search_tracks('Metallica')] == ['Enter Sandman']
+
+
+@pytest.mark.asyncio
+async def test_calls_are_bounded_by_timeout_and_deadline(service):
+    from app.core.deadline import DeadlineExceeded, start_deadline
+
+    async def slow_search(query, type_='track'):
+        await asyncio.sleep(1)
+
+    service._client.search = slow_search
+    service.call_timeout = 0.01
+    with pytest.raises(asyncio.TimeoutError):
+        await service.search_tracks('Metallica')
+
+    service.call_timeout = 10.0
+    start_deadline(0.01)
+    with pytest.raises(DeadlineExceeded):
+        await service.search_tracks('Metallica')
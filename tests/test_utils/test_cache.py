@@ -0,0 +1,93 @@
+import time
+
+from app.utils.cache import LRUCache
+
+
+def test_lru_eviction_by_items():
+    cache = LRUCache(max_items=2)
+    cache.set('a', 1)
+    cache.set('b', 2)
+    cache.get('a')
+    cache.set('c', 3)
+
+    assert 'a' in cache
+    assert 'b' not in cache
+    assert cache.stats()['evictions'] == 1
+
+
+def test_lru_eviction_by_bytes():
+    cache = LRUCache(max_bytes=100, size_of=len)
+    cache.set('a', 'x' * 60)
+    cache.set('b', 'y' * 60)
+
+    assert cache.get('a') is None
+    assert cache.get('b') == 'y' * 60
+    assert cache.stats()['bytes'] == 60
+
+    cache.set('huge', 'z' * 500)
+    assert 'huge' not in cache
+
+
+def test_ttl_expiry(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(time, 'monotonic', lambda: now[0])
+
+    cache = LRUCache(ttl=10)
+    cache.set('a', 1)
+    cache.set('b', 2, ttl=100)
+    now[0] += 11
+
+    assert cache.get('a') is None
+    assert cache.get('b') == 2
+    stats = cache.stats()
+    assert stats['hits'] == 1
+    assert stats['misses'] == 1
+    assert stats['expirations'] == 1
+
+
+def test_shared_backend_warms_other_workers(tmp_path):
+    from app.database.state import SQLiteStateBackend
+
+    path = str(tmp_path / 'state.db')
+    worker_a = LRUCache(ttl=60, backend=SQLiteStateBackend(path), namespace='test')
+    worker_b = LRUCache(ttl=60, backend=SQLiteStateBackend(path), namespace='test')
+
+    worker_a.set(('metallica', 10), [['1', 'Enter Sandman']])
+    assert worker_b.get(('metallica', 10)) == [['1', 'Enter Sandman']]
+    assert worker_b.stats()['shared_hits'] == 1
+
+
+def test_shared_entry_keeps_remaining_ttl(tmp_path):
+    from app.database.state import SQLiteStateBackend
+
+    path = str(tmp_path / 'state.db')
+    worker_a = LRUCache(ttl=3600, backend=SQLiteStateBackend(path), namespace='test')
+    worker_b = LRUCache(ttl=3600, backend=SQLiteStateBackend(path), namespace='test')
+
+    worker_a.set('nothing here', [], ttl=0.05)
+    assert worker_b.get('nothing here') == []
+
+    time.sleep(0.06)
+    assert worker_a.get('nothing here') is None
+    assert worker_b.get('nothing here') is None
+
+
+def test_locked_shared_backend_fails_open(tmp_path):
+    import sqlite3
+
+    from app.database.state import SQLiteStateBackend
+
+    path = str(tmp_path / 'state.db')
+    cache = LRUCache(ttl=60, backend=SQLiteStateBackend(path), namespace='test')
+
+    blocker = sqlite3.connect(path, isolation_level=None)
+    blocker.execute('BEGIN IMMEDIATE')
+    try:
+        # The write to the shared tier times out; the local tier still gets the value
+        cache.set('key', 'value')
+    finally:
+        blocker.execute('ROLLBACK')
+        blocker.close()
+
+    assert cache.get('key') == 'value'
+    assert cache.stats()['backend_errors'] == 1
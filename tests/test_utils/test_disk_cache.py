@@ -0,0 +1,53 @@
+import os
+
+from app.utils.disk_cache import DiskLRUCache
+
+
+def _store(cache: DiskLRUCache, key: str, data: bytes):
+    temp_path = cache.temp_path(key)
+    temp_path.write_bytes(data)
+    return cache.commit(key, temp_path)
+
+
+def test_evicts_least_recently_used_files(tmp_path):
+    cache = DiskLRUCache(str(tmp_path), max_bytes=10)
+    _store(cache, 'a', b'aaaa')
+    _store(cache, 'b', b'bbbb')
+    assert cache.get('a') is not None  # 'b' becomes least recently used
+
+    _store(cache, 'c', b'cccc')
+
+    assert cache.get('b') is None
+    assert cache.get('a').read_bytes() == b'aaaa'
+    assert cache.stats()['bytes'] == 8
+    assert sorted(p.name for p in tmp_path.iterdir()) == ['a', 'c']
+
+
+def test_index_is_rebuilt_from_directory(tmp_path):
+    cache = DiskLRUCache(str(tmp_path), max_bytes=100, suffix='.mp3')
+    _store(cache, '123:456', b'audio')
+    (tmp_path / 'left.abc.part').write_bytes(b'partial')
+    os.utime(tmp_path / 'left.abc.part', (0, 0))  # Abandoned long ago
+    (tmp_path / 'live.abc.part').write_bytes(b'partial')  # Another worker is downloading
+
+    reopened = DiskLRUCache(str(tmp_path), max_bytes=100, suffix='.mp3')
+
+    assert reopened.get('123:456').read_bytes() == b'audio'
+    assert not (tmp_path / 'left.abc.part').exists()
+    assert (tmp_path / 'live.abc.part').exists()
+    assert reopened.stats()['files'] == 1
+
+
+def test_budget_is_shared_by_workers(tmp_path):
+    # Two caches on one directory behave like two uvicorn worker processes
+    worker_a = DiskLRUCache(str(tmp_path), max_bytes=10)
+    worker_b = DiskLRUCache(str(tmp_path), max_bytes=10)
+    _store(worker_a, 'a', b'aaaa')
+    _store(worker_b, 'b', b'bbbb')
+    os.utime(tmp_path / 'a', (1, 1))
+    os.utime(tmp_path / 'b', (2, 2))
+
+    _store(worker_a, 'c', b'cccc')
+
+    assert sorted(p.name for p in tmp_path.iterdir()) == ['b', 'c']
+    assert worker_a.stats()['bytes'] == 8
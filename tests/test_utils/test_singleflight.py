@@ -0,0 +1,94 @@
+import asyncio
+
+import pytest
+
+from app.core.deadline import DeadlineExceeded, start_deadline
+from app.utils.singleflight import SingleFlight
+
+
+@pytest.mark.asyncio
+async def test_concurrent_calls_share_one_upstream_call():
+    group = SingleFlight()
+    calls = []
+
+    async def fetch():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return 'result'
+
+    results = await asyncio.gather(*(group.do('key', fetch) for _ in range(5)))
+
+    assert results == ['result'] * 5
+    assert len(calls) == 1
+    assert group.stats()['coalesced'] == 4
+    assert group.stats()['in_flight'] == 0
+
+
+@pytest.mark.asyncio
+async def test_errors_propagate_to_all_waiters():
+    group = SingleFlight()
+
+    async def fail():
+        await asyncio.sleep(0.01)
+        raise RuntimeError('upstream down')
+
+    results = await asyncio.gather(
+        group.do('key', fail), group.do('key', fail), return_exceptions=True
+    )
+    assert all(isinstance(r, RuntimeError) for r in results)
+
+
+@pytest.mark.asyncio
+async def test_cancelled_waiter_does_not_cancel_shared_call():
+    group = SingleFlight()
+
+    async def fetch():
+        await asyncio.sleep(0.05)
+        return 'result'
+
+    first = asyncio.create_task(group.do('key', fetch))
+    second = asyncio.create_task(group.do('key', fetch))
+    await asyncio.sleep(0.01)
+    first.cancel()
+
+    assert await second == 'result'
+    with pytest.raises(asyncio.CancelledError):
+        await first
+
+
+@pytest.mark.asyncio
+async def test_call_cancelled_when_last_waiter_leaves():
+    group = SingleFlight()
+    finished = []
+
+    async def fetch():
+        await asyncio.sleep(0.05)
+        finished.append(1)
+
+    waiter = asyncio.create_task(group.do('key', fetch))
+    await asyncio.sleep(0.01)
+    waiter.cancel()
+    await asyncio.sleep(0.08)
+
+    assert finished == []
+    assert group.stats()['in_flight'] == 0
+
+
+@pytest.mark.asyncio
+async def test_each_waiter_is_bounded_by_its_own_deadline():
+    group = SingleFlight()
+
+    async def fetch():
+        await asyncio.sleep(0.1)
+        return 'result'
+
+    async def call(budget):
+        start_deadline(budget)
+        return await group.do('key', fetch)
+
+    short = asyncio.create_task(call(0.02))
+    long = asyncio.create_task(call(10))
+
+    with pytest.raises(DeadlineExceeded):
+        await short
+    assert await long == 'result'